@@ -0,0 +1,117 @@
+"""The local filesystem, as the walker and the commands list it.
+
+A backend answers the handful of questions the walker asks about paths
+(listing, stat, link checks and path manipulation). LocalBackend asks
+the operating system; `ccli tree` has others, for archives.
+"""
+import os
+import stat
+
+
+def _mode(name, dir_fd, follow_symlinks=True):
+    """The type of what name in dir_fd leads to, or 0 if there's nothing."""
+    try:
+        return os.stat(
+            name,
+            dir_fd=dir_fd,
+            follow_symlinks=follow_symlinks,
+        ).st_mode
+    except (OSError, ValueError):
+        return 0
+
+
+class LocalBackend:
+    """The real filesystem, optionally with cached directory listings.
+
+    With a statx (like tree's statx.Statx), stats (and the exists /
+    isdir / islink checks) go through statx, so they only ask for the
+    fields that are needed. With dir_fds (like tree's dirfd.DirFds),
+    calls are made relative to an open fd of each path's directory, and
+    directories are listed through their own. listings is a cache of
+    listdir and scandir (like tree's cache.ListingCache).
+    """
+    local = True
+
+    def __init__(self, listings=None, statx=None, dir_fds=None):
+        self._listings = listings
+        self._statx = statx
+        self._dir_fds = dir_fds
+
+    @staticmethod
+    def basename(path):
+        return os.path.basename(path)
+
+    def exists(self, path):
+        name, dir_fd = self._at(path)
+        if self._statx is not None:
+            return self._statx.exists(name, dir_fd=dir_fd)
+        if dir_fd is None:
+            return os.path.exists(path)
+        return _mode(name, dir_fd) != 0
+
+    def isdir(self, path):
+        name, dir_fd = self._at(path)
+        if self._statx is not None:
+            return self._statx.isdir(name, dir_fd=dir_fd)
+        if dir_fd is None:
+            return os.path.isdir(path)
+        return stat.S_ISDIR(_mode(name, dir_fd))
+
+    def islink(self, path):
+        name, dir_fd = self._at(path)
+        if self._statx is not None:
+            return self._statx.islink(name, dir_fd=dir_fd)
+        if dir_fd is None:
+            return os.path.islink(path)
+        return stat.S_ISLNK(_mode(name, dir_fd, follow_symlinks=False))
+
+    @staticmethod
+    def join(path, *paths):
+        return os.path.join(path, *paths)
+
+    def listdir(self, path):
+        if self._listings is not None:
+            return self._listings.listdir(path)
+        if self._dir_fds is not None and (
+            names := self._dir_fds.listdir(path)
+        ) is not None:
+            return names
+        return os.listdir(path)
+
+    def scandir(self, path):
+        if self._listings is not None:
+            return self._listings.scandir(path)
+        if self._dir_fds is not None and (
+            entries := self._dir_fds.scandir(path)
+        ) is not None:
+            return entries
+        with os.scandir(path) as entries:
+            return list(entries)
+
+    def lstat(self, path):
+        name, dir_fd = self._at(path)
+        if self._statx is not None:
+            return self._statx.lstat(name, dir_fd=dir_fd)
+        if dir_fd is None:
+            return os.lstat(path)
+        return os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+
+    def readlink(self, path):
+        name, dir_fd = self._at(path)
+        return os.readlink(name, dir_fd=dir_fd)
+
+    @staticmethod
+    def realpath(path):
+        return os.path.realpath(path)
+
+    def stat(self, path):
+        name, dir_fd = self._at(path)
+        if self._statx is None:
+            return os.stat(name, dir_fd=dir_fd)
+        return self._statx.stat(name, dir_fd=dir_fd)
+
+    def _at(self, path):
+        """path as (name, dir_fd) for the calls (dir_fd None for none)."""
+        if self._dir_fds is None:
+            return path, None
+        return self._dir_fds.at(path)
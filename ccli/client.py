@@ -0,0 +1,101 @@
+"""Thin client for `ccli daemon`.
+
+Only the standard library is imported here, so forwarding a command to a
+running daemon skips importing click, termcolor and the commands. When no
+daemon is listening, the command runs in-process instead.
+"""
+import json
+import os
+import socket
+import struct
+import sys
+
+# Every message from the daemon is a header followed by its payload.
+HEADER = struct.Struct("!BI")
+EXIT, STDOUT, STDERR = range(3)
+# Options that need this process's own terminal, so never go to the daemon.
+INTERACTIVE = frozenset(("--browse",))
+
+
+def socket_path():
+    """The daemon's socket: $CCLI_SOCKET, or one per user in a temp dir."""
+    if path := os.environ.get("CCLI_SOCKET"):
+        return path
+    directory = os.environ.get(
+        "XDG_RUNTIME_DIR",
+        os.environ.get("TMPDIR", "/tmp"),
+    )
+    return os.path.join(directory, f"ccli-{os.getuid()}.sock")
+
+
+def connect(path):
+    """Connect to the daemon, or return None if it isn't available.
+
+    A socket owned by another user is never trusted with our arguments
+    and environment.
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if os.stat(path).st_uid != os.getuid():
+            raise PermissionError(path)
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError("Lost the connection to the daemon.")
+        data += chunk
+    return bytes(data)
+
+
+def request(connection, argv):
+    """Forward argv to the daemon, stream its output, and return the code.
+
+    Raises EOFError if the daemon goes away before the command finishes.
+    """
+    streams = {STDOUT: sys.stdout, STDERR: sys.stderr}
+    try:
+        connection.sendall(json.dumps({
+            "argv": list(argv),
+            "cwd": os.getcwd(),
+            "encoding": sys.stdout.encoding,
+            "env": dict(os.environ),
+            "isatty": [sys.stdout.isatty(), sys.stderr.isatty()],
+        }).encode() + b"\n")
+        while True:
+            channel, size = HEADER.unpack(
+                receive_exactly(connection, HEADER.size),
+            )
+            data = receive_exactly(connection, size)
+            if channel == EXIT:
+                return int(data)
+            stream = streams[channel]
+            stream.flush()
+            stream.buffer.write(data)
+            stream.buffer.flush()
+    except ConnectionError as error:
+        raise EOFError("Lost the connection to the daemon.") from error
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    connection = None
+    if not INTERACTIVE.intersection(argv):
+        connection = connect(socket_path())
+    if connection is None:
+        from .cli import CLI
+        return CLI(args=argv, prog_name="ccli")
+    with connection:
+        try:
+            code = request(connection, argv)
+        except EOFError as error:
+            print(f"ccli: {error}", file=sys.stderr)
+            code = 1
+    sys.exit(code)
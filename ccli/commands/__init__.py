@@ -1,8 +1,36 @@
 import importlib
+import os
+import sys
 from pathlib import Path
 
 COMMANDS_DIR = Path(__file__).parent
 
 
+def _discard_stdout():
+    """Point stdout at os.devnull, so flushing it at exit can't fail.
+
+    Streams that aren't files (like the daemon's) are left alone.
+    """
+    try:
+        fd = sys.stdout.fileno()
+    except OSError:  # Including io.UnsupportedOperation.
+        return
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, fd)
+    os.close(devnull)
+
+
 def invoke_main(package, args=(), kwargs=None):
-    importlib.import_module(f"{package}.main").main(*args, **(kwargs or {}))
+    """Run the command's main.
+
+    When the output's reader goes away (`ccli tree | head`), the command
+    stops where it is and exits quietly, instead of with a traceback.
+    """
+    try:
+        importlib.import_module(f"{package}.main").main(
+            *args,
+            **(kwargs or {}),
+        )
+    except BrokenPipeError:
+        _discard_stdout()
+        raise SystemExit(1)
@@ -0,0 +1,24 @@
+import click
+
+from ...commands import invoke_main
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    help="Unix socket to listen on. Defaults to $CCLI_SOCKET, or "
+    "ccli-<uid>.sock under $XDG_RUNTIME_DIR (or $TMPDIR, or /tmp).",
+)
+def daemon(**kwargs):
+    """Serve commands from a warm process.
+
+    Run commands through `ccli-client` (same arguments as `ccli`) to skip
+    the interpreter startup and imports, and to reuse the user / group
+    name and directory listing caches between runs. `ccli-client` runs
+    the command itself when the daemon isn't running.
+
+    Commands are served one at a time. A client that stops reading its
+    output for 10 seconds is disconnected, so it can't hold up the rest.
+    """
+    invoke_main(package=__package__, kwargs=kwargs)
@@ -0,0 +1,183 @@
+"""`ccli daemon`: serve commands from a warm process.
+
+Clients are served one at a time, in the order they connect, since the
+commands share the process's working directory, environment and
+streams. So that one client can't hold up the rest by not reading its
+output (a paused pager, say), a client is dropped once a send to it has
+waited _SEND_TIMEOUT seconds.
+"""
+import errno
+import importlib
+import io
+import json
+import os
+import socket
+import stat
+import sys
+import time
+import traceback
+
+from ... import client
+from ...cli import CLI
+from ...client import EXIT, HEADER, STDERR, STDOUT
+from ...commands import COMMANDS_DIR
+
+_SEND_TIMEOUT = 10.0
+
+
+class _FrameWriter(io.RawIOBase):
+    """Send everything written as frames on one of the client's streams."""
+
+    def __init__(self, connection, channel, isatty):
+        self._connection = connection
+        self._channel = channel
+        self._isatty = isatty
+
+    def isatty(self):
+        return self._isatty
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """Send data, or raise BrokenPipeError if the client stopped reading.
+
+        After a timeout the connection is shut down, so later writes fail
+        straight away instead of waiting again.
+        """
+        try:
+            self._connection.sendall(
+                HEADER.pack(self._channel, len(data)) + bytes(data),
+            )
+        except socket.timeout:
+            self._connection.shutdown(socket.SHUT_RDWR)
+            raise BrokenPipeError(
+                errno.EPIPE,
+                "The client stopped reading its output.",
+            ) from None
+        return len(data)
+
+
+def _invoke(argv):
+    """Run a command like `ccli` would and return its exit code."""
+    if argv[:1] == ["daemon"]:
+        print("ccli: the daemon can't serve itself.", file=sys.stderr)
+        return 2
+    try:
+        CLI.main(args=argv, prog_name="ccli")
+    except SystemExit as error:
+        if error.code is None or isinstance(error.code, int):
+            return error.code or 0
+        print(error.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+def _stream(connection, channel, isatty, encoding):
+    return io.TextIOWrapper(
+        io.BufferedWriter(_FrameWriter(connection, channel, isatty)),
+        encoding=encoding,
+        errors="replace",
+        line_buffering=isatty,
+    )
+
+
+def _set_environ(environ):
+    os.environ.clear()
+    os.environ.update(environ)
+    time.tzset()
+
+
+def serve(connection):
+    """Run one client's command with its cwd, environment and streams.
+
+    A client that closes without sending a request (as
+    _remove_stale_socket does), sends a bad one, or sends nothing for
+    _SEND_TIMEOUT seconds is dropped.
+    """
+    connection.settimeout(_SEND_TIMEOUT)
+    try:
+        with connection.makefile("rb") as fh:
+            request = json.loads(fh.readline())
+    except (OSError, ValueError):  # Including timeouts and empty requests.
+        return
+    saved = sys.stdout, sys.stderr
+    cwd, environ = os.getcwd(), dict(os.environ)
+    streams = [
+        _stream(connection, channel, isatty, request["encoding"])
+        for channel, isatty in zip((STDOUT, STDERR), request["isatty"])
+    ]
+    sys.stdout, sys.stderr = streams
+    try:
+        _set_environ(request["env"])
+        try:
+            os.chdir(request["cwd"])
+        except OSError as error:
+            print(f"ccli: {error}", file=sys.stderr)
+            code = 1
+        else:
+            code = _invoke(request["argv"])
+        sys.stdout.flush()
+        sys.stderr.flush()
+        connection.sendall(HEADER.pack(EXIT, len(str(code))) + b"%d" % code)
+    except OSError:
+        pass  # The client went away; there's nobody left to tell.
+    finally:
+        sys.stdout, sys.stderr = saved
+        for stream in streams:
+            try:
+                stream.close()
+            except OSError:
+                pass
+        os.chdir(cwd)
+        _set_environ(environ)
+
+
+def warm():
+    """Import every command and turn on the caches they provide."""
+    for path in COMMANDS_DIR.glob("*/main.py"):
+        module = importlib.import_module(".".join((
+            COMMANDS_DIR.parent.name,
+            COMMANDS_DIR.name,
+            path.parent.name,
+            "main",
+        )))
+        if enable_caches := getattr(module, "enable_caches", None):
+            enable_caches()
+
+
+def _remove_stale_socket(path):
+    """Remove a socket left behind by a daemon that didn't exit cleanly."""
+    if existing := client.connect(path):
+        existing.close()
+        raise SystemExit(f"ccli: a daemon is already listening on {path}")
+    try:
+        is_socket = stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return
+    if is_socket:
+        os.unlink(path)
+
+
+def main(socket_path=None):
+    path = socket_path or client.socket_path()
+    _remove_stale_socket(path)
+    warm()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    serve(connection)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
@@ -0,0 +1,52 @@
+import click
+
+from ...commands import invoke_main
+
+
+@click.command()
+@click.argument("paths", nargs=-1)
+@click.option(
+    "-a",
+    "all_files",
+    is_flag=True,
+    help="Print files too, not just directories.",
+)
+@click.option(
+    "-d",
+    "--max-depth",
+    "max_depth",
+    type=click.IntRange(min=0),
+    metavar="N",
+    help="Print totals only for directories (or files, with -a) at most "
+    "N levels below each path.",
+)
+@click.option(
+    "-h",
+    "nice_size",
+    is_flag=True,
+    help="Print sizes in human-readable form (like 2.93K).",
+)
+@click.option(
+    "-l",
+    "follow_links",
+    is_flag=True,
+    help="Descend into symbolic links.",
+)
+@click.option(
+    "-s",
+    "summarize",
+    is_flag=True,
+    help="Print only the total of each path (-d 0).",
+)
+def du(paths=(), **kwargs):
+    """Disk usage of directory trees.
+
+    Print the space used by each directory beneath each path, after its
+    contents. Hard links are counted once.
+    """
+    if not paths:
+        paths = (".",)
+    if kwargs.pop("summarize"):
+        kwargs["max_depth"] = 0
+    kwargs["paths"] = paths
+    invoke_main(package=__package__, kwargs=kwargs)
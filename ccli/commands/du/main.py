@@ -0,0 +1,91 @@
+"""`ccli du`: disk usage, on the same walker as `ccli tree`."""
+import math
+import stat
+
+from ...walker import Walker
+
+_SI_SUFFIXES = ("", "K", "M", "G", "T", "P")
+
+
+class DiskUsage:
+    """Print the space used beneath each path, like du.
+
+    Each directory's total is printed after what's in it. Paths are
+    walked with their listings made ahead on threads, and the lstat()
+    of each entry taken there too. Hard links, and directories reached
+    again through followed links, are counted once.
+    """
+
+    def __init__(
+        self,
+        paths,
+        all_files=False,
+        follow_links=False,
+        max_depth=None,
+        nice_size=False,
+    ):
+        self.all_files = all_files
+        self.max_depth = max_depth
+        self.nice_size = nice_size
+        self._walker = Walker(
+            list_hidden=True,  # Like du, hidden entries use space too.
+            follow_links=follow_links,
+            lstat=True,
+            parallel=True,
+        )
+        self._counted = set()
+        self._seen = set()
+        self._totals = []  # [path, size, depth] of the open directories.
+        for path in paths:
+            # Broken links OK
+            if self._walker.fs.exists(path) or self._walker.fs.islink(path):
+                self._run(path)
+
+    def _close(self, depth):
+        """Print the totals of the open directories at depth or below."""
+        while self._totals and self._totals[-1][2] >= depth:
+            path, size, depth_ = self._totals.pop()
+            self._print(size, path, depth_)
+            if self._totals:
+                self._totals[-1][1] += size
+
+    def _print(self, size, path, depth):
+        if self.max_depth is None or depth <= self.max_depth:
+            print(f"{self._size(size)}\t{path}")
+
+    def _run(self, path):
+        for visit in self._walker.walk(path, seen=self._seen):
+            self._close(visit.depth)
+            size = 0 if visit.looped else self._usage(visit.entry.lstat)
+            if self._walker.enters(visit.entry) and not visit.looped:
+                self._totals.append([visit.path, size, visit.depth])
+                continue
+            if self._totals:
+                self._totals[-1][1] += size
+            if self.all_files or not self._totals:
+                self._print(size, visit.path, visit.depth)
+        self._close(0)
+
+    def _size(self, size):
+        if not self.nice_size or size <= 0:
+            return str(size)
+        index = min(
+            math.floor(math.log10(size) / 3),
+            len(_SI_SUFFIXES) - 1,
+        )
+        return f"{round(size / 1024**index, 2)}{_SI_SUFFIXES[index]}"
+
+    def _usage(self, stats):
+        """Bytes allocated for stats, or 0 for a hard link counted already."""
+        if stats is None:
+            return 0
+        if stats.st_nlink > 1 and not stat.S_ISDIR(stats.st_mode):
+            key = (stats.st_dev, stats.st_ino)
+            if key in self._counted:
+                return 0
+            self._counted.add(key)
+        return stats.st_blocks * 512
+
+
+def main(*args, **kwargs):
+    DiskUsage(*args, **kwargs)
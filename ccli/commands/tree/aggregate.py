@@ -0,0 +1,58 @@
+"""Totals by group, for `ccli tree --summary-by`.
+
+Each entry the summary counts is added to its group as it's counted,
+from the stats the walk takes, so memory grows with the number of
+groups rather than the number of entries.
+"""
+KEYS = ("ext", "owner", "depth", "type")
+
+
+class Aggregates:
+    """The count, total size and newest mtime of each group for a key.
+
+    key is one of KEYS; what the groups are is up to the caller. Sizes
+    are added as they're given (Tree only gives those of files, so what
+    links point to isn't counted twice), and a group's newest mtime is
+    None until something in it has one.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._groups = {}  # [count, size, newest] by group.
+
+    def add(self, group, size, mtime):
+        totals = self._groups.get(group)
+        if totals is None:
+            self._groups[group] = [1, size, mtime]
+            return
+        totals[0] += 1
+        totals[1] += size
+        if mtime is not None and (totals[2] is None or mtime > totals[2]):
+            totals[2] = mtime
+
+    def top(self, number=None):
+        """(group, count, size, newest) of each group, largest first.
+
+        Largest is by size, then count. Past number groups, the rest are
+        added up into one more, with a group of None.
+        """
+        groups = sorted(
+            self._groups.items(),
+            key=lambda item: (-item[1][1], -item[1][0], str(item[0])),
+        )
+        rows = [(group, *totals) for group, totals in groups[:number]]
+        if number is not None and (rest := groups[number:]):
+            rows.append((
+                None,
+                sum(count for _, (count, _, _) in rest),
+                sum(size for _, (_, size, _) in rest),
+                max(
+                    (
+                        newest
+                        for _, (_, _, newest) in rest
+                        if newest is not None
+                    ),
+                    default=None,
+                ),
+            ))
+        return rows
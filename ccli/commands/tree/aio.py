@@ -0,0 +1,196 @@
+"""`ccli tree` for asyncio: the rows of a tree, from an async generator.
+
+atree() yields the rows `ccli tree` would print, in the same order,
+without blocking the event loop: each row (its stats, and the listing of
+what's beneath it) is made by a Tree on an executor thread. The next few
+rows are made ahead of the one being yielded, up to a limit, so a slow
+consumer doesn't let the work (or its memory) run ahead without bound.
+"""
+import asyncio
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .backends import open_backend
+from .browse import BrowseTree
+from .main import Tree
+
+# A row of the tree. segments are its (text, color, attrs), as termcolor
+# would print them, and text the row without colors.
+Row = namedtuple("Row", ("path", "depth", "text", "segments"))
+
+# A path given to atree, with its backend and device (for -x).
+_Root = namedtuple("_Root", ("backend", "dev"))
+
+
+class _Node:
+    """A row still to be yielded, and the future making it (once started)."""
+
+    def __init__(self, root, path, prefix, widths, depth):
+        self.root = root
+        self.path = path
+        self.prefix = prefix
+        self.widths = widths
+        self.depth = depth
+        self.future = None
+
+
+class _RowTree(BrowseTree):
+    """A BrowseTree that makes whole rows, like _run prints them."""
+
+    def row(self, path, prefix, widths):
+        """The segments of path's row, and its children (see _print_row)."""
+        self._segments = []
+        self._widths = widths
+        children, widths = self._print_row(path=path, _prefix=prefix)
+        return self._segments, children, widths
+
+
+class _Trees:
+    """A _RowTree for each executor thread, sharing what's been entered.
+
+    The paths entered are shared so that -l doesn't go round in circles.
+    """
+
+    def __init__(self, options):
+        self._options = options
+        self._local = threading.local()
+        self._resolved_paths = set()
+        self._trees = []
+
+    def close(self, loop):
+        """Close the trees, off the event loop, as hashes may be running."""
+        for tree in self._trees:
+            loop.run_in_executor(None, tree.close)
+
+    def root(self, path):
+        """The _Root for a path given to atree, or None if it's missing."""
+        tree = self._tree()
+        backend = open_backend(
+            path,
+            archives=tree.archives,
+            listings=Tree._listings,
+            statx=tree._statx,
+            dir_fds=tree._dir_fds,
+        )
+        if not (backend.exists(path) or backend.islink(path)):
+            return None
+        tree._fs = backend
+        stats = tree._get_stats(path)
+        tree._walker.forget(path)
+        return _Root(backend=backend, dev=stats and stats.st_dev)
+
+    def row(self, node):
+        tree = self._tree()
+        tree._fs = node.root.backend
+        tree._root_dev = node.root.dev
+        return tree.row(node.path, node.prefix, node.widths)
+
+    def _tree(self):
+        tree = getattr(self._local, "tree", None)
+        if tree is None:
+            tree = self._local.tree = _RowTree(**self._options)
+            tree._resolved_paths = self._resolved_paths
+            self._trees.append(tree)
+        return tree
+
+
+def _options(paths, options):
+    """Tree's keyword arguments: options, defaulted like `ccli tree`."""
+    from .cli import tree
+    defaults = tree.make_context("tree", [], resilient_parsing=True).params
+    if unknown := options.keys() - defaults.keys():
+        raise TypeError(f"Unknown options: {', '.join(sorted(unknown))}")
+    options = {**defaults, **options}
+    if options.pop("sort_by_size"):
+        options["sort"] = "size"
+    return {
+        **options,
+        "jobs": 1,
+        "max_entries": None,
+        "output_format": "text",
+        "paths": paths,
+        "progress": False,
+    }
+
+
+def _start(stack, in_flight, limit, loop, executor, trees):
+    """Start making rows, in order, while fewer than limit are in flight.
+
+    The next row is started whatever the limit, so the walk goes on.
+    Returns how many rows are in flight.
+    """
+    first = True
+    for frame in reversed(stack):
+        for node in frame:
+            if in_flight >= limit and not first:
+                return in_flight
+            if node.future is None:
+                node.future = loop.run_in_executor(executor, trees.row, node)
+                in_flight += 1
+            first = False
+    return in_flight
+
+
+async def atree(*paths, limit=8, executor=None, **options):
+    """Yield the Rows `ccli tree` would print for paths, in order.
+
+    options are `ccli tree`'s, by their keyword names (list_hidden,
+    size, sort...), defaulting as on the command line; --dir-timeout,
+    --max-entries, the summary and summary_by don't apply, nor does
+    bytes_paths: paths given as bytes are listed as bytes, and their
+    rows' text is decoded as undecodable says. Rows are made on executor
+    (a ThreadPoolExecutor of limit threads, by default), at most limit
+    at a time besides the one being waited for; with follow_links, one
+    at a time, since which of the links to a directory is entered
+    depends on the rows before it. Closing the generator, or cancelling
+    the task that's iterating over it, stops the walk: rows not yet
+    started are cancelled.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1.")
+    options = _options(paths or (".",), options)
+    if options["follow_links"]:
+        limit = 1
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=limit)
+    trees = _Trees(options)
+    stack = []
+    in_flight = 0
+    try:
+        for path in options["paths"]:
+            root = await loop.run_in_executor(executor, trees.root, path)
+            if root is None:
+                continue
+            stack.append(deque([_Node(root, path, "", {}, depth=0)]))
+            while stack:
+                if not stack[-1]:
+                    stack.pop()
+                    continue
+                in_flight = _start(
+                    stack, in_flight, limit, loop, executor, trees,
+                )
+                node = stack[-1][0]
+                segments, children, widths = await node.future
+                stack[-1].popleft()
+                in_flight -= 1
+                yield Row(
+                    path=node.path,
+                    depth=node.depth,
+                    text="".join(text for text, _, _ in segments),
+                    segments=segments,
+                )
+                stack.append(deque(
+                    _Node(root, child, prefix, widths, depth=node.depth + 1)
+                    for child, prefix in children
+                ))
+    finally:
+        for frame in stack:
+            for node in frame:
+                if node.future is not None:
+                    node.future.cancel()
+        trees.close(loop)
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,371 @@
+"""Filesystems that Tree can list.
+
+A backend answers the handful of questions Tree asks about paths
+(listing, stat, link checks and path manipulation). LocalBackend (in
+ccli.backends, since the walker uses it too) asks the operating system;
+the ones here serve the contents of an archive from memory, so archives
+are listed without being extracted.
+"""
+import errno
+import itertools
+import os
+import posixpath
+import stat
+import tarfile
+import time
+import zipfile
+from functools import partial
+
+from ...backends import LocalBackend
+
+_MAX_SYMLINKS = 40
+
+
+def make_stats(
+    mode,
+    size=0,
+    mtime=0.0,
+    uid=0,
+    gid=0,
+    ino=0,
+    dev=0,
+    nlink=1,
+):
+    """Build an os.stat_result for something that isn't on disk."""
+    mtime_ns = int(mtime * 10**9)
+    return os.stat_result((
+        mode, ino, dev, nlink, uid, gid, size,
+        int(mtime), int(mtime), int(mtime),
+        mtime, mtime, mtime,
+        mtime_ns, mtime_ns, mtime_ns,
+    ))
+
+
+class MemoryBackend:
+    """A filesystem held in memory, rooted at root.
+
+    Paths look like paths on disk that start with root (for an archive,
+    the archive's own path). Directories are created implicitly for
+    every added path, so archives without directory entries still list
+    correctly.
+    """
+    local = False
+
+    def __init__(self, root, mtime=0.0):
+        self.root = root
+        self._mtime = mtime
+        self._inodes = itertools.count(1)
+        self._stats = {}
+        self._children = {}
+        self._targets = {}
+        self._children[""] = {}
+        self._stats[""] = make_stats(
+            mode=stat.S_IFDIR | 0o755,
+            mtime=mtime,
+            ino=next(self._inodes),
+            nlink=2,
+        )
+
+    def add(self, path, stats, target=None):
+        """Add a path relative to the root, replacing any existing one.
+
+        target is required for symbolic links.
+        """
+        key = posixpath.normpath(path.strip("/"))
+        if key == "." or key == ".." or key.startswith("../"):
+            return  # The root itself, or somewhere outside of it.
+        parent, name = posixpath.split(key)
+        self._mkdir(parent)
+        if stat.S_ISDIR(stats.st_mode):
+            self._children.setdefault(key, {})
+        if stat.S_ISLNK(stats.st_mode):
+            self._targets[key] = target
+        if not stats.st_ino:
+            stats = make_stats(
+                mode=stats.st_mode,
+                size=stats.st_size,
+                mtime=stats.st_mtime,
+                uid=stats.st_uid,
+                gid=stats.st_gid,
+                ino=next(self._inodes),
+                nlink=stats.st_nlink,
+            )
+        self._stats[key] = stats
+        self._children[parent][name] = None
+
+    def _mkdir(self, key):
+        if key not in self._children:
+            self.add(key, make_stats(
+                mode=stat.S_IFDIR | 0o755,
+                mtime=self._mtime,
+                nlink=2,
+            ))
+
+    def _key(self, path):
+        """Path relative to the root, or None if it's outside the root."""
+        path = posixpath.normpath(path)
+        root = posixpath.normpath(self.root)
+        if path == root:
+            return ""
+        if path.startswith(root.rstrip("/") + "/"):
+            return path[len(root.rstrip("/")) + 1:]
+        return None
+
+    def _resolve(self, key, follow=True):
+        """Resolve symbolic links in the key, like os.path.realpath.
+
+        The last part is only resolved if follow is true. Raises
+        FileNotFoundError if any part doesn't exist.
+        """
+        if key is None:
+            raise FileNotFoundError(errno.ENOENT, "No such file", key)
+        resolved = ""
+        parts = [part for part in key.split("/") if part not in ("", ".")]
+        hops = 0
+        while parts:
+            part = parts.pop(0)
+            if part == "..":
+                resolved = posixpath.dirname(resolved)
+                continue
+            candidate = posixpath.join(resolved, part)
+            if candidate not in self._stats:
+                raise FileNotFoundError(errno.ENOENT, "No such file", key)
+            if candidate in self._targets and (parts or follow):
+                hops += 1
+                if hops > _MAX_SYMLINKS:
+                    raise OSError(errno.ELOOP, "Too many links", key)
+                target = self._targets[candidate]
+                if target.startswith("/"):
+                    raise FileNotFoundError(errno.ENOENT, "Outside", key)
+                parts[:0] = [
+                    part for part in target.split("/")
+                    if part not in ("", ".")
+                ]
+                continue
+            resolved = candidate
+        return resolved
+
+    def _path(self, key):
+        return posixpath.join(self.root, key) if key else self.root
+
+    @staticmethod
+    def basename(path):
+        return posixpath.basename(path)
+
+    def exists(self, path):
+        try:
+            self.stat(path)
+        except OSError:
+            return False
+        return True
+
+    def isdir(self, path):
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def islink(self, path):
+        try:
+            return stat.S_ISLNK(self.lstat(path).st_mode)
+        except OSError:
+            return False
+
+    @staticmethod
+    def join(path, *paths):
+        return posixpath.join(path, *paths)
+
+    def listdir(self, path):
+        key = self._resolve(self._key(path))
+        if key not in self._children:
+            raise NotADirectoryError(errno.ENOTDIR, "Not a directory", path)
+        return list(self._children[key])
+
+    def lstat(self, path):
+        return self._stats[self._resolve(self._key(path), follow=False)]
+
+    def readlink(self, path):
+        key = self._resolve(self._key(path), follow=False)
+        if key not in self._targets:
+            raise OSError(errno.EINVAL, "Not a symbolic link", path)
+        return self._targets[key]
+
+    def realpath(self, path):
+        try:
+            return self._path(self._resolve(self._key(path)))
+        except OSError:
+            return posixpath.normpath(path)
+
+    def scandir(self, path):
+        return [
+            MemoryEntry(self, self.join(path, name))
+            for name in self.listdir(path)
+        ]
+
+    def stat(self, path):
+        return self._stats[self._resolve(self._key(path))]
+
+
+class MemoryEntry:
+    """Stand-in for os.DirEntry, from MemoryBackend.scandir()."""
+
+    def __init__(self, backend, path):
+        self._backend = backend
+        self.path = path
+        self.name = posixpath.basename(path)
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return stat.S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        return self._backend.islink(self.path)
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return self._backend.stat(self.path)
+        return self._backend.lstat(self.path)
+
+
+class ZipBackend(MemoryBackend):
+    """A zip archive (or wheel, jar, ...), read from its central directory.
+
+    Only symbolic links need their data read, to find their targets.
+    """
+
+    def __init__(self, root):
+        super().__init__(root, mtime=os.stat(root).st_mtime)
+        with zipfile.ZipFile(root) as archive:
+            for info in archive.infolist():
+                mode = info.external_attr >> 16
+                if info.create_system != 3 or not stat.S_IFMT(mode):
+                    # Not made on Unix, so there's no mode to go by.
+                    mode = (
+                        stat.S_IFDIR | 0o755 if info.is_dir()
+                        else stat.S_IFREG | 0o644
+                    )
+                target = None
+                if stat.S_ISLNK(mode):
+                    target = archive.read(info).decode()
+                self.add(info.filename, make_stats(
+                    mode=mode,
+                    size=info.file_size,
+                    mtime=time.mktime(info.date_time + (0, 0, -1)),
+                ), target=target)
+
+
+class TarBackend(MemoryBackend):
+    """A (possibly compressed) tar archive, read in a single pass."""
+
+    def __init__(self, root):
+        super().__init__(root, mtime=os.stat(root).st_mtime)
+        with tarfile.open(root, mode="r|*") as archive:
+            for member in archive:
+                if member.islnk():
+                    # Hardlinks share the stats of what they link to.
+                    target = posixpath.normpath(member.linkname.strip("/"))
+                    if target in self._stats:
+                        self.add(member.name, self._stats[target])
+                        continue
+                if member.isdir():
+                    file_type = stat.S_IFDIR
+                elif member.issym():
+                    file_type = stat.S_IFLNK
+                elif member.ischr():
+                    file_type = stat.S_IFCHR
+                elif member.isblk():
+                    file_type = stat.S_IFBLK
+                elif member.isfifo():
+                    file_type = stat.S_IFIFO
+                else:
+                    file_type = stat.S_IFREG
+                self.add(member.name, make_stats(
+                    mode=file_type | stat.S_IMODE(member.mode),
+                    size=member.size,
+                    mtime=member.mtime,
+                    uid=member.uid,
+                    gid=member.gid,
+                ), target=member.linkname if member.issym() else None)
+
+
+class TimeoutBackend:
+    """Another backend, with a time limit on each filesystem call.
+
+    The calls run on the watchdog's threads. Paths whose calls time out
+    are appended to timed_out, and further calls for them (or anything
+    under them) fail straight away instead of waiting again, since a
+    stale NFS handle stays stale. Calls that time out raise TimeoutError.
+
+    timed_out may be shared with other backends: what they append is
+    picked up on the next call. The paths are also kept in a set, as
+    they are (str or bytes), so a call only looks up the path and its
+    parents.
+    """
+    _CALLS = frozenset((
+        "exists",
+        "isdir",
+        "islink",
+        "listdir",
+        "lstat",
+        "readlink",
+        "realpath",
+        "scandir",
+        "stat",
+    ))
+
+    def __init__(self, backend, watchdog, timed_out):
+        self._backend = backend
+        self._watchdog = watchdog
+        self.timed_out = timed_out
+        self._timed_out_set = set()
+        self._timed_out_seen = 0  # How many of timed_out are in the set.
+
+    def __getattr__(self, name):
+        attribute = getattr(self._backend, name)
+        if name in self._CALLS:
+            return partial(self._call, attribute)
+        return attribute
+
+    def _call(self, function, path):
+        path = os.fspath(path)
+        if self._under_timed_out(path):
+            raise TimeoutError(errno.ETIMEDOUT, "Timed out before", path)
+        try:
+            return self._watchdog.call(function, path)
+        except TimeoutError:
+            self.timed_out.append(path)
+            raise
+
+    def _under_timed_out(self, path):
+        """Whether path, or a directory above it, has timed out."""
+        if self._timed_out_seen < len(self.timed_out):
+            for timed_out in self.timed_out[self._timed_out_seen:]:
+                sep = b"/" if isinstance(timed_out, bytes) else "/"
+                self._timed_out_set.add(timed_out.rstrip(sep) or timed_out)
+            self._timed_out_seen = len(self.timed_out)
+        if not self._timed_out_set:
+            return False
+        while path not in self._timed_out_set:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+        return True
+
+
+def open_backend(
+    path,
+    archives=False,
+    listings=None,
+    statx=None,
+    dir_fds=None,
+):
+    """Pick the backend for a path given on the command line."""
+    if archives and os.path.isfile(path):
+        if zipfile.is_zipfile(path):
+            return ZipBackend(path)
+        if tarfile.is_tarfile(path):
+            return TarBackend(path)
+    return LocalBackend(listings=listings, statx=statx, dir_fds=dir_fds)
@@ -0,0 +1,438 @@
+"""Interactive browser for `ccli tree --browse`.
+
+Directories are listed (and their entries stat()ed) only when they're
+expanded, so trees far too big to print can still be explored. The
+directory under the cursor is listed in the background before it's
+expanded, and listings are kept in a bounded least-recently-used cache.
+"""
+import curses
+import re
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .backends import open_backend
+from .checksum import Checksums
+from .colors import Sgr
+from .main import Tree
+
+_MAX_LISTINGS = 256
+
+# termcolor's names, in the order of the ANSI (and curses) color numbers.
+_COLORS = (
+    "black",
+    "red",
+    "green",
+    "yellow",
+    "blue",
+    "magenta",
+    "cyan",
+    "white",
+)
+_ATTRS = {
+    "blink": curses.A_BLINK,
+    "bold": curses.A_BOLD,
+    "concealed": curses.A_INVIS,
+    "dark": curses.A_DIM,
+    "reverse": curses.A_REVERSE,
+    "underline": curses.A_UNDERLINE,
+}
+_SGR_ATTRS = {
+    1: curses.A_BOLD,
+    2: curses.A_DIM,
+    4: curses.A_UNDERLINE,
+    5: curses.A_BLINK,
+    7: curses.A_REVERSE,
+    8: curses.A_INVIS,
+}
+
+# _print_path wraps $LS_COLORS colors in their escape sequences.
+_WRAPPED = re.compile(r"(\033\[[0-9;]*m)(.*?)\033\[0m", re.DOTALL)
+
+_UP, _DOWN, _PAGE_UP, _PAGE_DOWN, _FIRST, _LAST = range(6)
+_KEYS = {
+    curses.KEY_UP: _UP,
+    ord("k"): _UP,
+    curses.KEY_DOWN: _DOWN,
+    ord("j"): _DOWN,
+    curses.KEY_PPAGE: _PAGE_UP,
+    curses.KEY_NPAGE: _PAGE_DOWN,
+    curses.KEY_HOME: _FIRST,
+    ord("g"): _FIRST,
+    curses.KEY_END: _LAST,
+    ord("G"): _LAST,
+}
+_EXPAND = frozenset((curses.KEY_RIGHT, curses.KEY_ENTER, ord("l"), 10))
+_COLLAPSE = frozenset((curses.KEY_LEFT, ord("h")))
+_QUIT = frozenset((ord("q"), 27))
+
+# A row on screen. parent is the index of the parent's row, or None.
+_Row = namedtuple("_Row", ("root", "path", "prefix", "widths", "parent"))
+
+
+def _color_number(name):
+    """The curses color for a termcolor color name (light_ or not)."""
+    name = name.replace("light_", "").replace("dark_", "")
+    return _COLORS.index("black" if name == "grey" else name)
+
+
+def _parse_sgr(sgr):
+    """The foreground, background and curses attributes of an Sgr."""
+    foreground = background = -1
+    attr = 0
+    codes = (int(code) for code in sgr[2:-1].split(";") if code)
+    for code in codes:
+        if code in (38, 48):
+            # 256 colors (5;n) and true color (2;r;g;b) aren't mapped.
+            for _ in range(1 if next(codes, 5) == 5 else 3):
+                next(codes, None)
+        elif code in _SGR_ATTRS:
+            attr |= _SGR_ATTRS[code]
+        elif 30 <= code <= 37:
+            foreground = code - 30
+        elif 90 <= code <= 97:
+            foreground = code - 90
+            attr |= curses.A_BOLD
+        elif 40 <= code <= 47:
+            background = code - 40
+    return foreground, background, attr
+
+
+class BrowseTree(Tree):
+    """A Tree that renders rows for the browser instead of printing them.
+
+    It's made without any paths, so nothing is listed up front.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**{
+            **kwargs,
+            "align_lookahead": None,
+            "dir_timeout": None,
+            "paths": (),
+            "report": False,
+            "summary_by": (),
+        })
+        self._segments = []
+        if self.checksum:
+            self._checksums = Checksums(self.checksum)  # Tree closed its own.
+
+    def close(self):
+        if self._checksums:
+            self._checksums.close()
+        if self._dir_fds:
+            self._dir_fds.close()
+
+    def listing(self, path):
+        """The names inside a directory, in order, and their widths.
+
+        The stats taken for sorting and measuring aren't kept, since the
+        rows are rendered by another BrowseTree.
+        """
+        names = self._ls(path)
+        widths = self._measure(
+            paths=[self._fs.join(path, name) for name in names],
+        )
+        self._walker.forget()
+        return names, widths
+
+    def render(self, path, prefix, widths):
+        """The (text, color, attrs) segments that _run would print."""
+        self._segments = []
+        self._widths = widths
+        color, attrs, _, _ = self._style(path)
+        self._cprint(
+            prefix,
+            color=self.tree_color,
+            attrs=self.tree_attrs,
+            end="",
+        )
+        self._print_inode(path=path)
+        self._print_permissions(path=path)
+        self._print_size(path=path)
+        self._print_mod_time(path=path)
+        self._print_checksum(path=path)
+        self._print_path(path=path, color=color, attrs=attrs)
+        self._walker.forget(path)
+        return self._segments
+
+    def _write(self, *args, color=None, attrs=(), end="\n", **kwargs):
+        text = " ".join(map(str, args)) + end.rstrip("\n")
+        if match := _WRAPPED.match(text):
+            color, text = Sgr(match[1]), match[2] + text[match.end():]
+        if text:
+            self._segments.append((text, color, attrs or ()))
+
+
+class _Listings:
+    """Least-recently-used listings, made on a background thread."""
+
+    def __init__(self, function, maxsize=_MAX_LISTINGS):
+        self.maxsize = maxsize
+        self._function = function
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = OrderedDict()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def discard(self, key):
+        self._futures.pop(key, None)
+
+    def get(self, key):
+        """The listing for key, waiting for it if it's still being made.
+
+        Raises whatever making it raised.
+        """
+        return self.load(key).result()
+
+    def load(self, key):
+        """Start making the listing for key, unless it's cached."""
+        if key in self._futures:
+            self._futures.move_to_end(key)
+            return self._futures[key]
+        future = self._futures[key] = self._executor.submit(
+            self._function,
+            *key,
+        )
+        while len(self._futures) > self.maxsize:
+            self._futures.popitem(last=False)[1].cancel()
+        return future
+
+
+class Browser:
+    """Which directories are expanded, the cursor, and the rows on screen.
+
+    Each path given is a root. Rows are identified by (root, path), since
+    every root may have a backend of its own (an archive, say).
+    """
+
+    def __init__(self, **kwargs):
+        self._tree = BrowseTree(**kwargs)
+        self._loader = BrowseTree(**kwargs)  # For the background thread.
+        self._listings = _Listings(self._list)
+        self._backends = []
+        self._root_devs = []
+        self._roots = []
+        for path in kwargs["paths"]:
+            backend = open_backend(
+                path,
+                archives=self._tree.archives,
+                listings=Tree._listings,
+                statx=self._tree._statx,
+                dir_fds=self._tree._dir_fds,
+            )
+            if not (backend.exists(path) or backend.islink(path)):
+                continue
+            self._backends.append(backend)
+            self._roots.append(path)
+            self._tree._fs = backend
+            stats = self._tree._get_stats(path)
+            self._tree._walker.forget(path)
+            self._root_devs.append(stats and stats.st_dev)
+        self._expanded = set()
+        self._errors = {}
+        self._rendered = {}
+        self._pairs = {}
+        self._colors = False
+        self.cursor = 0
+        self.top = 0
+        self.rows = []
+        self._flatten()
+
+    def close(self):
+        self._listings.close()
+        self._tree.close()
+        self._loader.close()
+
+    def _list(self, root, path):
+        self._loader._fs = self._backends[root]
+        return self._loader.listing(path)
+
+    def _use(self, root):
+        """The rendering tree, set up for the given root."""
+        self._tree._fs = self._backends[root]
+        self._tree._root_dev = self._root_devs[root]
+        return self._tree
+
+    def _add(self, root, path, prefix, widths, parent):
+        index = len(self.rows)
+        self.rows.append(_Row(root, path, prefix, widths, parent))
+        if (root, path) not in self._expanded:
+            return
+        try:
+            names, child_widths = self._listings.get((root, path))
+        except OSError as error:
+            self._fail(root, path, error)
+            return
+        prefix, prefixes = self._tree._child_prefixes(prefix, len(names))
+        for name, child_prefix in zip(names, prefixes):
+            self._add(
+                root,
+                self._backends[root].join(path, name),
+                prefix + child_prefix,
+                child_widths,
+                index,
+            )
+
+    def _expandable(self, row):
+        """Whether row is a directory that _run would enter."""
+        tree = self._use(row.root)
+        _, _, isdir, islink = tree._style(row.path)
+        tree._walker.forget(row.path)
+        return isdir and (tree.follow_links or not islink)
+
+    def _fail(self, root, path, error):
+        self._expanded.discard((root, path))
+        self._listings.discard((root, path))
+        self._errors[path] = error.strerror or str(error)
+
+    def _flatten(self):
+        """Rebuild the rows from the roots and what's expanded."""
+        self.rows = []
+        self._rendered = {}
+        for root, path in enumerate(self._roots):
+            self._add(root, path, prefix="", widths={}, parent=None)
+        self.cursor = max(0, min(self.cursor, len(self.rows) - 1))
+
+    def collapse(self):
+        """Collapse the directory under the cursor, or go to its parent."""
+        row = self.rows[self.cursor]
+        if (row.root, row.path) in self._expanded:
+            self._expanded.discard((row.root, row.path))
+            self._flatten()
+        elif row.parent is not None:
+            self.move(row.parent - self.cursor)
+
+    def expand(self):
+        """Expand the directory under the cursor, or go to its first entry.
+
+        Directories that _run wouldn't enter (mount points with -x, for
+        example) get the reason next to them instead.
+        """
+        row = self.rows[self.cursor]
+        if (row.root, row.path) in self._expanded:
+            self.move(1)
+            return
+        if not self._expandable(row):
+            return
+        tree = self._use(row.root)
+        if tree._checks_mounts and (
+            skip := tree._mount_skip(tree._get_stats(row.path))
+        ):
+            self._errors[row.path] = skip
+            self._rendered.pop(self.cursor, None)
+            return
+        self._expanded.add((row.root, row.path))
+        self._flatten()
+
+    def handle(self, key, height):
+        """Act on a key press. Returns False to quit."""
+        if key in _QUIT:
+            return False
+        if not self.rows:
+            return True
+        if key in _EXPAND:
+            self.expand()
+        elif key in _COLLAPSE:
+            self.collapse()
+        elif key in _KEYS:
+            self.move({
+                _UP: -1,
+                _DOWN: 1,
+                _PAGE_UP: -height,
+                _PAGE_DOWN: height,
+                _FIRST: -len(self.rows),
+                _LAST: len(self.rows),
+            }[_KEYS[key]])
+        return True
+
+    def lines(self, height):
+        """The segments of the rows on screen, scrolled to the cursor.
+
+        Only the rows on screen are rendered (and stat()ed), and only
+        their renderings are kept.
+        """
+        self.top = min(max(self.top, self.cursor - height + 1), self.cursor)
+        rendered = {}
+        for index in range(self.top, min(self.top + height, len(self.rows))):
+            if (segments := self._rendered.get(index)) is None:
+                row = self.rows[index]
+                tree = self._use(row.root)
+                if error := self._errors.get(row.path):
+                    tree._markers[row.path] = error
+                segments = tree.render(row.path, row.prefix, row.widths)
+            rendered[index] = segments
+        self._rendered = rendered
+        return list(rendered.values())
+
+    def move(self, delta):
+        """Move the cursor, and start listing the directory it lands on."""
+        if not self.rows:
+            return
+        self.cursor = max(0, min(self.cursor + delta, len(self.rows) - 1))
+        row = self.rows[self.cursor]
+        if (row.root, row.path) not in self._expanded and (
+            self._expandable(row)
+        ):
+            self._listings.load((row.root, row.path))
+
+    def _attr(self, color, attrs):
+        """The curses attribute for a termcolor color (or Sgr) and attrs."""
+        foreground = background = -1
+        attr = 0
+        if isinstance(color, Sgr):
+            foreground, background, attr = _parse_sgr(color)
+        elif color:
+            foreground = _color_number(color)
+        for name in attrs:
+            attr |= _ATTRS.get(name, 0)
+        if not self._colors or foreground == background == -1:
+            return attr
+        if (pair := self._pairs.get((foreground, background))) is None:
+            pair = self._pairs[foreground, background] = len(self._pairs) + 1
+            curses.init_pair(pair, foreground, background)
+        return attr | curses.color_pair(pair)
+
+    def draw(self, screen):
+        height, width = screen.getmaxyx()
+        screen.erase()
+        lines = self.lines(height)
+        for y, segments in enumerate(lines):
+            x = 0
+            highlight = (
+                curses.A_REVERSE if self.top + y == self.cursor else 0
+            )
+            for text, color, attrs in segments:
+                if x >= width - 1:
+                    break
+                screen.addnstr(
+                    y,
+                    x,
+                    text,
+                    width - 1 - x,
+                    self._attr(color, attrs) | highlight,
+                )
+                x += len(text)
+        screen.refresh()
+        return height
+
+    def run(self, screen):
+        """The main loop, for curses.wrapper."""
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass  # The terminal can't hide the cursor.
+        if self._tree._colored and curses.has_colors():
+            curses.use_default_colors()
+            self._colors = True
+        while self.handle(screen.getch(), self.draw(screen)):
+            pass
+
+
+def browse(**kwargs):
+    """Browse the paths until q (or escape) is pressed."""
+    browser = Browser(**kwargs)
+    try:
+        curses.wrapper(browser.run)
+    finally:
+        browser.close()
@@ -0,0 +1,89 @@
+import os
+import time
+from collections import OrderedDict
+
+
+class ListingCache:
+    """Least-recently-used cache of directory listings.
+
+    A listing is reused only while the directory's device, inode and
+    modification / change times are unchanged, so each lookup costs one
+    stat instead of reading the whole directory. Listings of directories
+    modified within the last few seconds aren't kept, because a second
+    change within the same timestamp tick wouldn't be noticed.
+    """
+    _RACY_NS = 2 * 10**9
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._listings = OrderedDict()
+
+    def listdir(self, path):
+        return self._lookup(path, "listdir", os.listdir)
+
+    def scandir(self, path):
+        """Like listdir, but CachedEntry objects for their types.
+
+        Only names and types are cached (the stats an os.DirEntry caches
+        may be stale, since changing a file doesn't change its
+        directory), and the entries' paths are built from path, since
+        listings are shared between callers with different working
+        directories.
+        """
+        return [
+            CachedEntry(path, name, isdir, islink)
+            for name, isdir, islink in self._lookup(path, "scandir", _scandir)
+        ]
+
+    def _lookup(self, path, kind, function):
+        stats = os.stat(path)
+        identity = (
+            stats.st_dev,
+            stats.st_ino,
+            stats.st_mtime_ns,
+            stats.st_ctime_ns,
+        )
+        key = (kind, os.path.abspath(path))
+        cached = self._listings.get(key)
+        if cached is not None and cached[0] == identity:
+            self._listings.move_to_end(key)
+            return cached[1]
+        listing = function(path)
+        if time.time_ns() - stats.st_mtime_ns > self._RACY_NS:
+            self._listings[key] = (identity, listing)
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.maxsize:
+                self._listings.popitem(last=False)
+        return listing
+
+
+class CachedEntry:
+    """Stand-in for os.DirEntry, from ListingCache.scandir()."""
+    __slots__ = ("name", "path", "_isdir", "_islink")
+
+    def __init__(self, directory, name, isdir, islink):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._isdir = isdir
+        self._islink = islink
+
+    def is_dir(self, follow_symlinks=True):
+        if follow_symlinks and self._islink:
+            return os.path.isdir(self.path)
+        return self._isdir
+
+    def is_symlink(self):
+        return self._islink
+
+
+def _scandir(path):
+    """Name, type and whether it's a link of each entry in path."""
+    with os.scandir(path) as entries:
+        return [
+            (
+                entry.name,
+                entry.is_dir(follow_symlinks=False),
+                entry.is_symlink(),
+            )
+            for entry in entries
+        ]
@@ -0,0 +1,125 @@
+import hashlib
+import mmap
+import stat
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+ALGORITHMS = ("sha256", "blake2b")
+_MMAP_THRESHOLD = 1 << 20  # Files at least this big are hashed via mmap.
+_READ_SIZE = 1 << 20
+
+
+def hash_file(path, algorithm, size):
+    """Return the hex digest of the file at path.
+
+    Large files are mapped into memory so hashlib can work on them
+    directly (and without holding the GIL); small ones are read in a
+    few large chunks.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as fh:
+        if size >= _MMAP_THRESHOLD:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                digest.update(view)
+        else:
+            for chunk in iter(partial(fh.read, _READ_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DigestCache:
+    """Least-recently-used cache of digests (as futures) between runs."""
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self._futures = OrderedDict()
+
+    def get(self, key):
+        future = self._futures.get(key)
+        if future is not None:
+            self._futures.move_to_end(key)
+        return future
+
+    def pop(self, key, default=None):
+        return self._futures.pop(key, default)
+
+    def __len__(self):
+        return len(self._futures)
+
+    def __setitem__(self, key, future):
+        self._futures[key] = future
+        self._futures.move_to_end(key)
+        while len(self._futures) > self.maxsize:
+            self._futures.popitem(last=False)
+
+
+class Checksums:
+    """Hash regular files on a worker pool.
+
+    Results are memoized by (st_dev, st_ino, st_size, st_mtime_ns), so
+    hardlinks and paths listed more than once are only hashed once per
+    run (or, with enable_caches(), while they're in the shared
+    DigestCache). submit() queues work ahead of time; result() waits for
+    it.
+    """
+    _digests = None  # A DigestCache, once enable_caches() is called.
+
+    def __init__(self, algorithm, workers=None):
+        self.algorithm = algorithm
+        self.width = hashlib.new(algorithm).digest_size * 2
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = {}
+        self._cache = {} if self._digests is None else self._digests
+
+    def close(self):
+        """Stop the pool, cancelling hashes that were never asked for.
+
+        They're forgotten, so a shared DigestCache doesn't keep them.
+        """
+        for key, future in self._pending.values():
+            if future.cancel():
+                self._cache.pop(key, None)
+        self._executor.shutdown()
+
+    @property
+    def pending(self):
+        """How many have been submitted but not asked for yet."""
+        return len(self._pending)
+
+    def result(self, path, stats):
+        """Return the digest for path, or None if it isn't a file.
+
+        Raises OSError if the file couldn't be read.
+        """
+        self.submit(path=path, stats=stats)
+        key, future = self._pending.pop(path, (None, None))
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except OSError:
+            self._cache.pop(key, None)
+            raise
+
+    def submit(self, path, stats):
+        """Start hashing path in the background if it's a regular file."""
+        if stats is None or not stat.S_ISREG(stats.st_mode):
+            return
+        if path in self._pending:
+            return
+        key = (
+            self.algorithm,
+            stats.st_dev,
+            stats.st_ino,
+            stats.st_size,
+            stats.st_mtime_ns,
+        )
+        if (future := self._cache.get(key)) is None:
+            future = self._cache[key] = self._executor.submit(
+                hash_file,
+                path,
+                self.algorithm,
+                stats.st_size,
+            )
+        self._pending[path] = (key, future)
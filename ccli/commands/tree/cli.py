@@ -1,6 +1,56 @@
 import click
+import time
 
 from ...commands import invoke_main
+from .aggregate import KEYS
+from .checksum import ALGORITHMS
+from .estimate import parse_budget
+from .names import UNDECODABLE
+from .predicates import parse_size, parse_time, parse_user
+from .render import FORMATS
+
+
+def _budget(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_budget(value)
+    except ValueError:
+        raise click.BadParameter(
+            "expected seconds (like 30s) or a number of calls (like 50000).",
+        ) from None
+
+
+def _size(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError:
+        raise click.BadParameter(
+            "expected bytes, or a number with K, M, G, T or P (like 10M).",
+        ) from None
+
+
+def _time(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_time(value, now=time.time())
+    except ValueError:
+        raise click.BadParameter(
+            "expected an age (like 90m, 36h or 2w) or a date (like "
+            "2024-05-01 or 2024-05-01T12:30).",
+        ) from None
+
+
+def _user(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return parse_user(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error)) from None
 
 
 @click.command()
@@ -71,6 +121,13 @@ from ...commands import invoke_main
 @click.option(
     "-u", "user", is_flag=True, help="Print the username (or UID #)."
 )
+@click.option(
+    "-x",
+    "one_file_system",
+    is_flag=True,
+    help="Stay on the filesystem of each path (mount points are marked "
+    "and counted, but not entered).",
+)
 @click.option(
     "-C", "force_color", is_flag=True, help="Turn on colors (overrides -n)."
 )
@@ -105,15 +162,114 @@ from ...commands import invoke_main
 #     "character not listed in brackets) and '|' separates alternate "
 #     "patterns).",
 # )
+@click.option(
+    "-S",
+    "sort_by_size",
+    is_flag=True,
+    help="Sort the output by size, largest first (--sort=size).",
+)
 # @click.option(
 #     "--filelimit",
 #     "file_limit",
 #     type=int,
 #     help="Do not descend directories that contain more than # entries.",
 # )
-# @click.option(
-#     "--dirsfirst", "dirs_first", help="List directories before files."
-# )
+@click.option(
+    "--align-lookahead",
+    "align_lookahead",
+    type=click.IntRange(min=0),
+    metavar="N",
+    help="Align columns across the whole listing instead of per "
+    "directory, holding back up to N lines to find the widths.",
+)
+@click.option(
+    "--archives",
+    "archives",
+    is_flag=True,
+    help="List the contents of zip / tar archives given as paths, without "
+    "extracting them.",
+)
+@click.option(
+    "--browse",
+    is_flag=True,
+    help="Explore the tree interactively, listing each directory only "
+    "when it's expanded (arrow keys or hjkl, q to quit).",
+)
+@click.option(
+    "--bytes-paths",
+    "bytes_paths",
+    is_flag=True,
+    help="List local paths as bytes, decoding names only to print them, "
+    "instead of decoding and encoding each name again for every call. "
+    "Names that aren't valid in the filesystem encoding are printed as "
+    "--undecodable says.",
+)
+@click.option(
+    "--checksum",
+    "checksum",
+    type=click.Choice(ALGORITHMS),
+    help="Print a checksum of each file's contents.",
+)
+@click.option(
+    "--count-each-root",
+    "count_each_root",
+    is_flag=True,
+    help="Count everything beneath each path in the summary, even where "
+    "paths overlap (like a, a/b). Otherwise what's beneath more than one "
+    "is only counted once.",
+)
+@click.option(
+    "--count-only",
+    "count_only",
+    is_flag=True,
+    help="Only print the file / directory summary. Much faster, since "
+    "nothing is formatted and few files need a stat.",
+)
+@click.option(
+    "--dir-timeout",
+    "dir_timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    metavar="SECONDS",
+    help="Give up on directories (and files) that don't answer within "
+    "SECONDS, e.g. on stale network mounts. They're marked, skipped, "
+    "and listed after the summary.",
+)
+@click.option(
+    "--diff",
+    "diff",
+    metavar="OTHER",
+    type=click.Path(exists=True),
+    help="Print only the branches that differ from OTHER (a directory or "
+    "a file saved with --save-snapshot).",
+)
+@click.option(
+    "--dir-fds",
+    "dir_fds",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Make each call relative to an open fd of its directory, "
+    "instead of on a full path the kernel looks up all over again, "
+    "keeping up to N directories open (no more than half the process's "
+    "fd limit). Calls fall back to full paths where no more can be "
+    "opened.",
+)
+@click.option(
+    "--dirsfirst",
+    "dirs_first",
+    is_flag=True,
+    help="List directories before files.",
+)
+@click.option(
+    "--estimate",
+    metavar="BUDGET",
+    callback=_budget,
+    help="Print an estimated summary instead of the tree: the top of the "
+    "tree is listed exactly and the rest sampled at random, for BUDGET "
+    "seconds (30s) or filesystem calls (50000). Estimates come with "
+    "their 95% confidence intervals (± ? where the samples can't tell), "
+    "and counts are only exact when nothing was left to sample. Symbolic "
+    "links aren't followed.",
+)
 @click.option(
     "--indent",
     default=4,
@@ -121,9 +277,50 @@ from ...commands import invoke_main
     type=int,
     help="Tree indent level (minimum of 2).",
 )
-# @click.option(
-#     "--inodes", is_flag=True, help="Print the inode number."
-# )
+@click.option(
+    "--inodes",
+    is_flag=True,
+    help="Print the inode number, and count unique inodes in the "
+    "summary (hard links to the same file count once).",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Print the subtrees of local paths on N worker processes, for "
+    "big trees on fast disks. The output is the same. Paths that overlap "
+    "(like a, a/b) are printed on one process.",
+)
+@click.option(
+    "--max-entries",
+    "max_entries",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Stop after listing N entries. The summary counts what was "
+    "listed, and says where it stopped.",
+)
+@click.option(
+    "--min-size",
+    "min_size",
+    metavar="SIZE",
+    callback=_size,
+    help="List only files of at least SIZE bytes (or K, M, G...).",
+)
+@click.option(
+    "--newer",
+    metavar="WHEN",
+    callback=_time,
+    help="List only files modified after WHEN: an age (like 90m, 36h, "
+    "2d or 1w) or a date (like 2024-05-01).",
+)
+@click.option(
+    "--no-sync",
+    is_flag=True,
+    help="Take stats from what network filesystems have cached, without "
+    "asking the server (statx's AT_STATX_DONT_SYNC; Linux only). They "
+    "may be out of date.",
+)
 @click.option(
     "--noreport",
     "report",
@@ -131,6 +328,93 @@ from ...commands import invoke_main
     default=True,
     help="Skip the file / directory summary.",
 )
+@click.option(
+    "--older",
+    metavar="WHEN",
+    callback=_time,
+    help="List only files modified before WHEN (like --newer).",
+)
+@click.option(
+    "--output-format",
+    "output_format",
+    type=click.Choice(FORMATS),
+    default="text",
+    show_default=True,
+    help="Write the tree as an HTML page (each directory collapsible, "
+    "in the colors of the terminal's) or a nested Markdown list, as "
+    "it's listed.",
+)
+@click.option(
+    "--progress",
+    is_flag=True,
+    help="Show how the listing is going on stderr: entries per second, "
+    "entries waiting to be listed, bytes seen (when sizes are looked up "
+    "anyway) and the directory being listed. Only on a terminal, and "
+    "not when the tree is printed to the same one.",
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Leave out directories with nothing listed beneath them (after "
+    "--newer, --older, --min-size and --user). Directories are looked "
+    "through before they're printed, up to the first thing listed.",
+)
+@click.option(
+    "--skip-fs-type",
+    "skip_fs_types",
+    multiple=True,
+    metavar="TYPE",
+    help="Never enter mounts of this filesystem type (e.g. nfs, "
+    "fuse.sshfs, or fuse for all FUSE mounts), found in "
+    "/proc/self/mountinfo. Can be repeated.",
+)
+@click.option(
+    "--save-snapshot",
+    "save_snapshot",
+    metavar="FILE",
+    help="Save the digests of the tree to FILE for a later --diff.",
+)
+@click.option(
+    "--sort",
+    type=click.Choice(["name", "size", "mtime", "version", "none"]),
+    help="Sort the output by name (the default), size (largest first), "
+    "mtime, version (numbers within names by value) or none (directory "
+    "order).",
+)
+@click.option(
+    "--summary-by",
+    "summary_by",
+    type=click.Choice(KEYS),
+    multiple=True,
+    help="After the summary, total the entries, their size (of files) and "
+    "the newest mtime by extension, owner, depth or type, as they're "
+    "counted. Can be repeated. With --count-only, only the totals are "
+    "worked out, not each entry's row.",
+)
+@click.option(
+    "--summary-top",
+    "summary_top",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Show only the N largest groups of each --summary-by, and the "
+    "rest added up into one.",
+)
+@click.option(
+    "--undecodable",
+    type=click.Choice(UNDECODABLE),
+    default="escape",
+    show_default=True,
+    help="How --bytes-paths prints names that aren't valid in the "
+    "filesystem encoding: their bad bytes as \\xNN escapes, replaced "
+    "with U+FFFD, or raw.",
+)
+@click.option(
+    "--user",
+    "owner",
+    metavar="NAME",
+    callback=_user,
+    help="List only files owned by NAME (a user name or UID).",
+)
 def tree(paths=(), **kwargs):
     """Pretty listing of directory structures.
 
@@ -138,5 +422,95 @@ def tree(paths=(), **kwargs):
     """
     if not paths:
         paths = (".",)
+    if kwargs["save_snapshot"] and len(paths) > 1:
+        raise click.UsageError("--save-snapshot takes a single path.")
+    if kwargs["dir_timeout"] and (kwargs["diff"] or kwargs["save_snapshot"]):
+        raise click.UsageError(
+            "--dir-timeout can't be used with --diff or --save-snapshot.",
+        )
+    if kwargs["count_only"] and (kwargs["diff"] or kwargs["save_snapshot"]):
+        raise click.UsageError(
+            "--count-only can't be used with --diff or --save-snapshot.",
+        )
+    if kwargs["browse"] and any(
+        kwargs[name]
+        for name in ("count_only", "diff", "dir_timeout", "save_snapshot")
+    ):
+        raise click.UsageError(
+            "--browse can't be used with --count-only, --diff, "
+            "--dir-timeout or --save-snapshot.",
+        )
+    if kwargs["bytes_paths"] and any(
+        kwargs[name] for name in ("browse", "diff", "save_snapshot")
+    ):
+        raise click.UsageError(
+            "--bytes-paths can't be used with --browse, --diff or "
+            "--save-snapshot.",
+        )
+    if kwargs["estimate"] and any(
+        kwargs[name]
+        for name in ("browse", "diff", "follow_links", "save_snapshot")
+    ):
+        raise click.UsageError(
+            "--estimate can't be used with --browse, --diff, -l or "
+            "--save-snapshot.",
+        )
+    filtered = kwargs["prune"] or any(
+        kwargs[name] is not None
+        for name in ("min_size", "newer", "older", "owner")
+    )
+    if filtered and any(
+        kwargs[name] for name in ("diff", "estimate", "save_snapshot")
+    ):
+        raise click.UsageError(
+            "--newer, --older, --min-size, --user and --prune can't be used "
+            "with --diff, --estimate or --save-snapshot.",
+        )
+    if kwargs["max_entries"] and any(
+        kwargs[name]
+        for name in ("browse", "diff", "estimate", "save_snapshot")
+    ):
+        raise click.UsageError(
+            "--max-entries can't be used with --browse, --diff, --estimate "
+            "or --save-snapshot.",
+        )
+    if kwargs["summary_by"] and (kwargs["jobs"] > 1 or any(
+        kwargs[name]
+        for name in ("browse", "diff", "estimate", "save_snapshot")
+    )):
+        raise click.UsageError(
+            "--summary-by can't be used with --browse, --diff, --estimate, "
+            "--jobs or --save-snapshot.",
+        )
+    if kwargs["output_format"] != "text" and (
+        kwargs["align_lookahead"] is not None or any(
+            kwargs[name] for name in ("browse", "diff", "save_snapshot")
+        )
+    ):
+        raise click.UsageError(
+            "--output-format can't be used with --align-lookahead, "
+            "--browse, --diff or --save-snapshot.",
+        )
+    if kwargs["jobs"] > 1 and (
+        kwargs["align_lookahead"] is not None or any(
+            kwargs[name]
+            for name in (
+                "browse",
+                "count_only",
+                "diff",
+                "estimate",
+                "follow_links",
+                "max_entries",
+                "save_snapshot",
+            )
+        ) or kwargs["output_format"] != "text"
+    ):
+        raise click.UsageError(
+            "--jobs can't be used with -l, --align-lookahead, --browse, "
+            "--count-only, --diff, --estimate, --max-entries, "
+            "--output-format or --save-snapshot.",
+        )
+    if kwargs.pop("sort_by_size"):
+        kwargs["sort"] = "size"
     kwargs["paths"] = paths
     invoke_main(package=__package__, kwargs=kwargs)
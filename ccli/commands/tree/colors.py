@@ -0,0 +1,147 @@
+"""Colors from $LS_COLORS, in the format dircolors(1) writes."""
+import os
+import stat
+from functools import lru_cache
+
+RESET = "\033[0m"
+
+# GNU ls's colors for the types $LS_COLORS doesn't mention.
+_DEFAULTS = {
+    "di": "01;34",
+    "ln": "01;36",
+    "pi": "33",
+    "so": "01;35",
+    "bd": "01;33",
+    "cd": "01;33",
+    "ex": "01;32",
+    "do": "01;35",
+    "su": "37;41",
+    "sg": "30;43",
+    "st": "37;44",
+    "ow": "34;42",
+    "tw": "30;42",
+}
+_TYPE_KEYS = {
+    stat.S_IFIFO: "pi",
+    stat.S_IFSOCK: "so",
+    stat.S_IFBLK: "bd",
+    stat.S_IFCHR: "cd",
+}
+
+
+class Sgr(str):
+    """A precompiled escape sequence, used in place of a termcolor color."""
+
+    def wrap(self, text):
+        return f"{self}{text}{RESET}"
+
+
+class LSColors:
+    """Lookup of $LS_COLORS by file type, mode bits and name.
+
+    Every code is turned into its escape sequence up front. Names are
+    matched by suffix, like ls, but without regard to case; the result
+    for everything from a name's first dot on is cached, so names with
+    the same extensions cost a single dict lookup.
+    """
+
+    def __init__(self, value):
+        codes = dict(_DEFAULTS)
+        suffixes = {}
+        for entry in value.split(":"):
+            key, sep, code = entry.partition("=")
+            if not sep:
+                continue
+            if key.startswith("*"):
+                suffixes[key[1:].casefold()] = code
+            else:
+                codes[key] = code
+        self._target = codes.get("ln") == "target"
+        if self._target:
+            del codes["ln"]
+        self._types = {
+            key: Sgr(f"\033[{code}m") if code else None
+            for key, code in codes.items()
+        }
+        self._dotted = {
+            suffix: Sgr(f"\033[{code}m")
+            for suffix, code in suffixes.items()
+            if suffix.startswith(".") and code
+        }
+        self._undotted = [
+            (suffix, Sgr(f"\033[{code}m"))
+            for suffix, code in suffixes.items()
+            if suffix and not suffix.startswith(".") and code
+        ]
+        self._by_tail = {}
+
+    def _by_name(self, name):
+        name = name.casefold()
+        for suffix, sgr in self._undotted:
+            if name.endswith(suffix):
+                return sgr
+        if (dot := name.find(".")) < 0:
+            return None
+        tail = name[dot:]
+        if tail not in self._by_tail:
+            self._by_tail[tail] = next(
+                (
+                    self._dotted[tail[index:]]
+                    for index in range(len(tail))
+                    if tail[index] == "." and tail[index:] in self._dotted
+                ),
+                None,
+            )
+        return self._by_tail[tail]
+
+    def lookup(self, name, stats, islink):
+        """The Sgr for a name, or None if it isn't colored.
+
+        stats are the stats of what the name refers to (following links),
+        or None if it doesn't exist.
+        """
+        if islink:
+            if stats is None:
+                return self._types.get("or") or self._types.get("ln")
+            if not self._target:
+                return self._types.get("ln")
+        elif stats is None:
+            return self._types.get("mi")
+        mode = stats.st_mode
+        if stat.S_ISDIR(mode):
+            sticky = mode & stat.S_ISVTX
+            writable = mode & stat.S_IWOTH
+            if sticky and writable and self._types.get("tw"):
+                return self._types["tw"]
+            if writable and self._types.get("ow"):
+                return self._types["ow"]
+            if sticky and self._types.get("st"):
+                return self._types["st"]
+            return self._types.get("di")
+        if not stat.S_ISREG(mode):
+            return self._types.get(_TYPE_KEYS.get(stat.S_IFMT(mode)))
+        for key, special in (
+            ("su", mode & stat.S_ISUID),
+            ("sg", mode & stat.S_ISGID),
+            ("ex", mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)),
+            ("mh", stats.st_nlink > 1),
+        ):
+            if special and self._types.get(key):
+                return self._types[key]
+        return self._by_name(name) or self._types.get("fi")
+
+
+@lru_cache(maxsize=1)
+def _parse(value):
+    return LSColors(value)
+
+
+def from_environ():
+    """LSColors for $LS_COLORS, or None if it isn't set.
+
+    Parsed once per value, so the daemon only parses it again when a
+    client's $LS_COLORS differs.
+    """
+    if value := os.environ.get("LS_COLORS"):
+        return _parse(value)
+    return None
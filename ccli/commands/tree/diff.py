@@ -0,0 +1,232 @@
+import click
+import hashlib
+import json
+import os
+import stat
+
+from ...walker import Listed
+from .backends import open_backend
+from .main import Tree
+from .statx import STATX_MTIME, STATX_SIZE
+
+
+class DiffTree(Tree):
+    """Print only the branches that differ between two trees.
+
+    Every directory gets a Merkle digest built from the names, types,
+    sizes and modification times of everything beneath it, so subtrees
+    with matching digests are skipped without descending into them.
+    """
+    added_color = "green"
+    changed_color = "yellow"
+    removed_color = "red"
+    status_attrs = ("bold",)
+    _MARKERS = {
+        "added": "+",
+        "changed": "~",
+        "removed": "-",
+    }
+
+    def _digest(self, path):
+        """Build the snapshot node for path (and everything beneath it)."""
+        stats = self._fs.lstat(path)
+        if stat.S_ISLNK(stats.st_mode):
+            node = {"type": "l", "target": self._fs.readlink(path)}
+        elif stat.S_ISDIR(stats.st_mode):
+            node = {"type": "d", "children": {}}
+            for name in self._fs.listdir(path):
+                if self._to_print(path, name):
+                    node["children"][name] = self._digest(
+                        self._fs.join(path, name),
+                    )
+        else:
+            node = {
+                "type": self._FILE_TYPE_MAP.get(stat.S_IFMT(stats.st_mode)),
+                "size": stats.st_size,
+                "mtime": stats.st_mtime_ns,
+            }
+        node["digest"] = self._hash(node)
+        return node
+
+    def _stat_mask(self):
+        """Snapshots take the sizes and modification times of files."""
+        return super()._stat_mask() | STATX_SIZE | STATX_MTIME
+
+    @staticmethod
+    def _hash(node):
+        """Hash a node from its own fields and its children's digests.
+
+        The name of the node itself is left out so that two differently
+        named roots with the same contents compare equal.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([
+            node["type"],
+            node.get("size"),
+            node.get("mtime"),
+            node.get("target"),
+        ]).encode())
+        for name, child in sorted(node.get("children", {}).items()):
+            digest.update(json.dumps([name, child["digest"]]).encode())
+        return digest.hexdigest()
+
+    def _load(self, path):
+        """Load a node from a directory or a saved snapshot.
+
+        Raises click.BadParameter for files that aren't snapshots.
+        """
+        if self._fs.isdir(path):
+            return self._digest(path)
+        with open(path, "rb") as fh:
+            try:
+                node = json.load(fh)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                node = None
+        if not isinstance(node, dict) or "digest" not in node:
+            raise click.BadParameter(
+                f"{path} is neither a directory nor a snapshot saved with "
+                "--save-snapshot.",
+                param_hint="'--diff'",
+            )
+        return node
+
+    def _measure_changes(self, old_path, new_path, changes):
+        """_measure the changes, each from the side it's printed from."""
+        self._fs = self._old_fs
+        widths = self._measure(paths=[
+            os.path.join(old_path, name)
+            for name, change in changes
+            if change == "removed"
+        ])
+        self._fs = self._new_fs
+        for column, width in self._measure(paths=[
+            os.path.join(new_path, name)
+            for name, change in changes
+            if change != "removed"
+        ]).items():
+            widths[column] = max(widths.get(column, 0), width)
+        return widths
+
+    def _print_status(self, path, node, status, _prefix):
+        self._cprint(
+            _prefix,
+            color=self.tree_color,
+            attrs=self.tree_attrs,
+            end="",
+        )
+        if status is not None:
+            self._cprint(
+                self._MARKERS[status],
+                color=getattr(self, f"{status}_color"),
+                attrs=self.status_attrs,
+                end=" ",
+            )
+            self._counter[status] += 1
+        self._print_inode(path=path)
+        self._print_permissions(path=path)
+        self._print_size(path=path)
+        self._print_mod_time(path=path)
+        self._print_checksum(path=path)
+        if self._ls_colors is not None:
+            color, attrs = self._ls_colors.lookup(
+                name=self._fs.basename(path),
+                stats=self._get_stats(path),
+                islink=node["type"] == "l",
+            ), ()
+        elif node["type"] == "d":
+            color, attrs = self.dir_color, self.dir_attrs
+        elif node["type"] == "l":
+            color, attrs = self.link_color, self.link_attrs
+        else:
+            color, attrs = self.file_color, self.file_attrs
+        self._print_path(path=path, color=color, attrs=attrs)
+        self._walker.forget(path)
+
+    def _render(self, old_path, new_path, old, new, status, _prefix=""):
+        """Recursively print the differences between two nodes.
+
+        Added and removed directories are printed as a single branch
+        without descending into them.
+        """
+        if status == "removed":
+            path, node, self._fs = old_path, old, self._old_fs
+        else:
+            path, node, self._fs = new_path, new, self._new_fs
+        self._print_status(
+            path=path,
+            node=node,
+            status=status,
+            _prefix=_prefix,
+        )
+        if status in ("added", "removed"):
+            return
+        if old["type"] != "d" or new["type"] != "d":
+            return
+        old_children = old["children"]
+        new_children = new["children"]
+        listed = [
+            Listed(name=name, isdir=(
+                new_children.get(name) or old_children[name]
+            )["type"] == "d")
+            for name in sorted(
+                old_children.keys() | new_children.keys(),
+                key=str.casefold,
+            )
+        ]
+        changes = []
+        for name, _ in self._walker.sort(new_path, listed):
+            if name not in new_children:
+                changes.append((name, "removed"))
+            elif name not in old_children:
+                changes.append((name, "added"))
+            elif old_children[name]["digest"] != new_children[name]["digest"]:
+                changes.append((name, "changed"))
+        _prefix, prefixes = self._child_prefixes(_prefix, len(changes))
+        widths = self._measure_changes(old_path, new_path, changes)
+        for (name, change), prefix in zip(changes, prefixes):
+            self._widths = widths
+            self._render(
+                old_path=os.path.join(old_path, name),
+                new_path=os.path.join(new_path, name),
+                old=old_children.get(name),
+                new=new_children.get(name),
+                status=change,
+                _prefix=_prefix + prefix,
+            )
+
+    def _run(self, path, _prefix=""):
+        self._new_fs = self._fs
+        new = self._digest(path)
+        if self.save_snapshot:
+            with open(self.save_snapshot, "w") as fh:
+                json.dump(new, fh)
+        if self.diff:
+            self._fs = self._old_fs = open_backend(
+                self.diff,
+                archives=self.archives,
+                listings=self._listings,
+                statx=self._statx,
+                dir_fds=self._dir_fds,
+            )
+            old = self._load(self.diff)
+            changed = old["digest"] != new["digest"]
+            both_dirs = old["type"] == new["type"] == "d"
+            self._render(
+                old_path=self.diff,
+                new_path=path,
+                old=old,
+                new=new,
+                status="changed" if changed and not both_dirs else None,
+            )
+
+    def _summarize(self):
+        if not self.diff:
+            return
+        if not self._counter:
+            self._cprint("no differences")
+            return
+        self._cprint(", ".join(
+            f"{self._counter[status]} {status}"
+            for status in self._MARKERS
+            if self._counter[status]
+        ))
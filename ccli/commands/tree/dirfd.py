@@ -0,0 +1,175 @@
+"""Open directory fds, for `ccli tree --dir-fds`.
+
+A call on a full path makes the kernel look up every component of it
+again, which adds up in deep trees, and goes wrong if a directory above
+is renamed during the walk. With DirFds, LocalBackend makes its calls
+relative to an open fd of the path's directory instead (os.stat(name,
+dir_fd=...), os.scandir(fd)), and directories are opened relative to
+their parent's fd, so each call only looks up one name.
+
+The number of open fds is bounded, and where one can't be opened (the
+process is out of fds, or the directory can't be read) the calls fall
+back to the full path.
+"""
+import errno
+import os
+import resource
+import threading
+from collections import OrderedDict
+
+from .cache import CachedEntry
+
+_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)
+
+# The most fds are kept open, as a share of the process's limit: the
+# rest are left for listing directories and hashing files.
+_SHARE_OF_LIMIT = 0.5
+
+
+class DirFds:
+    """Open fds of directories, by path, for calls relative to them.
+
+    At most max_fds are open at a time, the least recently used closed
+    first. Each thread keeps (and closes) its own, so an fd is never
+    closed while another thread is making a call with it; those of
+    threads that have finished are closed when room is needed. If the
+    process runs out of fds, max_fds is lowered to the number open.
+    """
+
+    def __init__(self, max_fds):
+        self.max_fds = max_fds
+        self._open = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads = {}  # Each thread's fds, by path.
+
+    def at(self, path):
+        """(name, dir_fd) to make a call on path relative to its directory.
+
+        That's (path, None) if its directory isn't open and can't be.
+        """
+        directory, name = os.path.split(path)
+        if not directory or not name:
+            return path, None  # Relative to the working directory, or /.
+        fd = self.open(directory)
+        if fd is None:
+            return path, None
+        return name, fd
+
+    def close(self):
+        """Close every thread's fds. They're opened again as needed."""
+        with self._lock:
+            for fds in self._threads.values():
+                self._close(fds)
+
+    def open(self, directory):
+        """An open fd of directory, or None if it can't be opened."""
+        fds = self._fds()
+        fd = fds.get(directory)
+        if fd is not None:
+            fds.move_to_end(directory)
+            return fd
+        if not self._reserve(fds):
+            return None
+        parent, name = os.path.split(directory)
+        parent_fd = fds.get(parent) if name else None
+        try:
+            if parent_fd is None:
+                fd = os.open(directory, _FLAGS)
+            else:
+                fd = os.open(name, _FLAGS, dir_fd=parent_fd)
+        except OSError as error:
+            with self._lock:
+                self._open -= 1
+                if error.errno in (errno.EMFILE, errno.ENFILE):
+                    self.max_fds = self._open
+            return None
+        fds[directory] = fd
+        return fd
+
+    def listdir(self, directory):
+        """Like os.listdir(directory), but listed through its fd.
+
+        Returns None if it can't be: see _listing_fd.
+        """
+        fd = self._listing_fd(directory)
+        if fd is None:
+            return None
+        return os.listdir(fd)
+
+    def scandir(self, directory):
+        """Like os.scandir(directory), but listed through its fd.
+
+        Returns CachedEntry objects (an os.DirEntry listed from an fd has
+        no path), or None if it can't be: see _listing_fd.
+        """
+        fd = self._listing_fd(directory)
+        if fd is None:
+            return None
+        with os.scandir(fd) as entries:
+            return [
+                CachedEntry(
+                    directory,
+                    entry.name,
+                    entry.is_dir(follow_symlinks=False),
+                    entry.is_symlink(),
+                )
+                for entry in entries
+            ]
+
+    def _close(self, fds):
+        """Close fds, all of one thread's (with the lock held)."""
+        for fd in fds.values():
+            os.close(fd)
+        self._open -= len(fds)
+        fds.clear()
+
+    def _listing_fd(self, directory):
+        """The fd to list directory through, or None if it can't be.
+
+        That's if it can't be opened, or if it's bytes: names listed
+        through an fd are str, so bytes are listed by path.
+        """
+        if isinstance(directory, bytes):
+            return None
+        return self.open(directory)
+
+    def _fds(self):
+        """The calling thread's fds."""
+        fds = getattr(self._local, "fds", None)
+        if fds is None:
+            fds = self._local.fds = OrderedDict()
+            with self._lock:
+                self._threads[threading.current_thread()] = fds
+        return fds
+
+    def _reserve(self, fds):
+        """Count an fd about to be opened, making room for it first.
+
+        Returns False if there's no room: the other threads have them.
+        """
+        with self._lock:
+            if self._open >= self.max_fds:
+                for thread in list(self._threads):
+                    if not thread.is_alive():
+                        self._close(self._threads.pop(thread))
+            if self._open >= self.max_fds and fds:
+                os.close(fds.popitem(last=False)[1])
+                self._open -= 1
+            if self._open >= self.max_fds:
+                return False
+            self._open += 1
+            return True
+
+
+def open_dir_fds(max_fds):
+    """DirFds for at most max_fds, or None where dir_fd isn't supported.
+
+    max_fds is capped at a share of the process's fd limit.
+    """
+    if not (os.stat in os.supports_dir_fd and os.scandir in os.supports_fd):
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY:
+        max_fds = min(max_fds, int(soft * _SHARE_OF_LIMIT))
+    return DirFds(max_fds)
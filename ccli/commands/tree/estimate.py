@@ -0,0 +1,143 @@
+"""Estimates of what's in a tree, from a sample of it (--estimate).
+
+The top of the tree is listed exactly, breadth first, with half of the
+budget. Whatever is below the directories that are left is estimated
+with Knuth's random probes (Knuth 1975, "Estimating the efficiency of
+backtrack programs"): a probe starts at one of those directories, picked
+at random, and goes down one random subdirectory at a time, counting
+what it lists with the weight of how many directories it stands for.
+Every probe is an unbiased estimate, so their mean comes with a
+confidence interval from their spread.
+"""
+import math
+import random
+import time
+from collections import Counter, deque, namedtuple
+
+# Spend either seconds or filesystem calls, whichever isn't None.
+Budget = namedtuple("Budget", ("seconds", "calls"))
+
+_Z_95 = 1.96  # Standard normal quantile for a 95% confidence interval.
+
+
+def parse_budget(text):
+    """A Budget from "<seconds>s" or a number of filesystem calls.
+
+    Raises ValueError for anything else.
+    """
+    if text.endswith("s"):
+        seconds = float(text[:-1])
+        if not seconds > 0:
+            raise ValueError(f"{text!r} isn't a positive number of seconds.")
+        return Budget(seconds=seconds, calls=None)
+    calls = int(text)
+    if calls <= 0:
+        raise ValueError(f"{text!r} isn't a positive number of calls.")
+    return Budget(seconds=None, calls=calls)
+
+
+class Estimate:
+    """Estimated totals for the tree below a directory.
+
+    listdir(directory) returns (path, key, size, enter) for what's in a
+    directory, where key is what the path counts as, size is added to
+    "bytes", and enter says whether to go into it. Each entry is taken
+    to cost a filesystem call, as does the listing itself.
+    """
+
+    def __init__(self, budget, listdir, rng=None, clock=time.monotonic):
+        self.budget = budget
+        self.calls = 0
+        self.exact = Counter()
+        self.probes = []
+        self._listdir = listdir
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._start = clock()
+        self._frontier = []
+
+    def _list(self, directory):
+        listing = self._listdir(directory)
+        self.calls += 1 + len(listing)
+        return listing
+
+    def _spent(self, fraction=1):
+        if self.budget.calls is not None:
+            return self.calls >= self.budget.calls * fraction
+        return self._clock() - self._start >= self.budget.seconds * fraction
+
+    def _probe(self):
+        totals = Counter()
+        weight = len(self._frontier)
+        directory = self._rng.choice(self._frontier)
+        while True:
+            children = []
+            for path, key, size, enter in self._list(directory):
+                totals[key] += weight
+                totals["bytes"] += weight * size
+                if enter:
+                    children.append(path)
+            if not children:
+                return totals
+            directory = self._rng.choice(children)
+            weight *= len(children)
+
+    def run(self, directory):
+        """List the top of the tree, then probe until the budget is spent.
+
+        There's always at least one probe (if anything's left to probe).
+        """
+        todo = deque([directory])
+        while todo and not self._spent(0.5):
+            for path, key, size, enter in self._list(todo.popleft()):
+                self.exact[key] += 1
+                self.exact["bytes"] += size
+                if enter:
+                    todo.append(path)
+        self._frontier = list(todo)
+        while self._frontier and not (self.probes and self._spent()):
+            self.probes.append(self._probe())
+        return self
+
+    @property
+    def sampled(self):
+        """The keys that the probes came across, in the order they did."""
+        keys = {}
+        for probe in self.probes:
+            keys.update(dict.fromkeys(probe))
+        return keys
+
+    def results(self):
+        """Map each key to its estimate and that estimate's variance.
+
+        The variance is 0 for exact counts, which they all are when
+        nothing was left to probe. Otherwise every key is estimated,
+        since what wasn't listed can hold any of them, and the variance
+        is None when the probes give nothing to judge the spread by:
+        there's a single probe, or none came across the key.
+        """
+        number = len(self.probes)
+        sampled = self.sampled
+        keys = dict.fromkeys(self.exact)
+        keys.update(dict.fromkeys(sampled))
+        results = {}
+        for key in sorted(keys, key=lambda key: key == "bytes"):
+            if not self.probes:
+                results[key] = self.exact[key], 0
+                continue
+            values = [probe[key] for probe in self.probes]
+            mean = sum(values) / number
+            variance = None
+            if number > 1 and key in sampled:
+                variance = sum(
+                    (value - mean) ** 2 for value in values
+                ) / (number - 1) / number
+            results[key] = self.exact[key] + mean, variance
+        return results
+
+
+def margin(variance):
+    """Half the width of the 95% confidence interval, or None."""
+    if variance is None:
+        return None
+    return math.ceil(_Z_95 * math.sqrt(variance))
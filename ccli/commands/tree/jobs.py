@@ -0,0 +1,293 @@
+"""`ccli tree --jobs`: print a local tree's subtrees on worker processes.
+
+Printing a tree on a fast disk is bound by Python's per-entry work, and
+threads don't help with that. So the top of the tree is printed a level
+at a time until there are enough entries beneath it to go around
+(_TASKS_PER_JOB per job). The rest go to a process pool in runs of
+siblings; whichever worker is idle takes the next run off the pool's
+queue, so a worker that got a large subtree doesn't hold the others up.
+
+Each run comes back as a Block of printed rows, which are written out in
+their places, so the output is exactly what _run would print. What the
+rows add to the summary comes back recorded rather than counted, and is
+counted in the same order as the rows, since that decides which of the
+paths to the same place gets counted.
+
+A worker stops after _ROWS_PER_BLOCK rows, and what it didn't get to
+comes back with the Block, to be split into runs again in its place, so
+a large subtree is spread over the workers too. Runs are only sent as
+far ahead of the rows being written as _TASKS_PER_JOB per job, so that's
+as many finished Blocks as wait to be written.
+"""
+import io
+import math
+import multiprocessing
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from .backends import TimeoutBackend
+from .checksum import Checksums
+from .main import Tree
+
+_TASKS_PER_JOB = 8
+_ROWS_PER_BLOCK = 1000
+
+# Rows printed by a JobTree, with what they add to the summary: records
+# of (path, resolved, key, hardlink) from Tree._registration, with a path
+# of None for other counts, and the paths that timed out. rest is the
+# (path, prefix, widths) of each entry it stopped before, in order, for
+# printing with what's beneath it.
+Block = namedtuple("Block", ("rows", "records", "timed_out", "rest"))
+
+
+class _Recorder:
+    """Stands in for a JobTree's Counter, recording each count in order."""
+
+    def __init__(self, records):
+        self._records = records
+
+    def __getitem__(self, key):
+        return 0
+
+    def __setitem__(self, key, value):
+        self._records.append((None, None, key, None))
+
+
+class _Subtree:
+    """An entry at the top of the tree, and where its rows come from.
+
+    block is its own row, once it's been printed, and children the
+    _Subtrees beneath it, or the runs of them that go to the workers.
+    """
+
+    def __init__(self, path, prefix, widths):
+        self.path = path
+        self.prefix = prefix
+        self.widths = widths
+        self.block = None
+        self.children = []
+
+
+class JobTree(Tree):
+    """A Tree that prints into Blocks, for another Tree to write out.
+
+    Like BrowseTree, it's made without any paths.
+    """
+
+    def __init__(self, root_dev=None, **kwargs):
+        super().__init__(**{
+            **kwargs,
+            "align_lookahead": None,
+            "jobs": 1,
+            "paths": (),
+            "progress": False,
+            "report": False,
+        })
+        self._root_dev = root_dev
+        self._records = []
+        self._counter = _Recorder(self._records)
+        self._timed_out_sent = 0
+        if self._watchdog:
+            self._fs = TimeoutBackend(
+                self._fs,
+                watchdog=self._watchdog,
+                timed_out=self._timed_out,
+            )
+        if self.checksum:
+            self._checksums = Checksums(self.checksum)  # Tree closed its own.
+
+    def close(self):
+        if self._checksums:
+            self._checksums.close()
+        if self._dir_fds:
+            self._dir_fds.close()
+
+    def block(self, entries):
+        """Print the (path, prefix, widths) entries and what's beneath them.
+
+        Like _run, but it stops after _ROWS_PER_BLOCK rows, and leaves
+        the rest to the Block's rest.
+        """
+        rows = io.StringIO()
+        todo = entries[::-1]  # What's next is last.
+        with redirect_stdout(rows):
+            for _ in range(_ROWS_PER_BLOCK):
+                if not todo:
+                    break
+                path, prefix, self._widths = todo.pop()
+                children, widths = self._print_row(path=path, _prefix=prefix)
+                todo.extend(
+                    (child, prefix, widths)
+                    for child, prefix in reversed(children)
+                )
+        return self._block(rows, rest=todo[::-1])
+
+    def expand(self, path, prefix, widths):
+        """Print path's row, and list its children, like _print_row."""
+        rows = io.StringIO()
+        with redirect_stdout(rows):
+            self._widths = widths
+            children, widths = self._print_row(path=path, _prefix=prefix)
+        return self._block(rows), children, widths
+
+    def _block(self, rows, rest=()):
+        block = Block(
+            rows=rows.getvalue(),
+            records=self._records[:],
+            timed_out=self._timed_out[self._timed_out_sent:],
+            rest=list(rest),
+        )
+        del self._records[:]
+        self._timed_out_sent = len(self._timed_out)  # Kept to fail fast.
+        return block
+
+    def _register_path(self, path):
+        """Record what to count for path; the Tree it's for counts it."""
+        try:
+            self._records.append((path, *self._registration(path)))
+        except TimeoutError:
+            pass
+
+
+_worker = None
+
+
+def _start_worker(options, root_dev):
+    global _worker
+    _worker = JobTree(root_dev=root_dev, **options)
+
+
+def _block(entries):
+    return _worker.block(entries)
+
+
+def _options(tree):
+    """The options for tree's JobTrees, which print to buffers."""
+    return {
+        **tree._options,
+        "force_color": tree._colored,
+        "no_color": not tree._colored,
+    }
+
+
+def _pool(tree):
+    """tree's pool of workers, started the first time it's needed."""
+    if tree._pool is None:
+        tree._pool = ProcessPoolExecutor(
+            max_workers=tree.jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_start_worker,
+            initargs=(_options(tree), getattr(tree, "_root_dev", None)),
+        )
+    return tree._pool
+
+
+def _write(tree, block):
+    """Write a Block's rows, and count what they add to the summary."""
+    sys.stdout.write(block.rows)
+    for path, resolved, key, hardlink in block.records:
+        if path is None:
+            tree._counter[key] += 1
+        elif path not in tree._resolved_paths:
+            tree._count_registration(resolved, key, hardlink)
+    tree._timed_out.extend(block.timed_out)
+
+
+def _pieces(subtree):
+    """subtree's Block, and the runs and Blocks beneath it, in order."""
+    yield subtree.block
+    for child in subtree.children:
+        if isinstance(child, _Subtree):
+            yield from _pieces(child)
+        else:
+            yield child
+
+
+def _print(tree, pieces):
+    """Write the pieces (Blocks, and runs for the workers) in order.
+
+    At most _TASKS_PER_JOB runs per job are sent ahead of what's been
+    written; what a Block stopped before is split into runs in its place.
+    """
+    pieces = deque(pieces)
+    sent = 0
+    while pieces:
+        sent = _send(tree, pieces, sent)
+        piece = pieces.popleft()
+        if isinstance(piece, Future):
+            piece = piece.result()
+            sent -= 1
+        _write(tree, piece)
+        if piece.rest:
+            size = math.ceil(len(piece.rest) / tree.jobs)
+            pieces.extendleft(reversed(_runs(piece.rest, size)))
+
+
+def _runs(entries, size):
+    """entries, in runs of size (up to _ROWS_PER_BLOCK) for the workers."""
+    size = min(size, _ROWS_PER_BLOCK)
+    return [
+        entries[start:start + size]
+        for start in range(0, len(entries), size)
+    ]
+
+
+def _send(tree, pieces, sent):
+    """Send runs from the front of pieces, until enough are out.
+
+    sent is how many futures there are in pieces; returns it with the
+    runs just sent.
+    """
+    index = 0
+    while sent < tree.jobs * _TASKS_PER_JOB and index < len(pieces):
+        if isinstance(pieces[index], list):
+            pieces[index] = _pool(tree).submit(_block, pieces[index])
+            sent += 1
+        index += 1
+    return sent
+
+
+def _split(tree, parents, frontier):
+    """Turn the frontier into runs of siblings, for the workers."""
+    size = math.ceil(len(frontier) / (tree.jobs * _TASKS_PER_JOB))
+    for parent in parents:
+        entries = [
+            (child.path, child.prefix, child.widths)
+            for child in parent.children
+        ]
+        parent.children = _runs(entries, size)
+
+
+def run_jobs(tree, path):
+    """Print path's tree like tree._run, on tree.jobs processes."""
+    top = _Subtree(path=path, prefix="", widths=tree._widths)
+    parents, frontier = [], [top]
+    expander = JobTree(
+        root_dev=getattr(tree, "_root_dev", None),
+        **_options(tree),
+    )
+    try:
+        while frontier and len(frontier) < tree.jobs * _TASKS_PER_JOB:
+            parents = []
+            for subtree in frontier:
+                subtree.block, children, widths = expander.expand(
+                    path=subtree.path,
+                    prefix=subtree.prefix,
+                    widths=subtree.widths,
+                )
+                subtree.children = [
+                    _Subtree(path=child, prefix=prefix, widths=widths)
+                    for child, prefix in children
+                ]
+                if children:
+                    parents.append(subtree)
+            frontier = [
+                child for parent in parents for child in parent.children
+            ]
+    finally:
+        expander.close()
+    if frontier:
+        _split(tree, parents, frontier)
+    _print(tree, _pieces(top))
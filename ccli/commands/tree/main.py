@@ -3,10 +3,41 @@ import math
 import os
 import pwd
 import stat
-from collections import Counter
+import sys
+import threading
+from collections import Counter, deque, namedtuple
+from contextlib import closing
 from datetime import datetime, timedelta
-from functools import partial, wraps
-from termcolor import cprint
+from functools import lru_cache, wraps
+from termcolor import colored
+
+from ...backends import LocalBackend
+from ...walker import Walker, hidden_prefix
+from .aggregate import Aggregates
+from .backends import TimeoutBackend, open_backend
+from .cache import ListingCache
+from .checksum import Checksums, DigestCache
+from .colors import Sgr, from_environ
+from .dirfd import open_dir_fds
+from .estimate import Estimate, margin
+from .mounts import NETWORK_FSTYPES, devices
+from .names import decode, raw_output
+from .predicates import Predicates
+from .progress import open_progress
+from .render import open_renderer
+from .statx import (
+    STATX_BASIC_STATS,
+    STATX_GID,
+    STATX_INO,
+    STATX_MODE,
+    STATX_MTIME,
+    STATX_NLINK,
+    STATX_SIZE,
+    STATX_TYPE,
+    STATX_UID,
+    open_statx,
+)
+from .watchdog import Watchdog
 
 
 def _default_missing(default):
@@ -27,6 +58,96 @@ def _default_missing(default):
     return decorator
 
 
+def _category(isdir, islink, exists):
+    """The summary category of a path, or None if it isn't counted."""
+    if islink:
+        if exists:
+            return "directory links" if isdir else "file links"
+        return "broken links"
+    if exists:
+        return "directories" if isdir else "files"
+    return None
+
+
+def _hardlink_key(stats):
+    """A compact key for a file with hard links, or None.
+
+    Only files with more than one link can share their inode with
+    another path, so only those need remembering, as a single int.
+    """
+    if stats is None or stats.st_nlink < 2 or stat.S_ISDIR(stats.st_mode):
+        return None
+    return stats.st_dev << 64 | stats.st_ino
+
+
+# How many files --checksum hashes ahead of the row being printed.
+_CHECKSUMS_AHEAD = 64
+
+
+class _Truncated(Exception):
+    """Raised to stop listing once --max-entries have been listed."""
+
+
+# What was printed and counted beneath a directory that more than one of
+# the paths given overlap in, for printing again wherever it's reached
+# next. base is the part of the prefixes that came from where it was, and
+# depth how far beneath its root it was.
+_Recording = namedtuple("_Recording", ("base", "depth", "events"))
+
+# The walker's reason (from Tree._prune) not to enter a directory that's
+# been counted already, where another of the paths overlaps it.
+_SHARED = object()
+
+
+def _dir_key(fs, path):
+    """The (device, inode) of a directory, or None for anything else."""
+    try:
+        stats = fs.stat(path)
+    except (OSError, ValueError):
+        return None
+    if not stat.S_ISDIR(stats.st_mode):
+        return None
+    return stats.st_dev, stats.st_ino
+
+
+def _overlaps(paths, fs):
+    """The _dir_key of each of paths that's inside another (or the same),
+    and of each that another is inside.
+
+    Only where paths really are counts (with .. and links resolved), not
+    where the links beneath them lead.
+    """
+    keys = [_dir_key(fs, path) for path in paths]
+    given = Counter(filter(None, keys))
+    shared = {key for key, number in given.items() if number > 1}
+    outer = set(shared)
+    for path, key in zip(paths, keys):
+        if key is None:
+            continue
+        parent = fs.realpath(path)
+        while (above := os.path.dirname(parent)) != parent:
+            parent = above
+            if (parent_key := _dir_key(fs, parent)) in given:
+                shared.add(key)
+                outer.add(parent_key)
+                break
+    return shared, outer
+
+
+@lru_cache(maxsize=None)
+def _group_name(gid):
+    return grp.getgrgid(gid)[0]
+
+
+@lru_cache(maxsize=None)
+def _user_name(uid):
+    """Username for the UID, or None if there isn't one."""
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return None
+
+
 class Tree:
     _FILE_TYPE_MAP = {
         stat.S_IFREG: "-",  # Regular file.
@@ -47,21 +168,28 @@ class Tree:
         "P",
     )
     _YEAR_CUTOFF_AGE_DAYS = 182.5
+    _listings = None  # A ListingCache, once enable_caches() is called.
     corner_ = "└"
     hbar_ = "―"
     tee_ = "├"
     vbar_ = "│"
     broken_link_color = "red"
+    checksum_attrs = ()
+    checksum_color = "blue"
     tree_attrs = ()
     tree_color = "yellow"
     date_attrs = ()
     date_color = "magenta"
+    inode_attrs = ()
+    inode_color = "white"
     dir_attrs = ("bold",)
     dir_color = "cyan"
     file_attrs = ()
     file_color = "white"
     link_attrs = ("underline",)
     link_color = "green"
+    marker_attrs = ()
+    marker_color = "red"
     permissions_attrs = ()
     permissions_color = "magenta"
     prefix = ""
@@ -70,20 +198,126 @@ class Tree:
 
     def __init__(self, **kwargs):
         vars(self).update(kwargs)
+        self._options = kwargs  # For the workers, with --jobs.
         self._counter = Counter()
         self._now = datetime.now()
         self._resolved_paths = set()
-        for path in self.paths:
-            # Broken links OK
-            if os.path.exists(path) or os.path.islink(path):
-                self._run(path=path)
+        self._widths = {}
+        self._global_widths = {}
+        self._row = []
+        self._rows = deque()
+        self._renderer = open_renderer(
+            self.output_format,
+            no_color=self.no_color if not self.force_color else False,
+            force_color=self.force_color,
+        )
+        # Nested output uses Tree's own colors, as CSS classes.
+        self._ls_colors = None if self._renderer.nested else from_environ()
+        self._colored = colored(
+            "-",
+            "red",
+            no_color=self.no_color if not self.force_color else False,
+            force_color=self.force_color,
+        ) != "-"
+        self._checksums = Checksums(self.checksum) if self.checksum else None
+        self._hash_ahead = deque()  # Paths to hash, in the order printed.
+        self._skip_devs = devices(self.skip_fs_types)
+        self._markers = {}
+        self._hardlinks = set()
+        self._unique_inodes = 0
+        self._timed_out = []
+        self._variances = {}
+        self._watchdog = None
+        if self.dir_timeout:
+            self._watchdog = Watchdog(timeout=self.dir_timeout)
+        self._checks_mounts = bool(self.one_file_system or self._skip_devs)
+        self._predicates = Predicates(
+            newer=self.newer,
+            older=self.older,
+            min_size=self.min_size,
+            owner=self.owner,
+        )
+        self._matches = {}  # Whether a directory has anything kept inside.
+        self._looking = threading.local()  # What _has_match is in.
+        self._statx = None
+        if self._uses_statx():
+            self._statx = open_statx(self._stat_mask(), sync=not self.no_sync)
+        self._dir_fds = open_dir_fds(self.dir_fds) if self.dir_fds else None
+        self._walker = Walker(
+            fs=LocalBackend(
+                listings=self._listings,
+                statx=self._statx,
+                dir_fds=self._dir_fds,
+            ),
+            list_hidden=self.list_hidden,
+            list_only_dirs=self.list_only_dirs,
+            follow_links=self.follow_links,
+            sort_by="mtime" if self.time else self.sort or "name",
+            reverse=self.reverse,
+            dirs_first=self.dirs_first,
+            filters=(self._keeps,) if self._predicates or self.prune else (),
+            prune=self._prune if self._checks_mounts else None,
+            lstat=self.inodes or bool(self.summary_by),
+            parallel=True,
+        )
+        self._entries_left = self.max_entries
+        self._truncated = False
+        self._aggregates = [Aggregates(key) for key in self.summary_by]
+        self._depth = 0  # Of the path _run is printing.
+        self._shared = self._outer = set()
+        if len(self.paths) > 1 and not (
+            self.estimate and self.count_each_root  # Estimated for each.
+        ):
+            self._shared, self._outer = _overlaps(self.paths, self._fs)
+        if self._shared:
+            self._walker.prune = self._prune
+        self._shared_next = None  # Set by _inside for _run.
+        self._recorded = {}
+        self._recordings = []
+        self._pool = None  # Of --jobs workers, once there's a local root.
+        self._progress = None
+        if self.progress and not self.estimate:
+            self._progress = open_progress(prints_rows=not self.count_only)
+        try:
+            for path in self.paths:
+                self._list_root(path)
+        except _Truncated:
+            self._truncated = True
+        finally:  # Also when the output's reader has gone away.
+            if self._checksums:
+                self._checksums.close()
+            if self._progress:
+                self._progress.close()
+            if self._pool:
+                self._pool.shutdown(cancel_futures=True)
+            if self._dir_fds:
+                self._dir_fds.close()
+        if self._unique_inodes:
+            self._counter["unique inodes"] = self._unique_inodes
+        if self._timed_out:
+            self._counter["timeouts"] = len(self._timed_out)
+        self._flush_rows()
+        self._renderer.report()
         if self.report:
             self._summarize()
+        for aggregates in self._aggregates:
+            self._print_aggregates(aggregates)
+        self._flush_rows()
+        self._renderer.close()
 
     @property
     def corner(self):
         return self.corner_ + self.hbar
 
+    @property
+    def _fs(self):
+        """The backend of the path being listed (the walker's)."""
+        return self._walker.fs
+
+    @_fs.setter
+    def _fs(self, fs):
+        self._walker.fs = fs
+
     @property
     def hbar(self):
         return self.hbar_ * (self.indent - 2)
@@ -96,33 +330,317 @@ class Tree:
     def tee(self):
         return self.tee_ + self.hbar
 
-    def _cprint(self, *args, **kwargs):
-        cprint(
-            *args,
-            no_color=self.no_color if not self.force_color else False,
-            force_color=self.force_color,
-            **kwargs,
+    def _aggregate(self, path, key, depth, stats):
+        """Add a counted path to its group for each --summary-by.
+
+        key is its summary category, depth how far beneath its root it
+        is, and stats its own (a link's, not what it points to), or None.
+        Only files' sizes are added.
+        """
+        groups = [
+            self._group(aggregates.key, path, key, depth, stats)
+            for aggregates in self._aggregates
+        ]
+        self._count_aggregate(
+            groups,
+            stats.st_size if stats is not None and key == "files" else 0,
+            None if stats is None else stats.st_mtime,
         )
 
+    def _child_prefixes(self, prefix, number):
+        """Return the parent's continued prefix and one prefix per child."""
+        if self.ignore_tree or self._renderer.nested:
+            return prefix, [""] * number
+        corner, tee, vbar = self.corner, self.tee, self.vbar
+        prefix = prefix.replace(
+            corner, " " * len(corner),
+        ).replace(tee, vbar + " " * len(self.hbar))
+        return prefix, [f"{tee} "] * (number - 1) + [f"{corner} "]
+
+    def _list_root(self, path):
+        """List (or count, or estimate) a path given on the command line."""
+        self._fs = open_backend(
+            path,
+            archives=self.archives,
+            listings=self._listings,
+            statx=self._statx,
+            dir_fds=self._dir_fds,
+        )
+        if self.bytes_paths and self._fs.local:
+            path = os.fsencode(path)  # Names are only decoded to print.
+        if self._watchdog:
+            self._fs = TimeoutBackend(
+                self._fs,
+                watchdog=self._watchdog,
+                timed_out=self._timed_out,
+            )
+        # Broken links OK
+        try:
+            if not (self._fs.exists(path) or self._fs.islink(path)):
+                return
+        except TimeoutError:
+            return
+        if self._checks_mounts and (stats := self._get_stats(path)):
+            self._root_dev = stats.st_dev
+        if self.estimate:
+            self._estimate(path=path)
+        elif self.count_only:
+            self._count(path=path)
+        else:
+            self._widths = {}  # The root is a directory of its own.
+            if self.align_lookahead is not None:
+                self._measure(paths=[path])
+            if self._progress:
+                self._progress.pending += 1
+            if self.jobs > 1 and self._fs.local and not self._overlapping(
+                path,
+            ):
+                from .jobs import run_jobs
+                run_jobs(self, path)
+            else:
+                self._run(path=path)
+
+    def _count(self, path):
+        """Count what _run would for path, without printing anything.
+
+        The walker lists directories in parallel, taking entry types
+        from the listings, so only symbolic links need a stat. The
+        counting follows _run's order, since that decides which of the
+        paths to the same place gets counted.
+
+        Where the paths overlap, what's beneath them is recorded and
+        replayed like _run does, without being listed again.
+        """
+        self._depth = 0
+        if (key := self._entered_shared_key(path)) in self._recorded:
+            self._take_entry()
+            if self.count_each_root:
+                self._register_path(path=path)
+            self._replay(self._recorded[key], base="")
+            return
+        visits = self._walker.walk(path, seen=self._resolved_paths)
+        recordings = []  # (key, _Recording) of the shared directories in.
+        with closing(visits):  # Stops the listings with --max-entries.
+            for visit in visits:
+                while recordings and recordings[-1][1].depth >= visit.depth:
+                    self._stop_recording(*recordings.pop())
+                self._take_entry()
+                self._tally(visit)
+                if self._walker.enters(visit.entry) and not visit.looped and (
+                    key := self._shared_dir_key(visit.entry.resolved)
+                ):
+                    recording = _Recording(
+                        base="",
+                        depth=visit.depth,
+                        events=[],
+                    )
+                    self._recordings.append(recording)
+                    recordings.append((key, recording))
+                if self._progress:
+                    self._count_progress(visit)
+        while recordings:
+            self._stop_recording(*recordings.pop())
+
+    def _tally(self, visit):
+        """Count a Visit from _count like _register_path.
+
+        A directory the walker didn't enter because it's _SHARED is only
+        counted with --count-each-root, and what's beneath it replayed.
+        """
+        entry = visit.entry
+        self._walker.forget(entry.path)  # Kept by _keeps, if filtering.
+        shared = entry.skip is _SHARED and not visit.looped
+        if entry.skip and not (visit.looped or shared):
+            self._count_skip()
+        if (not shared or self.count_each_root) and not (
+            visit.path in self._resolved_paths or (
+                entry.resolved in self._timed_out  # Like _register_path.
+            )
+        ):
+            key = _category(entry.isdir, entry.islink, entry.exists)
+            self._count_registration(
+                entry.resolved,
+                key,
+                _hardlink_key(entry.lstat),
+            )
+            if self._aggregates:
+                self._aggregate(visit.path, key, visit.depth, entry.lstat)
+        if shared:
+            self._depth = visit.depth
+            self._replay(
+                self._recorded[_dir_key(self._fs, entry.resolved)],
+                base="",
+            )
+
+    def _count_progress(self, visit):
+        """Show a Visit from _count in --progress."""
+        progress = self._progress
+        entry = visit.entry
+        if self._walker.enters(entry) and not visit.looped:
+            progress.directory = visit.path
+        if not entry.isdir and entry.lstat is not None:  # For --inodes.
+            progress.bytes += entry.lstat.st_size
+        progress.pending = self._walker.queued
+        progress.tick()
+
+    def _count_registration(self, resolved, key, hardlink):
+        """Count a path from its _registration."""
+        self._record("count", resolved, key, hardlink)
+        self._resolved_paths.add(resolved)
+        if key is not None:
+            self._counter[key] += 1
+            if self.inodes:
+                self._count_inode(hardlink)
+
+    def _count_aggregate(self, groups, size, mtime, shift=0):
+        """Add a path to its group in each of _aggregates (None: none).
+
+        Depths are shifted by shift, for a replay at another depth.
+        """
+        if shift:
+            groups = [
+                group + shift if aggregates.key == "depth" else group
+                for aggregates, group in zip(self._aggregates, groups)
+            ]
+        self._record("aggregate", groups, size, mtime)
+        for aggregates, group in zip(self._aggregates, groups):
+            if group is not None:
+                aggregates.add(group, size, mtime)
+
+    def _count_skip(self):
+        self._record("skip")
+        self._counter["skipped mount points"] += 1
+
+    def _count_inode(self, hardlink):
+        """Count a path's inode, unless it's a hard link counted already."""
+        if hardlink is not None:
+            if hardlink in self._hardlinks:
+                return
+            self._hardlinks.add(hardlink)
+        self._unique_inodes += 1
+
+    def _cprint(self, *args, column=None, **kwargs):
+        """Print, padding values in a column to the column's width.
+
+        With --align-lookahead, the row is held back until that many rows
+        have been measured after it (see _measure).
+        """
+        if self.align_lookahead is None:
+            if column is not None:
+                args = (self._pad(args[0], column, self._widths),)
+            self._record("print", args, None, kwargs)
+            self._write(*args, **kwargs)
+            return
+        self._record("print", args, column, kwargs)
+        self._row.append((args, column, kwargs))
+        if kwargs.get("end", "\n") == "\n":
+            self._rows.append(self._row)
+            self._row = []
+            self._flush_rows(keep=self.align_lookahead)
+
     def _details(self, path):
-        inside = []
-        islink = os.path.islink(path)
-        if isdir := os.path.isdir(path):
-            if self._seen_inside(path):
-                inside = ["..."]
-            elif not islink or (islink and self.follow_links):
-                inside = self._ls(path)
-        if islink:
-            if os.path.exists(path):
-                return self.link_color, self.link_attrs, inside
-            return self.broken_link_color, self.link_attrs, inside
-        if isdir:
-            return self.dir_color, self.dir_attrs, inside
-        return self.file_color, self.file_attrs, inside
+        color, attrs, isdir, islink = self._style(path)
+        return color, attrs, self._inside(path, isdir=isdir, islink=islink)
+
+    def _estimate(self, path):
+        """Estimate what _count would count for path, within a budget.
+
+        Adds the estimates to the counter, and their variances to
+        _variances for _summarize. Symbolic links aren't followed.
+
+        Where the paths overlap, a path beneath one that's been
+        estimated already isn't estimated again, and one that's been
+        estimated is left out of the listings of those it's beneath.
+        """
+        if self._estimated_already(path):
+            return
+        try:
+            islink = self._fs.islink(path)
+            isdir = self._fs.isdir(path)
+            self._counter[
+                _category(isdir, islink, self._fs.exists(path))
+            ] += 1
+        except TimeoutError:
+            return
+        if not isdir or islink:
+            return
+        estimate = Estimate(
+            self.estimate,
+            listdir=self._sample_listing,
+        ).run(path)
+        for key, (value, variance) in estimate.results().items():
+            self._counter[key] += value
+            if estimate.probes:  # Otherwise it's exact.
+                total = self._variances.get(key, 0)
+                self._variances[key] = (
+                    None if total is None or variance is None
+                    else total + variance
+                )
+        if estimate.probes:
+            self._counter["samples"] += len(estimate.probes)
+        if self._shared:  # Nothing to replay; it's only _SHARED.
+            key = _dir_key(self._fs, path)
+            self._recorded[key] = _Recording(base="", depth=0, events=[])
+
+    def _entered_shared_key(self, path):
+        """_shared_dir_key of a path given, if _run would go into it.
+
+        Like _inside, that's not for links unless they're followed, or
+        for what's been seen inside already.
+        """
+        if not self._shared:
+            return None
+        try:
+            if not self._fs.isdir(path) or (
+                self._fs.islink(path) and not self.follow_links
+            ) or self._seen_inside(path):
+                return None
+        except TimeoutError:
+            return None
+        return self._shared_dir_key(path)
+
+    def _estimated_already(self, path):
+        """Whether path is (or is beneath) a path _estimate has done."""
+        if self._shared_dir_key(path) is None:
+            return False
+        directory = self._fs.realpath(path)
+        while _dir_key(self._fs, directory) not in self._recorded:
+            if (above := os.path.dirname(directory)) == directory:
+                return False
+            directory = above
+        return True
+
+    def _flush_rows(self, keep=0):
+        """Print held back rows, leaving the last keep of them."""
+        while len(self._rows) > keep:
+            for args, column, kwargs in self._rows.popleft():
+                if column is not None:
+                    args = (self._pad(args[0], column, self._global_widths),)
+                self._write(*args, **kwargs)
+
+    def _get_checksum(self, path):
+        """Hex digest of a file's contents; dashes for non-files."""
+        width = self._checksums.width
+        if self._hash_ahead and self._hash_ahead[0] == path:
+            self._hash_ahead.popleft()  # Not reached by _CHECKSUMS_AHEAD.
+        if not self._fs.local or (stats := self._get_stats(path)) is None:
+            return "?" * width
+        try:
+            checksum = self._checksums.result(path=path, stats=stats)
+        except OSError:
+            return "?" * width
+        finally:
+            self._hash_next()
+        if checksum is None:
+            return "-" * width
+        return checksum
 
     @_default_missing("??? ?? ?????")
     def _get_date(self, path, stats=None):
-        date = datetime.fromtimestamp(stats.st_mtime)
+        return self._format_date(stats.st_mtime)
+
+    def _format_date(self, mtime):
+        date = datetime.fromtimestamp(mtime)
         if timedelta(days=0) < (
             self._now - date
         ) < timedelta(days=self._YEAR_CUTOFF_AGE_DAYS):
@@ -132,21 +650,16 @@ class Tree:
         return f"{date:%b} {date.day:>2} {suffix}"
 
     def _get_stats(self, path):
-        if os.path.exists(path):
-            return os.stat(path)
-        return None
+        """Stats of path, kept until the path has been printed."""
+        return self._walker.stat(path)
 
     @_default_missing("???")
     def _get_group(self, path, stats=None):
-        return grp.getgrgid(stats.st_gid)[0]
+        return _group_name(stats.st_gid)
 
-    @_default_missing(float("inf"))
-    def _get_mtime_(self, path, stats=None):
-        return stats.st_mtime
-
-    def _get_mtime(self, name, parent):
-        """Used for sorting purposes. Non-existing get inf."""
-        return self._get_mtime_(path=os.path.join(parent, name))
+    @_default_missing("?")
+    def _get_inode(self, path, stats=None):
+        return stats.st_ino
 
     @_default_missing("??????????")
     def _get_permissions(self, path, stats=None):
@@ -175,7 +688,9 @@ class Tree:
 
     @_default_missing("?")
     def _get_size(self, path, stats=None):
-        size = stats.st_size
+        return self._format_size(stats.st_size)
+
+    def _format_size(self, size):
         if self.nice_size:
             if size <= 0:
                 return f"{size}{self._SI_SUFFIXES[0]}"
@@ -186,27 +701,276 @@ class Tree:
 
     @_default_missing("?")
     def _get_user(self, path, stats=None):
-        try:
-            pwuid = pwd.getpwuid(stats.st_uid)
-        except KeyError:
+        if (name := _user_name(stats.st_uid)) is None:
             return stats.st_gid
-        return pwuid.pw_name
+        return name
+
+    def _group(self, by, path, key, depth, stats):
+        """path's group by a --summary-by key, or None if it's in none.
+
+        Only files and links to them have an extension, and only paths
+        with stats an owner.
+        """
+        if by == "ext":
+            if key not in ("files", "file links"):
+                return None
+            return os.path.splitext(self._fs.basename(path))[1].lower()
+        if by == "owner":
+            return None if stats is None else stats.st_uid
+        if by == "depth":
+            return depth
+        return key
+
+    def _group_label(self, by, group):
+        """How a group from Aggregates.top is shown."""
+        if group is None:
+            return "(others)"
+        if by == "ext":
+            return self._name(group) or "(none)"
+        if by == "owner":
+            return _user_name(group) or str(group)
+        return str(group)
+
+    def _has_match(self, directory):
+        """Whether anything inside directory is kept, for --prune.
+
+        Stops at the first thing that is. The answers for the
+        directories beneath it are kept until the walk asks for them
+        again, as it lists what's inside them, and dropped with the rest
+        of a branch that's pruned. With -l, a directory counts as empty
+        while it's being looked through (by the same thread, since the
+        walker lists on several), so loops end.
+        """
+        key = self._fs.realpath(directory) if self.follow_links else directory
+        if (matched := self._matches.pop(key, None)) is not None:
+            return matched
+        if (stack := getattr(self._looking, "stack", None)) is None:
+            stack = self._looking.stack = []  # Of (key, keys kept in it).
+        if any(looking == key for looking, _ in stack):
+            return False
+        kept = []
+        stack.append((key, kept))
+        try:
+            hidden = hidden_prefix(directory)
+            try:
+                names = [entry.name for entry in self._fs.scandir(directory)]
+            except OSError:  # Including TimeoutError.
+                names = []
+            matched = any(
+                self._keeps(directory, name)
+                for name in names
+                if self.list_hidden or not name.startswith(hidden)
+            )
+        finally:
+            stack.pop()
+        if not matched:  # It's pruned, so nothing asks about what's in it.
+            for looked in kept:
+                self._matches.pop(looked, None)
+            kept = []
+        if stack:
+            self._matches[key] = matched
+            stack[-1][1].extend([*kept, key])
+        return matched
+
+    def _inside(self, path, isdir, islink):
+        if not isdir:
+            return []
+        if self._seen_inside(path):
+            return [b"..." if isinstance(path, bytes) else "..."]
+        if islink and not self.follow_links:
+            return []
+        if self._checks_mounts and (
+            skip := self._mount_skip(self._get_stats(path))
+        ):
+            self._markers[path] = skip
+            self._count_skip()
+            return []
+        if self._entries_left == 0:
+            self._truncated = True  # Nothing inside would be printed.
+            return []
+        if self._shared and (key := self._shared_key(path)):
+            self._shared_next = key
+            if key in self._recorded:
+                return []  # _run replays what's inside instead.
+        return self._ls(path)
+
+    def _hash_next(self):
+        """Start hashing what's printed next, up to _CHECKSUMS_AHEAD."""
+        while self._hash_ahead and self._checksums.pending < _CHECKSUMS_AHEAD:
+            path = self._hash_ahead.popleft()
+            self._checksums.submit(path=path, stats=self._get_stats(path))
+
+    def _inode_key(self, path, islink):
+        """_hardlink_key for path itself (not what a link points to).
+
+        Only needed with --inodes; the stats are usually kept already.
+        """
+        if not self.inodes:
+            return None
+        try:
+            if islink:
+                return _hardlink_key(self._fs.lstat(path))
+            return _hardlink_key(self._get_stats(path))
+        except OSError:
+            return None
+
+    def _keeps(self, directory, name):
+        """Whether --newer, --older, --min-size and --user keep a name.
+
+        It's a filter for the walker, so the stats it takes are kept for
+        printing (and dropped if the name isn't kept). Directories that
+        would be entered are kept for what's inside them, and with
+        --prune only if any of that is kept.
+        """
+        path = self._fs.join(directory, name)
+        stats = self._walker.stat(path)
+        if stats is not None and stat.S_ISDIR(stats.st_mode) and (
+            self.follow_links or not self._fs.islink(path)
+        ):
+            skip = self._checks_mounts and self._mount_skip(stats)
+            kept = not self.prune or (not skip and self._has_match(path))
+        else:
+            kept = self._predicates.matches(stats)
+        if not kept:
+            self._walker.forget(path)
+        return kept
 
     def _ls(self, path):
         """List the requested path's contents in the correct order."""
-        if self.time:
-            key = partial(self._get_mtime, parent=path)
-        else:
-            key = str.casefold
-        return sorted(
-            (
-                name
-                for name in os.listdir(path)
-                if self._to_print(path, name)
-            ),
-            key=key,
-            reverse=self.reverse,
+        return [entry.name for entry in self._walker.ls(path)]
+
+    def _ls_style(self, path):
+        """_style, colored by $LS_COLORS.
+
+        Uses the stats the columns use (and keeps them for the columns),
+        so coloring doesn't cost any extra filesystem calls.
+        """
+        islink = self._fs.islink(path)
+        stats = self._get_stats(path)
+        isdir = stats is not None and stat.S_ISDIR(stats.st_mode)
+        color = self._ls_colors.lookup(
+            name=self._name(self._fs.basename(path)),
+            stats=stats,
+            islink=islink,
         )
+        return color, (), isdir, islink
+
+    def _measure(self, paths):
+        """Widths of the inode, user, group and size columns over paths.
+
+        Siblings are measured together, before the first is printed. The
+        stats are kept for printing, so this costs no extra filesystem
+        calls. The widths are also added to the widths of the whole
+        listing, for --align-lookahead.
+        """
+        columns = [
+            (column, callback)
+            for column, enabled, callback in (
+                ("inode", self.inodes, self._get_inode),
+                ("user", self.user, self._get_user),
+                ("group", self.group, self._get_group),
+                ("size", self.size or self.nice_size, self._get_size),
+            )
+            if enabled
+        ]
+        widths = {}
+        if not columns:
+            return widths
+        for path in paths:
+            for column, callback in columns:
+                widths[column] = max(
+                    widths.get(column, 0),
+                    len(str(callback(path=path))),
+                )
+        for column, width in widths.items():
+            self._global_widths[column] = max(
+                self._global_widths.get(column, 0),
+                width,
+            )
+        return widths
+
+    def _mount_skip(self, stats):
+        """Why a directory with these stats isn't entered, or None.
+
+        Directories on the same filesystem as the path given on the
+        command line are always entered.
+        """
+        if stats is None or stats.st_dev == self._root_dev:
+            return None
+        if fstype := self._skip_devs.get(stats.st_dev):
+            return fstype
+        if self.one_file_system:
+            return "mount point"
+        return None
+
+    def _name(self, path):
+        """path (or a name), decoded to print if it's bytes."""
+        return decode(path, self.undecodable)
+
+    def _own_stats(self, path, key):
+        """path's stats, or a link's own, for --summary-by (None: gone)."""
+        try:
+            if key.endswith("links"):
+                return self._fs.lstat(path)
+            return self._get_stats(path)
+        except OSError:  # Including timeouts.
+            return None
+
+    @staticmethod
+    def _pad(value, column, widths):
+        """Numbers are right-aligned, names left-aligned, like ls."""
+        width = widths.get(column, 0)
+        if column in ("inode", "size"):
+            return str(value).rjust(width)
+        return str(value).ljust(width)
+
+    def _print_aggregates(self, aggregates):
+        """Print the groups of a --summary-by key as a table."""
+        rows = [(aggregates.key, "entries", "size", "newest")]
+        for group, count, size, newest in aggregates.top(self.summary_top):
+            rows.append((
+                self._group_label(aggregates.key, group),
+                str(count),
+                self._format_size(size),
+                "-" if newest is None else self._format_date(newest),
+            ))
+        widths = [max(len(row[index]) for row in rows) for index in range(3)]
+        for label, count, size, newest in rows:
+            self._cprint(
+                f"{label:<{widths[0]}}  {count:>{widths[1]}}  "
+                f"{size:>{widths[2]}}  {newest}"
+            )
+
+    def _print_checksum(self, path):
+        if self.checksum:
+            self._cprint(
+                self._get_checksum(path=path),
+                color=self.checksum_color,
+                attrs=self.checksum_attrs,
+                end=" ",
+            )
+
+    def _prefetch_checksums(self, path, inside):
+        """Queue the children's hashes so they're ready when printed.
+
+        They're printed next, before anything else that's queued, and
+        hashed up to _CHECKSUMS_AHEAD ahead of the row being printed.
+        """
+        if self.checksum and self._fs.local:
+            self._hash_ahead.extendleft(
+                self._fs.join(path, sub) for sub in reversed(inside)
+            )
+            self._hash_next()
+
+    def _print_inode(self, path):
+        if self.inodes:
+            self._cprint(
+                self._get_inode(path=path),
+                column="inode",
+                color=self.inode_color,
+                attrs=self.inode_attrs,
+                end=" ",
+            )
 
     def _print_mod_time(self, path):
         if self.date:
@@ -218,94 +982,399 @@ class Tree:
             )
 
     def _print_path(self, path, color, attrs):
-        print_path = path if self.full_path else os.path.basename(path)
+        print_path = self._name(
+            path if self.full_path else self._fs.basename(path),
+        )
+        if isinstance(color, Sgr):
+            if self._colored:
+                print_path = color.wrap(print_path)
+            color = None
+        if marker := self._markers.pop(path, None):
+            self._cprint(print_path, color=color, attrs=attrs, end=" ")
+            self._cprint(
+                f"[{marker}]",
+                color=self.marker_color,
+                attrs=self.marker_attrs,
+            )
+            return
         self._cprint(print_path, color=color, attrs=attrs)
 
     def _print_permissions(self, path):
-        for var, callback in (
-            (self.permissions, self._get_permissions),
-            (self.user, self._get_user),
-            (self.group, self._get_group),
+        for var, callback, column in (
+            (self.permissions, self._get_permissions, None),
+            (self.user, self._get_user, "user"),
+            (self.group, self._get_group, "group"),
         ):
             if var:
                 self._cprint(
                     callback(path=path),
+                    column=column,
                     color=self.permissions_color,
                     attrs=self.permissions_attrs,
                     end=" ",
                 )
 
+    def _print_row(self, path, _prefix):
+        """Print path's row, and list what _run goes into next.
+
+        Returns the (path, prefix) of each child, and the widths of
+        their columns.
+        """
+        self._take_entry()
+        try:
+            color, attrs, inside = self._details(path=path)
+        except TimeoutError:
+            color, attrs, inside = self.file_color, self.file_attrs, []
+            self._markers[path] = "timed out"
+        self._print_prefix(_prefix)
+        self._print_inode(path=path)
+        self._print_permissions(path=path)
+        self._print_size(path=path)
+        self._print_mod_time(path=path)
+        self._print_checksum(path=path)
+        self._print_path(path=path, color=color, attrs=attrs)
+        if self.count_each_root or self._shared_next not in self._recorded:
+            self._register_path(path=path)  # Counted when it was recorded.
+        if self._progress:
+            self._run_progress(path=path, inside=inside)
+        self._walker.forget(path)
+        shown = inside[:self._entries_left]  # Past --max-entries isn't.
+        self._prefetch_checksums(path=path, inside=shown)
+        _prefix, prefixes = self._child_prefixes(_prefix, len(inside))
+        widths = self._measure(
+            paths=[self._fs.join(path, sub) for sub in shown],
+        )
+        children = [
+            (self._fs.join(path, sub), _prefix + prefix)
+            for sub, prefix in zip(inside, prefixes)
+        ]
+        return children, widths
+
+    def _print_prefix(self, prefix):
+        """Start a row with its part of the tree.
+
+        It's recorded apart from the rest of the row, since it depends on
+        where the row is printed.
+        """
+        for recording in self._recordings:
+            recording.events.append(("row", prefix[len(recording.base):]))
+        recordings, self._recordings = self._recordings, []
+        self._cprint(
+            prefix,
+            color=self.tree_color,
+            attrs=self.tree_attrs,
+            end="",
+        )
+        self._recordings = recordings
+
     def _print_size(self, path):
         if self.size or self.nice_size:
             self._cprint(
                 self._get_size(path=path),
+                column="size",
                 color=self.size_color,
                 attrs=self.size_attrs,
                 end=" ",
             )
 
+    def _overlapping(self, path):
+        """Whether path overlaps another of the paths (see _overlaps).
+
+        --jobs leaves those to _run, which records and replays what's
+        beneath the overlap.
+        """
+        if not self._shared:
+            return False
+        key = _dir_key(self._fs, path)
+        return key in self._shared or key in self._outer
+
+    def _prune(self, stats):
+        """The walker's reason not to enter a directory, or None.
+
+        That's _mount_skip's, or _SHARED for a directory that's been
+        counted from another of the paths already.
+        """
+        if self._checks_mounts and (skip := self._mount_skip(stats)):
+            return skip
+        if stats is not None and (
+            (stats.st_dev, stats.st_ino) in self._recorded
+        ):
+            return _SHARED
+        return None
+
     def _register_path(self, path):
         if path in self._resolved_paths:
             return
-        self._resolved_paths.add(os.path.realpath(path))
-        isdir = os.path.isdir(path)
-        islink = os.path.islink(path)
-        exists = os.path.exists(path)
-        if islink:
-            if exists:
-                key = "directory links" if isdir else "file links"
-            else:
-                key = "broken links"
-        else:
-            if exists:
-                key = "directories" if isdir else "files"
+        try:
+            resolved, key, hardlink = self._registration(path)
+        except TimeoutError:
+            return
+        self._count_registration(resolved, key, hardlink)
+        if self._aggregates and key is not None:
+            self._aggregate(path, key, self._depth, self._own_stats(path, key))
+
+    def _registration(self, path):
+        """What _register_path counts for path.
+
+        That's where path resolves to, its summary category and its
+        _inode_key (both None if they time out). Raises TimeoutError if
+        resolving it does.
+        """
+        resolved = self._fs.realpath(path)
+        try:
+            islink = self._fs.islink(path)
+            key = _category(
+                isdir=self._fs.isdir(path),
+                islink=islink,
+                exists=self._fs.exists(path),
+            )
+        except TimeoutError:
+            return resolved, None, None
+        if key is None:
+            return resolved, None, None
+        return resolved, key, self._inode_key(path, islink=islink)
+
+    def _record(self, *event):
+        for recording in self._recordings:
+            recording.events.append(event)
+
+    def _replay(self, recording, base):
+        """Print a _Recording again, beneath a row whose prefix led to base.
+
+        What it counted is only counted again with --count-each-root.
+        """
+        for kind, *event in recording.events:
+            if kind == "row":
+                self._take_entry()
+                if self._progress:
+                    self._progress.tick()
+                self._print_prefix(base + event[0])
+            elif kind == "print":
+                args, column, kwargs = event
+                self._cprint(*args, column=column, **kwargs)
+            elif kind == "enter":
+                self._record(kind)
+                self._renderer.enter()
+            elif kind == "leave":
+                self._record(kind)
+                self._renderer.leave()
+            elif not self.count_each_root:
+                self._record(kind, *event)  # For replaying with it.
+            elif kind == "count":
+                self._count_registration(*event)
+            elif kind == "aggregate":
+                self._count_aggregate(
+                    *event,
+                    shift=self._depth - recording.depth,
+                )
             else:
-                return
-        self._counter[key] += 1
+                self._count_skip()
 
     def _run(self, path, _prefix=""):
-        """Recursively print the tree for the specified path."""
-        color, attrs, inside = self._details(path=path)
-        self._cprint(
-            _prefix,
-            color=self.tree_color,
-            attrs=self.tree_attrs,
-            end="",
-        )
-        self._print_permissions(path=path)
-        self._print_size(path=path)
-        self._print_mod_time(path=path)
-        self._print_path(path=path, color=color, attrs=attrs)
-        self._register_path(path=path)
-        if self.ignore_tree:
-            prefixes = [""] * len(inside)
-        else:
-            corner, tee, vbar = self.corner, self.tee, self.vbar
-            _prefix = _prefix.replace(
-                corner, " " * len(corner),
-            ).replace(tee, vbar + " " * len(self.hbar))
-            prefixes = [f"{tee} "] * (len(inside) - 1) + [f"{corner} "]
-        for sub, prefix in zip(inside, prefixes):
-            self._run(_prefix=_prefix + prefix, path=os.path.join(path, sub))
+        """Recursively print the tree for the specified path.
+
+        Directories that more than one of the paths overlap in are
+        recorded the first time they're printed, and what's beneath them
+        is replayed, without listing it again, wherever they're reached
+        after that.
+        """
+        children, widths = self._print_row(path=path, _prefix=_prefix)
+        shared, self._shared_next = self._shared_next, None
+        base, _ = self._child_prefixes(_prefix, 0)
+        if shared in self._recorded:
+            self._replay(self._recorded[shared], base)
+            return
+        if shared is not None:
+            recording = _Recording(base=base, depth=self._depth, events=[])
+            self._recordings.append(recording)
+        if children:
+            self._record("enter")
+            self._renderer.enter()
+        self._depth += 1
+        for child, prefix in children:
+            self._widths = widths
+            self._run(_prefix=prefix, path=child)
+        self._depth -= 1
+        if children:
+            self._record("leave")
+            self._renderer.leave()
+        if shared is not None:
+            self._recordings.remove(recording)
+            self._recorded[shared] = recording
+
+    def _run_progress(self, path, inside):
+        """Show path in --progress, with its size if its stats are kept."""
+        progress = self._progress
+        stats = self._walker.kept(path)
+        if stats is not None and not stat.S_ISDIR(stats.st_mode):
+            progress.bytes += stats.st_size
+        if inside:
+            progress.directory = path
+        progress.pending += len(inside) - 1
+        progress.tick()
+
+    def _sample_listing(self, directory):
+        """What's in directory, as Estimate lists it.
+
+        Each of the walker's entries becomes (path, summary category,
+        size, whether to enter it).
+        """
+        try:
+            entries = self._walker.scan(directory)
+        except TimeoutError:
+            return []
+        listing = []
+        for entry in entries:
+            if entry.skip is _SHARED:
+                continue  # Estimated from its own path.
+            path = self._fs.join(directory, entry.name)
+            size = 0
+            if not entry.isdir:
+                try:
+                    size = self._fs.lstat(path).st_size
+                except OSError:
+                    pass  # Gone since it was listed, or timed out.
+            listing.append((
+                path,
+                _category(entry.isdir, entry.islink, entry.exists),
+                size,
+                entry.isdir and not entry.islink and not entry.skip,
+            ))
+        return listing
 
     def _seen_inside(self, path):
         return self.follow_links and (
-            os.path.realpath(path) in self._resolved_paths
+            self._fs.realpath(path) in self._resolved_paths
         )
 
+    def _shared_dir_key(self, path):
+        """_dir_key of path, if it's in _shared (without keeping stats)."""
+        if self._shared and (key := _dir_key(self._fs, path)) in self._shared:
+            return key
+        return None
+
+    def _shared_key(self, path):
+        """path's (device, inode), if it's in _shared."""
+        stats = self._get_stats(path)
+        if stats is not None and (
+            key := (stats.st_dev, stats.st_ino)
+        ) in self._shared:
+            return key
+        return None
+
+    def _stat_mask(self):
+        """The statx fields the options need (the device always comes)."""
+        mask = STATX_TYPE
+        if self.permissions or self._colored:
+            mask |= STATX_MODE | STATX_NLINK  # $LS_COLORS uses both.
+        if self.user or self.owner is not None:
+            mask |= STATX_UID
+        if self.group:
+            mask |= STATX_GID
+        if self.inodes:
+            mask |= STATX_INO | STATX_NLINK
+        if self.summary_by:
+            mask |= STATX_SIZE | STATX_MTIME | STATX_UID
+        if len(self.paths) > 1:
+            mask |= STATX_INO  # To find where they overlap.
+        if self.checksum:
+            mask |= STATX_INO | STATX_SIZE | STATX_MTIME
+        if self.size or self.nice_size or self.estimate or (
+            self.sort == "size" or self.min_size is not None
+        ):
+            mask |= STATX_SIZE
+        if self.date or self.time or self.sort == "mtime" or (
+            self.newer is not None or self.older is not None
+        ):
+            mask |= STATX_MTIME
+        return mask
+
+    def _style(self, path):
+        """The color and attrs for path, and whether it's a dir / link."""
+        if self._ls_colors is not None:
+            return self._ls_style(path)
+        islink = self._fs.islink(path)
+        isdir = self._fs.isdir(path)
+        if islink:
+            if self._fs.exists(path):
+                return self.link_color, self.link_attrs, isdir, islink
+            return self.broken_link_color, self.link_attrs, isdir, islink
+        if isdir:
+            return self.dir_color, self.dir_attrs, isdir, islink
+        return self.file_color, self.file_attrs, isdir, islink
+
+    def _stop_recording(self, key, recording):
+        self._recordings.remove(recording)
+        self._recorded[key] = recording
+
     def _summarize(self):
-        self._cprint(", ".join(
-            f"{value} {self._singluar_or_plural(name=key, number=value)}"
+        parts = [
+            f"{self._summary_count(key, value)} "
+            f"{self._singluar_or_plural(name=key, number=round(value))}"
             for key, value in self._counter.items()
-        ))
+        ]
+        if self._truncated:
+            entries = self._singluar_or_plural(
+                name="entries",
+                number=self.max_entries,
+            )
+            parts.append(f"stopped at {self.max_entries} {entries}")
+        self._cprint(", ".join(parts))
+        for path in self._timed_out:
+            self._cprint(
+                f"timed out: {self._name(path)}",
+                color=self.marker_color,
+                attrs=self.marker_attrs,
+            )
+
+    def _summary_count(self, key, value):
+        """The count for the summary, with its margin if it's estimated."""
+        if key not in self._variances:
+            return f"{round(value)}"
+        error = margin(self._variances[key])
+        return f"~{round(value)} ± {'?' if error is None else error}"
+
+    def _take_entry(self):
+        """Count an entry against --max-entries, past which it's _Truncated."""
+        if self._entries_left is None:
+            return
+        if self._entries_left == 0:
+            raise _Truncated
+        self._entries_left -= 1
 
     def _to_print(self, path, name):
         if not self.list_hidden and name.startswith("."):
             return False
-        if self.list_only_dirs and not os.path.isdir(os.path.join(path, name)):
+        if self.list_only_dirs and not self._fs.isdir(
+            self._fs.join(path, name),
+        ):
             return False
         return True
 
+    def _uses_statx(self):
+        """Whether stats are taken through statx rather than os.stat.
+
+        They are with --no-sync, and where one of the paths is on a
+        network filesystem and fewer fields than os.stat's are needed.
+        Otherwise os.stat is quicker than a call through ctypes.
+        """
+        if self.no_sync:
+            return True
+        if self._stat_mask() == STATX_BASIC_STATS:
+            return False
+        if not (network := devices(NETWORK_FSTYPES)):
+            return False
+        for path in self.paths:
+            try:
+                if os.stat(path).st_dev in network:
+                    return True
+            except (OSError, ValueError):
+                pass  # Not there (yet), or not a local path.
+        return False
+
+    def _write(self, *args, **kwargs):
+        self._renderer.write(*args, **kwargs)
+
     @staticmethod
     def _singluar_or_plural(name, number):
         """Change plural name to singular if number is 1"""
@@ -316,5 +1385,24 @@ class Tree:
         return name
 
 
+def enable_caches():
+    """Keep listings and digests between runs (used by `ccli daemon`).
+
+    User and group names are always cached for the life of the process.
+    """
+    Tree._listings = ListingCache()
+    Checksums._digests = DigestCache()
+
+
 def main(*args, **kwargs):
-    Tree(*args, **kwargs)
+    if kwargs.get("browse"):
+        from .browse import browse
+        browse(*args, **kwargs)
+    elif kwargs.get("diff") or kwargs.get("save_snapshot"):
+        from .diff import DiffTree
+        DiffTree(*args, **kwargs)
+    elif kwargs.get("undecodable") == "raw":
+        with raw_output(sys.stdout):
+            Tree(*args, **kwargs)
+    else:
+        Tree(*args, **kwargs)
@@ -0,0 +1,64 @@
+"""Filesystem types of the mounts, from /proc/self/mountinfo."""
+import os
+import re
+
+MOUNTINFO = "/proc/self/mountinfo"
+
+# Filesystems whose stats can mean asking a server (for devices).
+NETWORK_FSTYPES = (
+    "9p",
+    "afs",
+    "ceph",
+    "cifs",
+    "fuse.sshfs",
+    "glusterfs",
+    "lustre",
+    "nfs",
+    "nfs4",
+    "smb3",
+    "smbfs",
+)
+
+
+def parse_mountinfo(text):
+    """Yield (st_dev, mount point, filesystem type) for each mount.
+
+    See proc(5): the filesystem type follows the "-" that ends the
+    optional fields, and spaces etc. in mount points are octal escapes.
+    """
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            major, minor = fields[2].split(":")
+            fstype = fields[fields.index("-", 6) + 1]
+        except (IndexError, ValueError):
+            continue
+        mount_point = re.sub(
+            r"\\([0-7]{3})",
+            lambda match: chr(int(match.group(1), 8)),
+            fields[4],
+        )
+        yield os.makedev(int(major), int(minor)), mount_point, fstype
+
+
+def devices(fstypes, mountinfo=MOUNTINFO):
+    """Map st_dev to filesystem type, for mounts of the given types.
+
+    A type also matches its subtypes, so "fuse" matches "fuse.sshfs".
+    Without a mountinfo (not Linux), nothing matches.
+    """
+    if not fstypes:
+        return {}
+    try:
+        with open(mountinfo) as fh:
+            text = fh.read()
+    except OSError:
+        return {}
+    return {
+        dev: fstype
+        for dev, _, fstype in parse_mountinfo(text)
+        if any(
+            fstype == wanted or fstype.startswith(f"{wanted}.")
+            for wanted in fstypes
+        )
+    }
@@ -0,0 +1,42 @@
+"""How `ccli tree --bytes-paths` prints names.
+
+With --bytes-paths, local paths stay bytes from the listing through the
+stats and joins, and a name is only decoded when it's printed. Names
+that aren't valid in the filesystem encoding are printed by one of
+UNDECODABLE: escape shows their bad bytes as \\xNN, replace as U+FFFD,
+and raw writes the bytes out as they are.
+"""
+import sys
+from contextlib import contextmanager
+
+UNDECODABLE = ("escape", "replace", "raw")
+
+_ERRORS = {
+    "escape": "backslashreplace",
+    "replace": "replace",
+    "raw": "surrogateescape",  # Encoded back to the bytes by raw_output.
+}
+
+
+def decode(name, undecodable="escape"):
+    """A name (or path) to print: bytes decoded, a str as it is."""
+    if isinstance(name, str):
+        return name
+    return name.decode(sys.getfilesystemencoding(), _ERRORS[undecodable])
+
+
+@contextmanager
+def raw_output(stream):
+    """Write names decoded with undecodable="raw" to stream as bytes.
+
+    Streams that can't be reconfigured are left as they are.
+    """
+    if not hasattr(stream, "reconfigure"):
+        yield
+        return
+    errors = stream.errors
+    stream.reconfigure(errors="surrogateescape")
+    try:
+        yield
+    finally:
+        stream.reconfigure(errors=errors)
@@ -0,0 +1,83 @@
+"""What `ccli tree --newer/--older/--min-size/--user` keep.
+
+The predicates are checked on the stats the walker takes anyway (and
+keeps for printing), as it lists each directory, so what doesn't match
+is never formatted.
+"""
+import pwd
+import re
+from datetime import datetime
+
+# Seconds in each unit of an age, like 90m or 2d.
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_AGE = re.compile(r"(\d+(?:\.\d*)?)([smhdw])")
+
+# Binary multiples for sizes, like -h prints them.
+_SIZE_UNITS = "KMGTP"
+_SIZE = re.compile(r"(\d+(?:\.\d*)?)([KMGTP]?)", re.IGNORECASE)
+
+
+def parse_time(text, now):
+    """A timestamp from an age before now (like 36h) or an ISO date.
+
+    Raises ValueError for anything else.
+    """
+    if match := _AGE.fullmatch(text):
+        return now - float(match[1]) * _AGE_UNITS[match[2]]
+    return datetime.fromisoformat(text).timestamp()
+
+
+def parse_size(text):
+    """Bytes from a number with an optional K, M, G, T or P suffix.
+
+    Raises ValueError for anything else.
+    """
+    if not (match := _SIZE.fullmatch(text)):
+        raise ValueError(f"{text!r} isn't a size.")
+    power = _SIZE_UNITS.index(match[2].upper()) + 1 if match[2] else 0
+    return int(float(match[1]) * 1024 ** power)
+
+
+def parse_user(text):
+    """The UID of a user name, or of a UID itself.
+
+    Raises ValueError if there's no such user.
+    """
+    if text.isdigit():
+        return int(text)
+    try:
+        return pwd.getpwnam(text).pw_uid
+    except KeyError:
+        raise ValueError(f"No user named {text!r}.") from None
+
+
+class Predicates:
+    """Bounds on a path's stats, all of which it must be within.
+
+    newer and older are timestamps the modification time must be after
+    and before, min_size is in bytes and owner is a UID. Any of them
+    can be None, to not check it; a path with no stats (a broken link)
+    only matches when none are checked.
+    """
+
+    def __init__(self, newer=None, older=None, min_size=None, owner=None):
+        self.newer = newer
+        self.older = older
+        self.min_size = min_size
+        self.owner = owner
+
+    def __bool__(self):
+        return any(
+            bound is not None
+            for bound in (self.newer, self.older, self.min_size, self.owner)
+        )
+
+    def matches(self, stats):
+        if not self:
+            return True
+        return stats is not None and not any((
+            self.newer is not None and stats.st_mtime <= self.newer,
+            self.older is not None and stats.st_mtime >= self.older,
+            self.min_size is not None and stats.st_size < self.min_size,
+            self.owner is not None and stats.st_uid != self.owner,
+        ))
@@ -0,0 +1,71 @@
+"""A status line on stderr for `ccli tree --progress`.
+
+The walk bumps plain counters on a Progress for each entry; the line is
+only redrawn when interval seconds have passed, so an entry costs a few
+additions and a clock read.
+"""
+import os
+import shutil
+import sys
+import time
+
+_INTERVAL = 0.2
+
+
+class Progress:
+    """Counters for the walk so far, shown on stream as they change.
+
+    entries is how many have been listed, pending how many are waiting
+    to be listed, bytes the sizes seen so far (only shown once there
+    are some), and directory the one being listed (str or bytes).
+    """
+
+    def __init__(self, stream, interval=_INTERVAL, clock=time.monotonic):
+        self.entries = 0
+        self.pending = 0
+        self.bytes = 0
+        self.directory = ""
+        self._stream = stream
+        self._interval = interval
+        self._clock = clock
+        self._start = clock()
+        self._next = self._start + interval
+        self._drawn = False
+
+    def tick(self):
+        """Count an entry, and redraw the line if it's due."""
+        self.entries += 1
+        if (now := self._clock()) >= self._next:
+            self._next = now + self._interval
+            self._draw(now)
+
+    def close(self):
+        """Erase the line, so it doesn't get in the way of the summary."""
+        if self._drawn:
+            self._stream.write("\r\033[K")
+            self._stream.flush()
+
+    def _draw(self, now):
+        parts = [
+            f"{self.entries:,} entries "
+            f"({self.entries / (now - self._start):,.0f}/s)",
+            f"{self.pending:,} pending",
+        ]
+        if self.bytes:
+            parts.append(f"{self.bytes:,} bytes")
+        parts.append(f"in {os.fsdecode(self.directory)}")
+        width = shutil.get_terminal_size().columns - 1
+        self._stream.write(f"\r{', '.join(parts)[:width]}\033[K")
+        self._stream.flush()
+        self._drawn = True
+
+
+def open_progress(prints_rows):
+    """A Progress on stderr, or None where it wouldn't be seen.
+
+    That's when stderr isn't a terminal, and when the rows are printed
+    to the same terminal, where the line would get in their way.
+    """
+    if not sys.stderr.isatty() or (prints_rows and sys.stdout.isatty()):
+        return None
+    return Progress(sys.stderr)
@@ -0,0 +1,234 @@
+"""Renderers for `ccli tree --output-format`.
+
+Tree gives its renderer each piece of a row as it prints it (the text,
+color and attrs it would give termcolor), and says when it goes into and
+comes back out of a directory's entries. The HTML and Markdown renderers
+nest the rows instead of drawing the tree, and write each row out as
+soon as they know where it goes, so memory doesn't grow with the tree.
+"""
+import html
+import re
+import sys
+from termcolor import cprint
+
+FORMATS = ("text", "html", "markdown")
+
+# CSS for termcolor's colors and attributes, which are used as classes,
+# so a piece printed with color="cyan", attrs=("bold",) (like a
+# directory) gets class="cyan bold".
+_CSS = {
+    "black": "color: #000000",
+    "grey": "color: #000000",
+    "red": "color: #cd0000",
+    "green": "color: #00cd00",
+    "yellow": "color: #cdcd00",
+    "blue": "color: #0000ee",
+    "magenta": "color: #cd00cd",
+    "cyan": "color: #00cdcd",
+    "light_grey": "color: #e5e5e5",
+    "dark_grey": "color: #7f7f7f",
+    "light_red": "color: #ff0000",
+    "light_green": "color: #00ff00",
+    "light_yellow": "color: #ffff00",
+    "light_blue": "color: #5c5cff",
+    "light_magenta": "color: #ff00ff",
+    "light_cyan": "color: #00ffff",
+    "white": "color: #ffffff",
+    "bold": "font-weight: bold",
+    "dark": "opacity: 0.6",
+    "italic": "font-style: italic",
+    "underline": "text-decoration: underline",
+    "blink": "text-decoration: blink",
+    "reverse": "filter: invert(100%)",
+    "concealed": "visibility: hidden",
+    "strike": "text-decoration: line-through",
+}
+
+_HTML_HEAD = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>ccli tree</title>
+<style>
+body { background: #000000; color: #e5e5e5; font-family: monospace; }
+ul { list-style: none; margin: 0; padding-left: 2em; }
+li, summary, p { white-space: pre; }
+summary { cursor: pointer; }
+%s
+</style>
+</head>
+<body>
+<ul>
+""" % "\n".join(f".{name} {{ {css}; }}" for name, css in _CSS.items())
+
+# Characters that mean something to Markdown, escaped with a backslash.
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]<>|~#&])")
+
+# What would start a list (or a nested one) at the start of a row.
+_MARKDOWN_LIST = re.compile(r"^(\s*\d*)([-+.)])(?=\s|$)")
+
+# Markdown's nearest markup for termcolor's attributes.
+_MARKDOWN_ATTRS = {
+    "bold": "**",
+    "italic": "*",
+    "underline": "*",
+    "strike": "~~",
+}
+
+
+def _write(text):
+    sys.stdout.write(text)
+
+
+class TextRenderer:
+    """The terminal's output: the tree is drawn, in termcolor's colors."""
+
+    nested = False
+
+    def __init__(self, no_color=False, force_color=False):
+        self._no_color = no_color
+        self._force_color = force_color
+
+    def write(self, *args, **kwargs):
+        cprint(
+            *args,
+            no_color=self._no_color,
+            force_color=self._force_color,
+            **kwargs,
+        )
+
+    def enter(self):
+        pass
+
+    def leave(self):
+        pass
+
+    def report(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class HtmlRenderer:
+    """A page with a <details> element for each directory's entries.
+
+    A row is held back until the next call says whether it's a
+    directory with entries (its <summary>) or not (a plain <li>), so at
+    most one row is held at a time.
+    """
+
+    nested = True
+
+    def __init__(self):
+        self._pieces = []
+        self._held = None
+        self._depth = 0
+        self._reporting = False
+        _write(_HTML_HEAD)
+
+    def write(self, text, color=None, attrs=None, end="\n"):
+        text = html.escape(str(text))
+        classes = " ".join(filter(None, (color, *(attrs or ()))))
+        if text and classes:
+            text = f'<span class="{classes}">{text}</span>'
+        self._pieces.append(text + end.rstrip("\n"))
+        if end.endswith("\n"):
+            row, self._pieces = "".join(self._pieces), []
+            if self._reporting:
+                _write(f"<p>{row}</p>\n")
+            else:
+                self._flush()
+                self._held = row
+
+    def enter(self):
+        _write(f"<li><details open><summary>{self._held}</summary><ul>\n")
+        self._held = None
+        self._depth += 1
+
+    def leave(self):
+        self._flush()
+        _write("</ul></details></li>\n")
+        self._depth -= 1
+
+    def report(self):
+        """Close the tree, and any directories left open by --max-entries.
+
+        Rows after this are the summary.
+        """
+        while self._depth:
+            self.leave()
+        self._flush()
+        _write("</ul>\n")
+        self._reporting = True
+
+    def close(self):
+        if not self._reporting:
+            self.report()
+        _write("</body>\n</html>\n")
+
+    def _flush(self):
+        if self._held is not None:
+            _write(f"<li>{self._held}</li>\n")
+            self._held = None
+
+
+class MarkdownRenderer:
+    """A nested list, with directories' entries indented beneath them.
+
+    Markdown has no colors, so only the attributes it has markup for
+    show (bold directories, italic links).
+    """
+
+    nested = True
+
+    def __init__(self):
+        self._pieces = []
+        self._depth = 0
+        self._reporting = False
+
+    def write(self, text, color=None, attrs=None, end="\n"):
+        text = _MARKDOWN_SPECIAL.sub(r"\\\1", str(text))
+        if not "".join(self._pieces).strip():
+            text = _MARKDOWN_LIST.sub(r"\1\\\2", text)
+        core = text.strip()
+        if core:
+            marks = "".join(
+                _MARKDOWN_ATTRS[attr]
+                for attr in attrs or ()
+                if attr in _MARKDOWN_ATTRS
+            )
+            lead = text[:len(text) - len(text.lstrip())]
+            trail = text[len(text.rstrip()):]
+            text = lead + marks + core + marks[::-1] + trail
+        self._pieces.append(text + end.rstrip("\n"))
+        if end.endswith("\n"):
+            row, self._pieces = "".join(self._pieces), []
+            if self._reporting:
+                _write(f"{row}\n\n")
+            else:
+                _write(f"{'  ' * self._depth}- {row}\n")
+
+    def enter(self):
+        self._depth += 1
+
+    def leave(self):
+        self._depth -= 1
+
+    def report(self):
+        """Rows after this are the summary, as paragraphs."""
+        _write("\n")
+        self._reporting = True
+
+    def close(self):
+        pass
+
+
+def open_renderer(output_format, no_color=False, force_color=False):
+    """The renderer for one of FORMATS (a TextRenderer for text)."""
+    if output_format == "html":
+        return HtmlRenderer()
+    if output_format == "markdown":
+        return MarkdownRenderer()
+    return TextRenderer(no_color=no_color, force_color=force_color)
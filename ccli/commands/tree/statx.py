@@ -0,0 +1,196 @@
+"""Stats through Linux's statx(2), with only the fields that are needed.
+
+os.stat asks for every field, which makes network filesystems check
+them all with the server even when only a path's type is wanted.
+statx takes a mask of the fields that are wanted instead, and with
+AT_STATX_DONT_SYNC it takes whatever the filesystem has cached without
+asking the server at all. It's called through ctypes (glibc 2.28+);
+open_statx returns None where it isn't available, and the os functions
+are used instead. Elsewhere (on local filesystems, say) a call through
+ctypes costs more than os.stat does, so it's only worth opening where
+it saves asking a server.
+"""
+import ctypes
+import os
+import stat
+import sys
+
+STATX_TYPE = 0x0001
+STATX_MODE = 0x0002
+STATX_NLINK = 0x0004
+STATX_UID = 0x0008
+STATX_GID = 0x0010
+STATX_ATIME = 0x0020
+STATX_MTIME = 0x0040
+STATX_CTIME = 0x0080
+STATX_INO = 0x0100
+STATX_SIZE = 0x0200
+STATX_BLOCKS = 0x0400
+STATX_BASIC_STATS = 0x07ff
+
+_AT_FDCWD = -100
+_AT_SYMLINK_NOFOLLOW = 0x0100
+_AT_STATX_DONT_SYNC = 0x4000
+
+
+class _Timestamp(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_int64),
+        ("tv_nsec", ctypes.c_uint32),
+        ("reserved", ctypes.c_int32),
+    ]
+
+    @property
+    def ns(self):
+        return self.tv_sec * 10**9 + self.tv_nsec
+
+
+class _Statx(ctypes.Structure):
+    """struct statx, from linux/stat.h (256 bytes, mostly spare)."""
+    _fields_ = [
+        ("stx_mask", ctypes.c_uint32),
+        ("stx_blksize", ctypes.c_uint32),
+        ("stx_attributes", ctypes.c_uint64),
+        ("stx_nlink", ctypes.c_uint32),
+        ("stx_uid", ctypes.c_uint32),
+        ("stx_gid", ctypes.c_uint32),
+        ("stx_mode", ctypes.c_uint16),
+        ("spare0", ctypes.c_uint16),
+        ("stx_ino", ctypes.c_uint64),
+        ("stx_size", ctypes.c_uint64),
+        ("stx_blocks", ctypes.c_uint64),
+        ("stx_attributes_mask", ctypes.c_uint64),
+        ("stx_atime", _Timestamp),
+        ("stx_btime", _Timestamp),
+        ("stx_ctime", _Timestamp),
+        ("stx_mtime", _Timestamp),
+        ("stx_rdev_major", ctypes.c_uint32),
+        ("stx_rdev_minor", ctypes.c_uint32),
+        ("stx_dev_major", ctypes.c_uint32),
+        ("stx_dev_minor", ctypes.c_uint32),
+        ("spare2", ctypes.c_uint64 * 14),
+    ]
+
+
+def _load(platform=sys.platform):
+    """libc's statx, or None if it's missing or the kernel refuses it."""
+    if not platform.startswith("linux"):
+        return None
+    function = getattr(ctypes.CDLL(None, use_errno=True), "statx", None)
+    if function is None:
+        return None  # glibc before 2.28, or another libc.
+    function.argtypes = (
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_uint,
+        ctypes.POINTER(_Statx),
+    )
+    function.restype = ctypes.c_int
+    # Kernels before 4.11 (and some seccomp filters) fail every call.
+    if function(_AT_FDCWD, b"/", 0, STATX_TYPE, ctypes.byref(_Statx())):
+        return None
+    return function
+
+
+_statx = _load()
+
+
+def _stat_result(buffer):
+    """An os.stat_result from a struct statx.
+
+    Fields that weren't asked for (or that the filesystem doesn't have)
+    are 0.
+    """
+    atime, mtime, ctime = (
+        buffer.stx_atime.ns,
+        buffer.stx_mtime.ns,
+        buffer.stx_ctime.ns,
+    )
+    return os.stat_result((
+        buffer.stx_mode,
+        buffer.stx_ino,
+        os.makedev(buffer.stx_dev_major, buffer.stx_dev_minor),
+        buffer.stx_nlink,
+        buffer.stx_uid,
+        buffer.stx_gid,
+        buffer.stx_size,
+        atime // 10**9,
+        mtime // 10**9,
+        ctime // 10**9,
+    ), {
+        "st_atime": atime / 10**9,
+        "st_mtime": mtime / 10**9,
+        "st_ctime": ctime / 10**9,
+        "st_atime_ns": atime,
+        "st_mtime_ns": mtime,
+        "st_ctime_ns": ctime,
+        "st_blksize": buffer.stx_blksize,
+        "st_blocks": buffer.stx_blocks,
+        "st_rdev": os.makedev(buffer.stx_rdev_major, buffer.stx_rdev_minor),
+    })
+
+
+class Statx:
+    """stat, lstat and the os.path checks, through statx.
+
+    stat and lstat ask for the fields in mask; the type and device are
+    always filled in. The checks only ask for the type. With sync=False,
+    network filesystems answer from their caches, so stats may be stale.
+    Like the os functions, each takes a dir_fd for a path relative to.
+    """
+
+    def __init__(self, mask=STATX_BASIC_STATS, sync=True):
+        self.mask = mask | STATX_TYPE
+        self._flags = 0 if sync else _AT_STATX_DONT_SYNC
+
+    def _call(self, path, flags, mask, dir_fd=None):
+        return _stat_result(self._fill(path, flags, mask, dir_fd))
+
+    def _fill(self, path, flags, mask, dir_fd=None):
+        """The struct statx for path."""
+        path = os.fsencode(path)
+        if b"\0" in path:
+            raise ValueError("embedded null byte")
+        buffer = _Statx()
+        if _statx(
+            _AT_FDCWD if dir_fd is None else dir_fd,
+            path,
+            flags | self._flags,
+            mask,
+            ctypes.byref(buffer),
+        ):
+            number = ctypes.get_errno()
+            raise OSError(number, os.strerror(number), os.fsdecode(path))
+        return buffer
+
+    def _mode(self, path, flags=0, dir_fd=None):
+        """The path's type, or 0 if there's nothing there."""
+        try:
+            return self._fill(path, flags, STATX_TYPE, dir_fd).stx_mode
+        except (OSError, ValueError):
+            return 0
+
+    def exists(self, path, dir_fd=None):
+        return self._mode(path, dir_fd=dir_fd) != 0
+
+    def isdir(self, path, dir_fd=None):
+        return stat.S_ISDIR(self._mode(path, dir_fd=dir_fd))
+
+    def islink(self, path, dir_fd=None):
+        return stat.S_ISLNK(
+            self._mode(path, _AT_SYMLINK_NOFOLLOW, dir_fd=dir_fd),
+        )
+
+    def lstat(self, path, dir_fd=None):
+        return self._call(path, _AT_SYMLINK_NOFOLLOW, self.mask, dir_fd)
+
+    def stat(self, path, dir_fd=None):
+        return self._call(path, 0, self.mask, dir_fd)
+
+
+def open_statx(mask=STATX_BASIC_STATS, sync=True):
+    """A Statx for mask, or None where statx isn't available."""
+    if _statx is None:
+        return None
+    return Statx(mask=mask, sync=sync)
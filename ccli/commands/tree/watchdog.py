@@ -0,0 +1,58 @@
+import errno
+import queue
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class _Worker(threading.Thread):
+    """Runs calls until it's sent None."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.calls = queue.SimpleQueue()
+        self.start()
+
+    def run(self):
+        while (call := self.calls.get()) is not None:
+            future, function, args = call
+            try:
+                future.set_result(function(*args))
+            except BaseException as error:
+                future.set_exception(error)
+
+
+class Watchdog:
+    """Run calls on worker threads, giving up on those that take too long.
+
+    A call that takes longer than timeout seconds raises TimeoutError.
+    Its worker is abandoned: it exits if the call ever returns, and as a
+    daemon thread it doesn't keep the process from exiting if it never
+    does. Other workers are reused. Safe to use from several threads.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def call(self, function, *args):
+        with self._lock:
+            worker = self._idle.pop() if self._idle else _Worker()
+        future = Future()
+        worker.calls.put((future, function, args))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.done():
+                raise  # The call itself raised a TimeoutError.
+            worker.calls.put(None)
+            worker = None
+            raise TimeoutError(
+                errno.ETIMEDOUT,
+                f"No answer in {self.timeout} seconds",
+            ) from None
+        finally:
+            if worker is not None:
+                with self._lock:
+                    self._idle.append(worker)
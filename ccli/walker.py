@@ -0,0 +1,409 @@
+"""A fast walk over directory trees, shared by the commands.
+
+Walker lists directories with scandir, so entry types come with the
+listing and only symbolic links need a stat. Each listing is filtered
+and sorted the same way for every command, the stats that sorting (or
+the command) needs are cached until they're used, directories that have
+been entered already are noticed instead of walked again when symbolic
+links are followed, and directories can be listed on a thread pool
+ahead of the walk.
+"""
+import re
+import stat
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .backends import LocalBackend
+
+# A directory entry, as Walker.ls lists it. isdir is only looked up
+# when it's needed (with dirs_first or list_only_dirs).
+Listed = namedtuple("Listed", ("name", "isdir"))
+
+# A directory entry, as Walker.scan lists it. resolved is where the
+# path leads, skip is prune's reason for not entering it (None to
+# enter), and lstat is its lstat() (only taken with lstat=True).
+Entry = namedtuple(
+    "Entry",
+    (
+        "name",
+        "path",
+        "islink",
+        "isdir",
+        "exists",
+        "resolved",
+        "skip",
+        "lstat",
+    ),
+)
+
+# A step of Walker.walk. looped is whether the entry leads to a
+# directory that's been entered already, so it isn't entered again.
+Visit = namedtuple("Visit", ("path", "entry", "depth", "looped"))
+
+SORTS = ("name", "size", "mtime", "version", "none")
+
+_DIGITS = re.compile(r"(\d+)")
+_BYTES_DIGITS = re.compile(rb"(\d+)")
+
+
+def version_key(name):
+    """Sort key that orders runs of digits by their value, like ls -v."""
+    parts = _DIGITS.split(name.casefold())
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+def _bytes_version_key(name):
+    """version_key for a bytes name."""
+    parts = _BYTES_DIGITS.split(name.lower())
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+def hidden_prefix(directory):
+    """What the names of hidden entries in directory start with.
+
+    It's a bytes "." when directory is bytes, since its names are too.
+    """
+    return b"." if isinstance(directory, bytes) else "."
+
+
+class Walker:
+    """Lists, filters and sorts directories, and walks trees of them.
+
+    fs is the backend the paths are on (the local filesystem by
+    default), and can be swapped between calls. Paths can be str or
+    bytes; the names in a listing are the same type as its directory's
+    path. Names are filtered by
+    list_hidden, list_only_dirs and filters, each of which is called as
+    filter(directory, name) and must return true for the name to be
+    listed. Listings are ordered by sort_by (one of SORTS), then
+    reversed, then grouped directories first with dirs_first.
+
+    prune(stats) gives the reason not to enter a directory, or None to
+    enter it. With lstat, scan takes the lstat() of each entry too.
+    With parallel, walk lists directories on a pool of worker threads
+    ahead of the walk, in the order it goes into them: at most window
+    at a time are being listed or held until they're visited (with a
+    window of 0, each is listed when it's visited). queued is how many
+    entries the latest walk has listed but not visited yet.
+    """
+
+    def __init__(
+        self,
+        fs=None,
+        list_hidden=False,
+        list_only_dirs=False,
+        follow_links=False,
+        sort_by="name",
+        reverse=False,
+        dirs_first=False,
+        filters=(),
+        prune=None,
+        lstat=False,
+        parallel=False,
+        workers=None,
+        window=64,
+    ):
+        self.fs = LocalBackend() if fs is None else fs
+        self.list_hidden = list_hidden
+        self.list_only_dirs = list_only_dirs
+        self.follow_links = follow_links
+        self.sort_by = sort_by
+        self.reverse = reverse
+        self.dirs_first = dirs_first
+        self.filters = tuple(filters)
+        self.prune = prune
+        self.lstat = lstat
+        self.parallel = parallel
+        self.workers = workers
+        self.window = window
+        self.queued = 0
+        self._stats = {}
+
+    def stat(self, path):
+        """Stats of path (None if it's missing), kept until forget(path)."""
+        try:
+            return self._stats[path]
+        except KeyError:
+            pass
+        try:
+            stats = self.fs.stat(path)
+        except (OSError, ValueError):  # Including TimeoutError.
+            stats = None
+        self._stats[path] = stats
+        return stats
+
+    def kept(self, path):
+        """The kept stats of path, without taking them (None if not kept)."""
+        return self._stats.get(path)
+
+    def forget(self, path=None):
+        """Drop the kept stats of path (or of every path)."""
+        if path is None:
+            self._stats.clear()
+        else:
+            self._stats.pop(path, None)
+
+    def enters(self, entry):
+        """Whether walk goes into an Entry (if it's not been already)."""
+        return entry.isdir and not entry.skip and (
+            self.follow_links or not entry.islink
+        )
+
+    def entry(self, path):
+        """An Entry for a path to start from. It's never skipped."""
+        islink = self.fs.islink(path)
+        return Entry(
+            name=self.fs.basename(path),
+            path=path,
+            islink=islink,
+            isdir=self.fs.isdir(path),
+            exists=self.fs.exists(path),
+            resolved=self.fs.realpath(path),
+            skip=None,
+            lstat=self._lstat(path) if self.lstat else None,
+        )
+
+    def ls(self, directory):
+        """The Listed entries in directory, in order.
+
+        Types are only looked up when they're needed, from the listing,
+        so only symbolic links need a stat.
+        """
+        typed = self.dirs_first or self.list_only_dirs
+        hidden = hidden_prefix(directory)
+        listed = []
+        for dirent in self.fs.scandir(directory):
+            if not self._passes(directory, dirent.name, hidden):
+                continue
+            isdir = typed and self._is_dir(dirent)
+            if self.list_only_dirs and not isdir:
+                continue
+            listed.append(Listed(name=dirent.name, isdir=isdir))
+        return self.sort(directory, listed)
+
+    def scan(self, directory):
+        """The Entry of everything in a resolved directory, in order.
+
+        Like ls, only symbolic links need a stat (or directories too,
+        with prune). The stats taken for sorting aren't kept.
+        """
+        entries = []
+        hidden = hidden_prefix(directory)
+        for dirent in self.fs.scandir(directory):
+            if not self._passes(directory, dirent.name, hidden):
+                continue
+            exists = True
+            stats = skip = None
+            if islink := dirent.is_symlink():
+                resolved = self.fs.realpath(dirent.path)
+                try:
+                    stats = self.fs.stat(dirent.path)
+                except TimeoutError:
+                    raise
+                except OSError:
+                    exists = isdir = False
+                else:
+                    isdir = stat.S_ISDIR(stats.st_mode)
+            else:
+                resolved = dirent.path
+                isdir = dirent.is_dir(follow_symlinks=False)
+            if self.list_only_dirs and not isdir:
+                continue
+            if self.prune and isdir and (self.follow_links or not islink):
+                skip = self.prune(stats or self.fs.stat(dirent.path))
+            entries.append(Entry(
+                name=dirent.name,
+                path=dirent.path,
+                islink=islink,
+                isdir=isdir,
+                exists=exists,
+                resolved=resolved,
+                skip=skip,
+                lstat=self._lstat(dirent.path) if self.lstat else None,
+            ))
+        entries = self.sort(directory, entries)
+        if self.sort_by in ("mtime", "size"):
+            for entry in entries:
+                self.forget(self.fs.join(directory, entry.name))
+        return entries
+
+    def sort(self, directory, entries):
+        """Sort the entries inside directory (anything with name, isdir).
+
+        Each entry's key is computed once; sizes and modification times
+        come from stat(), so they're shared with whoever uses them next.
+        dirs_first is a second, stable pass on isdir, which the listing
+        already knows.
+        """
+        key = self._sort_key(directory)
+        if key is not None:
+            entries = sorted(
+                entries,
+                key=lambda entry: key(entry.name),
+                reverse=self.reverse,
+            )
+        elif self.reverse:
+            entries = entries[::-1]
+        if self.dirs_first:
+            entries = sorted(entries, key=lambda entry: not entry.isdir)
+        return entries
+
+    def walk(self, path, seen=None):
+        """Visit path and everything beneath it, depth first.
+
+        Each directory is listed before its Visit, so the calls for it
+        have been made by then. The resolved path of every visit is
+        added to seen, after the visit, and with follow_links,
+        directories whose resolved path is in seen aren't entered.
+        Directories that can't be listed (or time out) look empty.
+        """
+        seen = set() if seen is None else seen
+        try:
+            root = self.entry(path)
+        except TimeoutError:
+            return
+        executor = None
+        if self.parallel:
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.queued = 1
+        try:
+            pending = {}
+            ahead = deque([root])  # Directories to list, in walk order.
+            self._prefetch(ahead, pending, seen, executor)
+            stack = [iter(((path, root),))]
+            while stack:
+                step = next(stack[-1], None)
+                if step is None:
+                    stack.pop()
+                    continue
+                path, entry = step
+                self.queued -= 1
+                looped = entry.isdir and self.follow_links and (
+                    entry.resolved in seen
+                )
+                inside = []
+                if self.enters(entry):
+                    if ahead and ahead[0] is entry:
+                        ahead.popleft()  # Not reached by the window.
+                    future = pending.pop(entry.resolved, None)
+                    if future is not None:
+                        inside = future.result()
+                    elif not looped:
+                        inside = self._scan_or_empty(entry.resolved)
+                yield Visit(
+                    path=path,
+                    entry=entry,
+                    depth=len(stack) - 1,
+                    looped=looped,
+                )
+                seen.add(entry.resolved)
+                self.queued += len(inside)
+                ahead.extendleft(
+                    child for child in reversed(inside) if self.enters(child)
+                )
+                self._prefetch(ahead, pending, seen, executor)
+                stack.append(iter([
+                    (self.fs.join(path, child.name), child)
+                    for child in inside
+                ]))
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _is_dir(self, dirent):
+        """Whether a scandir entry is (or links to) a directory.
+
+        A link whose stat times out counts, so it's listed as timed out.
+        """
+        if not dirent.is_symlink():
+            return dirent.is_dir(follow_symlinks=False)
+        try:
+            return self.fs.isdir(dirent.path)
+        except TimeoutError:
+            return True
+
+    def _lstat(self, path):
+        try:
+            return self.fs.lstat(path)
+        except TimeoutError:
+            raise
+        except OSError:
+            return None  # Gone since it was listed.
+
+    def _mtime_key(self, directory, name):
+        """Non-existing sort last."""
+        stats = self.stat(self.fs.join(directory, name))
+        return float("inf") if stats is None else stats.st_mtime
+
+    def _passes(self, directory, name, hidden):
+        if not self.list_hidden and name.startswith(hidden):
+            return False
+        return all(check(directory, name) for check in self.filters)
+
+    def _prefetch(self, ahead, pending, seen, executor):
+        """Start listing the next directories that walk will go into.
+
+        They're taken from the front of ahead until window are pending.
+        The listings are added to pending, by resolved path, as futures
+        (or as a stand-in that lists the directory when it's asked to,
+        without an executor).
+        """
+        while ahead and len(pending) < self.window:
+            entry = ahead.popleft()
+            if entry.resolved in pending or (
+                self.follow_links and entry.resolved in seen
+            ):
+                continue
+            if executor is None:
+                pending[entry.resolved] = _Later(
+                    self._scan_or_empty,
+                    entry.resolved,
+                )
+            else:
+                pending[entry.resolved] = executor.submit(
+                    self._scan_or_empty,
+                    entry.resolved,
+                )
+
+    def _scan_or_empty(self, directory):
+        try:
+            return self.scan(directory)
+        except OSError:  # Including TimeoutError.
+            return []
+
+    def _size_key(self, directory, fold, name):
+        """Largest first, then by name. Non-existing sort after empty."""
+        stats = self.stat(self.fs.join(directory, name))
+        size = -1 if stats is None else stats.st_size
+        return -size, fold(name)
+
+    def _sort_key(self, directory):
+        """The key that sorts the names inside directory (None for none).
+
+        bytes names are folded to lower case by their ASCII letters.
+        """
+        if isinstance(directory, bytes):
+            fold, version = bytes.lower, _bytes_version_key
+        else:
+            fold, version = str.casefold, version_key
+        return {
+            "mtime": partial(self._mtime_key, directory),
+            "name": fold,
+            "none": None,
+            "size": partial(self._size_key, directory, fold),
+            "version": version,
+        }[self.sort_by]
+
+
+class _Later:
+    """A call made when its result is first asked for, like a Future."""
+
+    def __init__(self, function, *args):
+        self._function = function
+        self._args = args
+
+    def result(self):
+        return self._function(*self._args)
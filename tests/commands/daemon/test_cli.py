@@ -0,0 +1,10 @@
+from click.testing import CliRunner
+from unittest import mock
+
+from ccli.commands.daemon.cli import daemon
+
+
+@mock.patch("ccli.commands.daemon.main.main", autospec=True)
+def test_daemon(mock_main):
+    CliRunner().invoke(daemon, ("--socket", "ccli.sock"))
+    mock_main.assert_called_once_with(socket_path="ccli.sock")
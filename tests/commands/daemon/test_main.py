@@ -0,0 +1,264 @@
+import os
+import pytest
+import socket
+import sys
+import threading
+import time
+from unittest import mock
+
+from ccli import client
+from ccli.commands.daemon import main
+from ccli.commands.tree.cache import ListingCache
+from ccli.commands.tree.checksum import Checksums, DigestCache
+from ccli.commands.tree.main import Tree
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "ccli.sock")
+
+
+@pytest.fixture
+def socket_pair():
+    ours, theirs = socket.socketpair()
+    with ours, theirs:
+        yield ours, theirs
+
+
+@pytest.fixture
+def restore_listings():
+    yield
+    Tree._listings = None
+    Checksums._digests = None
+
+
+def send_request(connection, **request):
+    request = {
+        "argv": ["--help"],
+        "cwd": os.getcwd(),
+        "encoding": "utf-8",
+        "env": dict(os.environ),
+        "isatty": [False, False],
+        **request,
+    }
+    connection.sendall(client.json.dumps(request).encode() + b"\n")
+
+
+def read_frames(connection):
+    frames = []
+    while True:
+        try:
+            header = client.receive_exactly(connection, client.HEADER.size)
+        except EOFError:
+            return frames
+        channel, size = client.HEADER.unpack(header)
+        frames.append((channel, client.receive_exactly(connection, size)))
+
+
+class TestInvoke:
+    def test_daemon(self, capsys):
+        assert main._invoke(["daemon"]) == 2
+        assert "can't serve itself" in capsys.readouterr().err
+
+    def test_success(self, capsys):
+        assert main._invoke(["--help"]) == 0
+        assert "Custom Command-Line Utilities." in capsys.readouterr().out
+
+    @pytest.mark.parametrize("code, expectation", [
+        (None, 0),
+        (3, 3),
+        ("message", 1),
+    ])
+    def test_exit(self, code, expectation, capsys):
+        with mock.patch.object(
+            main.CLI,
+            "main",
+            autospec=True,
+            side_effect=SystemExit(code),
+        ):
+            assert main._invoke(["tree"]) == expectation
+        if isinstance(code, str):
+            assert capsys.readouterr().err == "message\n"
+
+    def test_exception(self, capsys):
+        with mock.patch.object(
+            main.CLI,
+            "main",
+            autospec=True,
+            side_effect=ValueError("oops"),
+        ):
+            assert main._invoke(["tree"]) == 1
+        assert "ValueError: oops" in capsys.readouterr().err
+
+
+class TestServe:
+    def test_restores_state(self, socket_pair, tmp_path):
+        ours, theirs = socket_pair
+        cwd, environ, stdout = os.getcwd(), dict(os.environ), sys.stdout
+        send_request(ours, cwd=str(tmp_path), env={"TZ": "UTC"})
+        main.serve(theirs)
+        theirs.close()
+        frames = read_frames(ours)
+        assert frames[-1] == (client.EXIT, b"0")
+        assert b"Custom Command-Line Utilities." in b"".join(
+            data for channel, data in frames if channel == client.STDOUT
+        )
+        assert os.getcwd() == cwd
+        assert dict(os.environ) == environ
+        assert sys.stdout is stdout
+
+    def test_missing_cwd(self, socket_pair, tmp_path):
+        ours, theirs = socket_pair
+        send_request(ours, cwd=str(tmp_path / "missing"))
+        main.serve(theirs)
+        theirs.close()
+        frames = read_frames(ours)
+        assert frames[0][0] == client.STDERR
+        assert b"No such file or directory" in frames[0][1]
+        assert frames[-1] == (client.EXIT, b"1")
+
+    def test_client_gone(self, socket_pair):
+        ours, theirs = socket_pair
+        send_request(ours)
+        ours.close()
+        stdout = sys.stdout
+        main.serve(theirs)
+        assert sys.stdout is stdout
+
+    @pytest.mark.parametrize("request_line", [None, b"", b"{not json\n"])
+    def test_no_request(self, request_line, socket_pair):
+        """Clients that close, stay silent or send garbage are dropped."""
+        ours, theirs = socket_pair
+        if request_line is not None:
+            ours.sendall(request_line)
+            ours.shutdown(socket.SHUT_WR)
+        stdout, cwd = sys.stdout, os.getcwd()
+        with mock.patch.object(main, "_SEND_TIMEOUT", 0.05):
+            main.serve(theirs)
+        assert sys.stdout is stdout
+        assert os.getcwd() == cwd
+
+    def test_slow_client(self, socket_pair):
+        """A client that doesn't read its output is dropped."""
+        ours, theirs = socket_pair
+        send_request(ours, argv=["tree"])
+        stdout = sys.stdout
+
+        def flood(*args, **kwargs):
+            while True:
+                print("x" * 4096)
+
+        with mock.patch.object(
+            main,
+            "_SEND_TIMEOUT",
+            0.05,
+        ), mock.patch.object(
+            main.CLI,
+            "main",
+            autospec=True,
+            side_effect=flood,
+        ):
+            main.serve(theirs)
+        assert sys.stdout is stdout
+        with pytest.raises(OSError):
+            theirs.sendall(b"x")
+
+
+def test_warm(restore_listings):
+    main.warm()
+    assert isinstance(Tree._listings, ListingCache)
+    assert isinstance(Checksums._digests, DigestCache)
+
+
+class TestRemoveStaleSocket:
+    def test_missing(self, socket_path):
+        main._remove_stale_socket(socket_path)
+
+    def test_stale(self, socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(socket_path)
+        main._remove_stale_socket(socket_path)
+        assert not os.path.exists(socket_path)
+
+    def test_not_a_socket(self, socket_path):
+        with open(socket_path, "w"):
+            pass
+        main._remove_stale_socket(socket_path)
+        assert os.path.exists(socket_path)
+
+    def test_listening(self, socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(socket_path)
+            server.listen()
+            with pytest.raises(SystemExit, match="already listening"):
+                main._remove_stale_socket(socket_path)
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("restore_listings")
+@pytest.mark.parametrize("default", [False, True])
+def test_main(default, socket_path):
+    def connect():
+        while (connection := client.connect(socket_path)) is None:
+            time.sleep(0.01)
+        with connection:
+            assert os.stat(socket_path).st_mode & 0o777 == 0o600
+            send_request(connection)
+
+    thread = threading.Thread(target=connect)
+    thread.start()
+    with mock.patch.object(
+        main,
+        "serve",
+        autospec=True,
+        side_effect=KeyboardInterrupt,
+    ) as mock_serve, mock.patch.dict(os.environ, {"CCLI_SOCKET": socket_path}):
+        main.main(socket_path=None if default else socket_path)
+    thread.join()
+    mock_serve.assert_called_once()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("restore_listings")
+def test_main_connect_and_close(socket_path):
+    """A client that closes without a request doesn't stop the daemon."""
+    frames = []
+
+    def connect():
+        while (connection := client.connect(socket_path)) is None:
+            time.sleep(0.01)
+        connection.close()  # Like _remove_stale_socket.
+        with client.connect(socket_path) as connection:
+            send_request(connection)
+            frames.extend(read_frames(connection))
+
+    serve = main.serve
+
+    def serve_twice(connection):
+        serve(connection)
+        if mock_serve.call_count == 2:
+            raise KeyboardInterrupt
+
+    thread = threading.Thread(target=connect)
+    thread.start()
+    with mock.patch.object(
+        main,
+        "serve",
+        autospec=True,
+        side_effect=serve_twice,
+    ) as mock_serve:
+        main.main(socket_path=socket_path)
+    thread.join()
+    assert mock_serve.call_count == 2
+    assert frames[-1] == (client.EXIT, b"0")
+    assert not os.path.exists(socket_path)
+
+
+def test_frame_writer_timeout():
+    connection = mock.Mock()
+    connection.sendall.side_effect = socket.timeout
+    writer = main._FrameWriter(connection, client.STDOUT, isatty=False)
+    with pytest.raises(BrokenPipeError):
+        writer.write(b"data")
+    connection.shutdown.assert_called_once_with(socket.SHUT_RDWR)
@@ -0,0 +1,29 @@
+from click.testing import CliRunner
+from unittest import mock
+
+from ccli.commands.du import cli
+from ccli.commands.du.cli import du
+
+
+@mock.patch.object(cli, "invoke_main", autospec=True)
+def test_du(mock_invoke_main):
+    CliRunner().invoke(du, ("-a",))
+    mock_invoke_main.assert_called_once_with(
+        package="ccli.commands.du",
+        kwargs={
+            "all_files": True,
+            "follow_links": False,
+            "max_depth": None,
+            "nice_size": False,
+            "paths": (".",),
+        },
+    )
+
+
+@mock.patch.object(cli, "invoke_main", autospec=True)
+def test_summarize(mock_invoke_main):
+    CliRunner().invoke(du, ("-s", "-d", "2", "a", "b"))
+    kwargs = mock_invoke_main.call_args.kwargs["kwargs"]
+    assert kwargs["max_depth"] == 0
+    assert kwargs["paths"] == ("a", "b")
+    assert "summarize" not in kwargs
@@ -0,0 +1,114 @@
+import os
+import pytest
+from unittest import mock
+
+from ccli.commands.du import main
+from ccli.commands.du.main import DiskUsage
+
+
+@pytest.fixture
+def root(tmp_path):
+    """root
+    ├―― a_dir
+    │   └―― a_file
+    ├―― b_file
+    ├―― hard (a hard link to b_file)
+    └―― to_dir -> a_dir
+    """
+    root = tmp_path / "root"
+    (root / "a_dir").mkdir(parents=True)
+    (root / "a_dir" / "a_file").write_bytes(b"a" * 10000)
+    (root / "b_file").write_bytes(b"b" * 5000)
+    os.link(root / "b_file", root / "hard")
+    (root / "to_dir").symlink_to("a_dir")
+    return root
+
+
+def _usage(*paths):
+    return sum(os.lstat(path).st_blocks * 512 for path in paths)
+
+
+def test_du(root, capfd):
+    DiskUsage(paths=(str(root),))
+    a_dir = _usage(root / "a_dir", root / "a_dir" / "a_file")
+    total = a_dir + _usage(root, root / "b_file", root / "to_dir")
+    assert capfd.readouterr().out == (
+        f"{a_dir}\t{root / 'a_dir'}\n"
+        f"{total}\t{root}\n"
+    )
+
+
+def test_hidden(root, capfd):
+    """Hidden files and directories are counted, like du counts them."""
+    (root / ".hidden_dir").mkdir()
+    (root / ".hidden_dir" / "file").write_bytes(b"h" * 20000)
+    (root / ".hidden_file").write_bytes(b"h" * 30000)
+    DiskUsage(paths=(str(root),))
+    hidden = _usage(root / ".hidden_dir", root / ".hidden_dir" / "file")
+    total = hidden + _usage(
+        root,
+        root / ".hidden_file",
+        root / "a_dir",
+        root / "a_dir" / "a_file",
+        root / "b_file",
+        root / "to_dir",
+    )
+    assert capfd.readouterr().out.splitlines() == [
+        f"{hidden}\t{root / '.hidden_dir'}",
+        f"{_usage(root / 'a_dir', root / 'a_dir' / 'a_file')}"
+        f"\t{root / 'a_dir'}",
+        f"{total}\t{root}",
+    ]
+
+
+def test_all_files(root, capfd):
+    DiskUsage(paths=(str(root),), all_files=True, max_depth=1)
+    total = _usage(root, root / "a_dir", root / "a_dir" / "a_file")
+    total += _usage(root / "b_file", root / "to_dir")
+    assert capfd.readouterr().out.splitlines() == [
+        f"{_usage(root / 'a_dir', root / 'a_dir' / 'a_file')}"
+        f"\t{root / 'a_dir'}",
+        f"{_usage(root / 'b_file')}\t{root / 'b_file'}",
+        f"0\t{root / 'hard'}",  # Counted as b_file.
+        f"{_usage(root / 'to_dir')}\t{root / 'to_dir'}",
+        f"{total}\t{root}",
+    ]
+
+
+def test_follow_links(root, capfd):
+    """Directories are counted once, however they're reached."""
+    DiskUsage(paths=(str(root / "to_dir"), str(root)), follow_links=True)
+    assert capfd.readouterr().out.splitlines() == [
+        f"{_usage(root / 'to_dir', root / 'a_dir' / 'a_file')}"
+        f"\t{root / 'to_dir'}",
+        f"{_usage(root, root / 'b_file')}\t{root}",
+    ]
+
+
+def test_file(root, capfd):
+    DiskUsage(paths=(str(root / "b_file"), str(root / "missing")))
+    assert capfd.readouterr().out == (
+        f"{_usage(root / 'b_file')}\t{root / 'b_file'}\n"
+    )
+
+
+@pytest.mark.parametrize("size, expectation", [
+    (0, "0"),
+    (512, "512.0"),
+    (4096, "4.0K"),
+    (3 * 1024**2, "3.0M"),
+    (1024**6, "1024.0P"),
+])
+def test_nice_size(size, expectation):
+    assert DiskUsage(paths=(), nice_size=True)._size(size) == expectation
+
+
+def test_gone():
+    """Entries gone since they were listed use nothing."""
+    assert DiskUsage(paths=())._usage(None) == 0
+
+
+@mock.patch.object(main, "DiskUsage", autospec=True)
+def test_main(mock_disk_usage):
+    main.main(paths=("a",))
+    mock_disk_usage.assert_called_once_with(paths=("a",))
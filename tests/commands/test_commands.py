@@ -0,0 +1,81 @@
+import io
+import os
+import pytest
+import subprocess
+import sys
+from unittest import mock
+
+from ccli import commands
+
+
+@pytest.fixture
+def broken_main():
+    module = mock.MagicMock()
+    module.main.side_effect = BrokenPipeError
+    with mock.patch.object(
+        commands.importlib,
+        "import_module",
+        autospec=True,
+        return_value=module,
+    ):
+        yield module
+
+
+def test_invoke_main():
+    with mock.patch.object(
+        commands.importlib,
+        "import_module",
+        autospec=True,
+    ) as mock_import_module:
+        commands.invoke_main(package="a.b", args=(1,), kwargs={"c": 2})
+    mock_import_module.assert_called_once_with("a.b.main")
+    mock_import_module.return_value.main.assert_called_once_with(1, c=2)
+
+
+def test_broken_pipe(broken_main, tmp_path):
+    """What's left to write goes to os.devnull instead."""
+    with open(tmp_path / "out", "w") as stdout:
+        fd = os.dup(stdout.fileno())  # Kept to put back afterwards.
+        try:
+            with mock.patch.object(sys, "stdout", stdout):
+                with pytest.raises(SystemExit) as error:
+                    commands.invoke_main(package="a")
+                stdout.write("lost")
+                stdout.flush()
+        finally:
+            os.dup2(fd, stdout.fileno())
+            os.close(fd)
+    assert error.value.code == 1
+    assert (tmp_path / "out").read_text() == ""
+
+
+def test_broken_pipe_stream(broken_main):
+    """Streams that aren't files are left alone."""
+    stdout = io.StringIO()
+    with mock.patch.object(sys, "stdout", stdout):
+        with pytest.raises(SystemExit):
+            commands.invoke_main(package="a")
+    stdout.write("kept")
+    assert stdout.getvalue() == "kept"
+
+
+@pytest.mark.integration
+def test_head(tmp_path):
+    """`ccli tree | head -1` stops without a traceback."""
+    for number in range(2000):
+        (tmp_path / f"file_{number}").touch()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from ccli.cli import CLI; CLI()",
+            "tree",
+            str(tmp_path),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    process.stdout.readline()
+    process.stdout.close()
+    assert process.stderr.read() == b""
+    assert process.wait() == 1
@@ -5,6 +5,9 @@ import typing
 from contextlib import contextmanager
 from getpass import getuser
 from pathlib import Path
+from unittest import mock
+
+from ccli.commands.tree import statx
 
 
 @pytest.fixture
@@ -20,6 +23,19 @@ def chdir():
     return chdir
 
 
+@pytest.fixture(autouse=True)
+def ls_colors(monkeypatch):
+    """Use Tree's own colors unless a test sets $LS_COLORS."""
+    monkeypatch.delenv("LS_COLORS", raising=False)
+
+
+@pytest.fixture
+def no_statx():
+    """Use the os functions instead of statx, for tests that patch them."""
+    with mock.patch.object(statx, "_statx", None):
+        yield
+
+
 @pytest.fixture
 def gid():
     return pwd.getpwnam(getuser()).pw_gid
@@ -106,8 +122,19 @@ def nested_link_recursion(make_path):
 def tree_kwargs(starting_path):
     """Basic keyword arguments for Tree."""
     return {
+        "align_lookahead": None,
+        "archives": False,
+        "browse": False,
+        "bytes_paths": False,
+        "checksum": None,
+        "count_each_root": False,
+        "count_only": False,
         "date": False,
-        "dirs_first": None,
+        "diff": None,
+        "dir_fds": None,
+        "dir_timeout": None,
+        "dirs_first": False,
+        "estimate": None,
         "fifos": False,
         "file_limit": None,
         "follow_links": False,
@@ -118,17 +145,34 @@ def tree_kwargs(starting_path):
         "ignore_tree": False,
         "indent": 4,
         "inodes": False,
+        "jobs": 1,
         "level": None,
+        "max_entries": None,
+        "min_size": None,
+        "newer": None,
         "list_hidden": False,
         "list_only_dirs": False,
         "nice_size": False,
         "no_color": False,
+        "no_sync": False,
+        "older": None,
+        "one_file_system": False,
+        "output_format": "text",
+        "owner": None,
         "paths": (str(starting_path),),
         "pattern": None,
         "permissions": False,
+        "progress": False,
+        "prune": False,
         "report": True,
         "reverse": False,
+        "save_snapshot": None,
         "size": False,
+        "skip_fs_types": (),
+        "sort": None,
+        "summary_by": (),
+        "summary_top": None,
         "time": False,
+        "undecodable": "escape",
         "user": False,
     }
@@ -0,0 +1,36 @@
+from ccli.commands.tree.aggregate import Aggregates
+
+
+def test_add():
+    aggregates = Aggregates("ext")
+    aggregates.add(".py", 10, 5.0)
+    aggregates.add(".py", 20, None)
+    aggregates.add(".py", 1, 3.0)
+    aggregates.add(".py", 2, 8.0)
+    aggregates.add(".txt", 0, None)
+    assert aggregates.top() == [(".py", 4, 33, 8.0), (".txt", 1, 0, None)]
+
+
+def test_top_order():
+    """Largest first by size, then count, then group."""
+    aggregates = Aggregates("depth")
+    for group, size in ((2, 5), (1, 0), (3, 5), (0, 0), (0, 0)):
+        aggregates.add(group, size, 1.0)
+    assert [row[0] for row in aggregates.top()] == [2, 3, 0, 1]
+
+
+def test_top_number():
+    aggregates = Aggregates("type")
+    aggregates.add("files", 30, 1.0)
+    aggregates.add("directories", 0, 0.0)
+    aggregates.add("file links", 0, None)
+    aggregates.add("broken links", 0, None)
+    assert aggregates.top(1) == [("files", 1, 30, 1.0), (None, 3, 0, 0.0)]
+    assert aggregates.top(4) == aggregates.top()
+
+
+def test_top_number_no_mtimes():
+    aggregates = Aggregates("owner")
+    aggregates.add(0, 2, 1.0)
+    aggregates.add(1, 1, None)
+    assert aggregates.top(1) == [(0, 1, 2, 1.0), (None, 1, 1, None)]
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from ccli.commands.tree import aio
+from ccli.commands.tree.aio import Row, atree
+from ccli.commands.tree.main import Tree
+
+
+def rows(*paths, **options):
+    async def collect():
+        return [row async for row in atree(*paths, **options)]
+    return asyncio.run(collect())
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("simple_tree")
+@pytest.mark.parametrize("limit", [1, 3])
+@pytest.mark.parametrize("options", [
+    {},
+    {"follow_links": True, "list_hidden": True},
+    {"permissions": True, "size": True, "sort_by_size": True},
+])
+def test_same_rows(limit, options, starting_path, tree_kwargs, capsys):
+    """The rows are what `ccli tree` prints, in the same order."""
+    tree_kwargs.update(options, no_color=True, report=False)
+    if tree_kwargs.pop("sort_by_size", False):
+        tree_kwargs["sort"] = "size"
+    Tree(**tree_kwargs)
+    expectation = capsys.readouterr().out.splitlines()
+    result = rows(str(starting_path), limit=limit, **options)
+    assert [row.text for row in result] == expectation
+    assert result[0].path == str(starting_path)
+    assert result[0].depth == 0
+    assert {row.depth for row in result[1:]} >= {1, 2}
+
+
+@pytest.mark.usefixtures("nested_link_recursion")
+def test_loops(starting_path):
+    """-l enters the same links as `ccli tree`, whatever the limit."""
+    result = rows(str(starting_path), follow_links=True, limit=8)
+    assert [(row.depth, row.text) for row in result] == [
+        (0, starting_path.name),
+        (1, "├―― chicken"),
+        (2, "│   └―― egg"),
+        (3, "│       └―― chicken"),
+        (4, "│           └―― ..."),
+        (1, "└―― egg"),
+        (2, "    └―― ..."),
+    ]
+
+
+def test_segments(make_path, starting_path):
+    make_path(name="directory", kind="dir")
+    _, row = rows(str(starting_path), force_color=True)
+    assert row == Row(
+        path=str(starting_path / "directory"),
+        depth=1,
+        text="└―― directory",
+        segments=[
+            ("└―― ", "yellow", ()),
+            ("directory", "cyan", ("bold",)),
+        ],
+    )
+
+
+def test_bytes(make_path, starting_path):
+    (starting_path / os.fsdecode(b"caf\xe9")).touch()
+    _, row = rows(os.fsencode(starting_path), undecodable="replace")
+    assert row.path == os.fsencode(starting_path / os.fsdecode(b"caf\xe9"))
+    assert row.text == "└―― caf�"
+
+
+def test_roots(make_path, starting_path, chdir):
+    make_path(name="a_file", kind="file")
+    with chdir(starting_path):
+        assert [row.text for row in rows()] == [".", "└―― a_file"]
+        assert [row.text for row in rows("missing", "a_file")] == [
+            "a_file",
+        ]
+
+
+@pytest.mark.parametrize("options, error", [
+    ({"limit": 0}, ValueError),
+    ({"sizes": True}, TypeError),
+])
+def test_bad_options(options, error):
+    with pytest.raises(error):
+        rows(**options)
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_limit(starting_path):
+    """No more than limit rows are made ahead of the ones yielded."""
+    made = []
+
+    async def consume():
+        yielded = 0
+        async for _ in atree(str(starting_path), limit=2):
+            yielded += 1
+            assert len(made) <= yielded + 2
+
+    row = aio._Trees.row
+    with mock.patch.object(
+        aio._Trees,
+        "row",
+        autospec=True,
+        side_effect=lambda trees, node: made.append(node) or row(trees, node),
+    ):
+        asyncio.run(consume())
+    assert len(made) == 9
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_close(starting_path):
+    """Stopping early cancels the rows not yet made, and closes up."""
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    async def first_rows():
+        walk = atree(str(starting_path), executor=executor, checksum="md5")
+        result = [await walk.__anext__(), await walk.__anext__()]
+        with mock.patch.object(aio._RowTree, "close") as mock_close:
+            await walk.aclose()
+            await asyncio.sleep(0.1)  # The trees are closed off the loop.
+        mock_close.assert_called()
+        return result
+
+    first, second = asyncio.run(first_rows())
+    assert (first.depth, second.depth) == (0, 1)
+    executor.submit(int).result()  # Still usable: it isn't atree's own.
+    executor.shutdown()
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_cancel(starting_path):
+    """Cancelling the task iterating the rows stops the walk."""
+    async def cancelled():
+        seen = []
+
+        async def walk():
+            async for row in atree(str(starting_path), limit=1):
+                seen.append(row)
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(walk())
+        while not seen:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return seen
+
+    assert len(asyncio.run(cancelled())) == 1
@@ -0,0 +1,382 @@
+import io
+import pytest
+import stat
+import tarfile
+import threading
+import zipfile
+from unittest import mock
+
+from ccli.commands.tree import backends
+from ccli.backends import LocalBackend
+from ccli.commands.tree.backends import (
+    MemoryBackend,
+    TarBackend,
+    TimeoutBackend,
+    ZipBackend,
+    make_stats,
+    open_backend,
+)
+from ccli.commands.tree.diff import DiffTree
+from ccli.commands.tree.main import Tree
+from ccli.commands.tree.watchdog import Watchdog
+
+FILE = stat.S_IFREG | 0o644
+DIR = stat.S_IFDIR | 0o755
+LINK = stat.S_IFLNK | 0o777
+
+
+@pytest.fixture
+def memory():
+    """root
+    ├―― a_dir
+    │   ├―― a_file
+    │   ├―― b_dir
+    │   │   └―― c_file
+    │   ├―― up -> ../a_dir/b_dir
+    │   └―― loop -> loop
+    ├―― absolute -> /etc
+    ├―― broken -> missing
+    └―― to_dir -> a_dir
+    """
+    memory = MemoryBackend("archive.zip", mtime=5.0)
+    memory.add("a_dir/a_file", make_stats(mode=FILE, size=3))
+    memory.add("a_dir/b_dir/c_file", make_stats(mode=FILE))
+    memory.add("a_dir/up", make_stats(mode=LINK), target="../a_dir/b_dir")
+    memory.add("a_dir/loop", make_stats(mode=LINK), target="./loop")
+    memory.add("absolute", make_stats(mode=LINK), target="/etc")
+    memory.add("broken", make_stats(mode=LINK), target="missing")
+    memory.add("to_dir", make_stats(mode=LINK), target="a_dir")
+    return memory
+
+
+@pytest.fixture
+def zip_path(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("pkg/", "")
+        info = zipfile.ZipInfo("pkg/module.py", (2020, 1, 2, 3, 4, 6))
+        info.create_system = 3
+        info.external_attr = (stat.S_IFREG | 0o600) << 16
+        archive.writestr(info, "print()\n")
+        info = zipfile.ZipInfo("pkg/link.py")
+        info.create_system = 3
+        info.external_attr = LINK << 16
+        archive.writestr(info, "module.py")
+        info = zipfile.ZipInfo("data/table.csv")
+        info.create_system = 0
+        archive.writestr(info, "a,b\n")
+    return path
+
+
+@pytest.fixture
+def tar_path(tmp_path):
+    path = tmp_path / "archive.tar.gz"
+    with tarfile.open(path, "w:gz") as archive:
+        def add(name, kind, size=0, **kwargs):
+            info = tarfile.TarInfo(name)
+            info.type = kind
+            info.size = size
+            info.mtime = 1000
+            info.mode = 0o640
+            info.uid, info.gid = 12, 34
+            for key, value in kwargs.items():
+                setattr(info, key, value)
+            archive.addfile(info, io.BytesIO(b"x" * size) if size else None)
+
+        add(".", tarfile.DIRTYPE)
+        add("./pkg", tarfile.DIRTYPE)
+        add("./pkg/file", tarfile.REGTYPE, size=5)
+        add("./pkg/hard", tarfile.LNKTYPE, linkname="./pkg/file")
+        add("./pkg/orphan", tarfile.LNKTYPE, linkname="missing")
+        add("./pkg/soft", tarfile.SYMTYPE, linkname="file")
+        add("./dev/chr", tarfile.CHRTYPE)
+        add("./dev/blk", tarfile.BLKTYPE)
+        add("./dev/fifo", tarfile.FIFOTYPE)
+        add("../outside", tarfile.REGTYPE)
+    return path
+
+
+def test_make_stats():
+    stats = make_stats(mode=FILE, size=3, mtime=1.5, uid=1, gid=2, ino=4)
+    assert stats.st_mode == FILE
+    assert stats.st_size == 3
+    assert stats.st_mtime == 1.5
+    assert stats.st_mtime_ns == 1_500_000_000
+    assert (stats.st_uid, stats.st_gid, stats.st_ino) == (1, 2, 4)
+
+
+class TestMemoryBackend:
+    def test_listdir(self, memory):
+        assert memory.listdir("archive.zip") == [
+            "a_dir", "absolute", "broken", "to_dir",
+        ]
+        assert memory.listdir("archive.zip/a_dir") == [
+            "a_file", "b_dir", "up", "loop",
+        ]
+        assert memory.listdir("archive.zip/to_dir/up") == ["c_file"]
+        with pytest.raises(NotADirectoryError):
+            memory.listdir("archive.zip/a_dir/a_file")
+        with pytest.raises(FileNotFoundError):
+            memory.listdir("elsewhere")
+
+    def test_implicit_dirs(self, memory):
+        stats = memory.stat("archive.zip/a_dir/b_dir")
+        assert stat.S_ISDIR(stats.st_mode)
+        assert stats.st_mtime == 5.0
+        assert stats.st_ino != memory.stat("archive.zip/a_dir").st_ino
+
+    def test_replace(self, memory):
+        memory.add("a_dir/", make_stats(mode=DIR | 0o2000, mtime=9.0))
+        assert memory.stat("archive.zip/a_dir").st_mode == DIR | 0o2000
+        assert memory.listdir("archive.zip/a_dir")
+
+    def test_ignored(self, memory):
+        memory.add(".", make_stats(mode=DIR))
+        memory.add("../outside", make_stats(mode=FILE))
+        assert "outside" not in memory.listdir("archive.zip")
+
+    @pytest.mark.parametrize("path, exists, isdir, islink", [
+        ("archive.zip", True, True, False),
+        ("archive.zip/", True, True, False),
+        ("archive.zip/a_dir/a_file", True, False, False),
+        ("archive.zip/to_dir", True, True, True),
+        ("archive.zip/to_dir/up/c_file", True, False, False),
+        ("archive.zip/a_dir/up/../a_file", True, False, False),
+        ("archive.zip/broken", False, False, True),
+        ("archive.zip/absolute", False, False, True),
+        ("archive.zip/a_dir/loop", False, False, True),
+        ("archive.zip/missing", False, False, False),
+        ("archive.zip.old", False, False, False),
+        ("other", False, False, False),
+    ])
+    def test_checks(self, path, exists, isdir, islink, memory):
+        assert memory.exists(path) is exists
+        assert memory.isdir(path) is isdir
+        assert memory.islink(path) is islink
+
+    def test_loop(self, memory):
+        with pytest.raises(OSError, match="Too many links"):
+            memory.stat("archive.zip/a_dir/loop")
+
+    def test_lstat(self, memory):
+        assert stat.S_ISLNK(memory.lstat("archive.zip/to_dir").st_mode)
+        assert memory.lstat("archive.zip/to_dir/a_file").st_size == 3
+
+    def test_readlink(self, memory):
+        assert memory.readlink("archive.zip/to_dir") == "a_dir"
+        with pytest.raises(OSError, match="Not a symbolic link"):
+            memory.readlink("archive.zip/a_dir")
+
+    @pytest.mark.parametrize("path, expectation", [
+        ("archive.zip", "archive.zip"),
+        ("archive.zip/to_dir", "archive.zip/a_dir"),
+        ("archive.zip/to_dir/up", "archive.zip/a_dir/b_dir"),
+        ("archive.zip/./broken", "archive.zip/broken"),
+    ])
+    def test_realpath(self, path, expectation, memory):
+        assert memory.realpath(path) == expectation
+
+    def test_scandir(self, memory):
+        entries = {
+            entry.name: entry for entry in memory.scandir("archive.zip")
+        }
+        assert list(entries) == ["a_dir", "absolute", "broken", "to_dir"]
+        assert entries["to_dir"].path == "archive.zip/to_dir"
+        assert entries["to_dir"].is_symlink()
+        assert entries["to_dir"].is_dir()
+        assert not entries["to_dir"].is_dir(follow_symlinks=False)
+        assert not entries["broken"].is_dir()
+        assert not entries["a_dir"].is_symlink()
+        assert entries["to_dir"].stat() == memory.stat("archive.zip/a_dir")
+
+    def test_paths(self, memory):
+        assert memory.join("a", "b") == "a/b"
+        assert memory.basename("a/b") == "b"
+        assert not memory.local
+
+
+class TestTimeoutBackend:
+    def test_timeout(self, memory):
+        release = threading.Event()
+        hung = "archive.zip/a_dir"
+
+        def stat(path):
+            if path == hung:
+                release.wait()
+            return memory.stat(path)
+
+        backend = TimeoutBackend(
+            mock.Mock(wraps=memory, stat=stat, local=False),
+            watchdog=Watchdog(timeout=0.01),
+            timed_out=[],
+        )
+        try:
+            assert backend.stat("archive.zip").st_ino == 1
+            with pytest.raises(TimeoutError):
+                backend.stat(hung)
+        finally:
+            release.set()
+        assert backend.timed_out == [hung]
+        for path in (hung, f"{hung}/a_file"):
+            with pytest.raises(TimeoutError, match="Timed out before"):
+                backend.listdir(path)
+        with pytest.raises(FileNotFoundError):
+            backend.listdir(f"{hung}_2")
+        assert backend.join("a", "b") == "a/b"
+        assert not backend.local
+
+    @pytest.mark.parametrize("timed_out, path, expectation", [
+        ("a/b", "a/b", True),
+        ("a/b/", "a/b/c/d", True),
+        ("a/b", "a/bc", False),
+        ("a/b", "a", False),
+        ("/", "/a", True),
+        (b"a/b", b"a/b/c", True),
+        (b"a/b/", b"a/bc", False),
+    ])
+    def test_timed_out_before(self, timed_out, path, expectation):
+        """Paths other backends time out on (appended later) fail too."""
+        backend = TimeoutBackend(
+            mock.Mock(),
+            watchdog=mock.Mock(),
+            timed_out=[],
+        )
+        backend.stat(path)
+        backend.timed_out.append(timed_out)
+        if expectation:
+            with pytest.raises(TimeoutError, match="Timed out before"):
+                backend.stat(path)
+        else:
+            backend.stat(path)
+        assert backend._watchdog.call.call_count == 2 - expectation
+
+
+class TestZipBackend:
+    def test_contents(self, zip_path):
+        backend = ZipBackend(str(zip_path))
+        root = str(zip_path)
+        assert backend.listdir(root) == ["pkg", "data"]
+        assert backend.listdir(f"{root}/pkg") == ["module.py", "link.py"]
+        module = backend.stat(f"{root}/pkg/module.py")
+        assert module.st_mode == stat.S_IFREG | 0o600
+        assert module.st_size == len("print()\n")
+        assert module.st_mtime == backends.time.mktime(
+            (2020, 1, 2, 3, 4, 6, 0, 0, -1),
+        )
+        assert backend.readlink(f"{root}/pkg/link.py") == "module.py"
+        assert backend.stat(f"{root}/pkg/link.py") == module
+        assert backend.stat(f"{root}/data/table.csv").st_mode == FILE
+        assert backend.stat(f"{root}/pkg").st_mode == stat.S_IFDIR | 0o775
+        assert backend.stat(f"{root}/data").st_mode == DIR
+
+    def test_central_directory_only(self, zip_path):
+        with mock.patch.object(
+            backends.zipfile.ZipFile,
+            "read",
+            autospec=True,
+            side_effect=zipfile.ZipFile.read,
+        ) as mock_read:
+            ZipBackend(str(zip_path))
+        assert [
+            call.args[1].filename for call in mock_read.call_args_list
+        ] == ["pkg/link.py"]
+
+
+class TestTarBackend:
+    def test_contents(self, tar_path):
+        backend = TarBackend(str(tar_path))
+        root = str(tar_path)
+        assert backend.listdir(root) == ["pkg", "dev"]
+        assert backend.listdir(f"{root}/pkg") == [
+            "file", "hard", "orphan", "soft",
+        ]
+        file = backend.stat(f"{root}/pkg/file")
+        assert file.st_mode == stat.S_IFREG | 0o640
+        assert (file.st_size, file.st_mtime) == (5, 1000)
+        assert (file.st_uid, file.st_gid) == (12, 34)
+        assert backend.lstat(f"{root}/pkg/hard") == file
+        assert backend.lstat(f"{root}/pkg/orphan").st_ino != file.st_ino
+        assert backend.readlink(f"{root}/pkg/soft") == "file"
+        assert backend.stat(f"{root}/pkg/soft") == file
+        assert [
+            stat.S_IFMT(backend.stat(f"{root}/dev/{name}").st_mode)
+            for name in backend.listdir(f"{root}/dev")
+        ] == [stat.S_IFCHR, stat.S_IFBLK, stat.S_IFIFO]
+
+    def test_single_pass(self, tar_path):
+        with mock.patch.object(
+            backends.tarfile,
+            "open",
+            autospec=True,
+            side_effect=tarfile.open,
+        ) as mock_open:
+            TarBackend(str(tar_path))
+        mock_open.assert_called_once_with(str(tar_path), mode="r|*")
+
+
+@pytest.mark.parametrize("archives", [False, True])
+def test_open_backend(archives, tar_path, zip_path, tmp_path):
+    (text := tmp_path / "text").write_text("text")
+    expectations = {
+        zip_path: ZipBackend if archives else LocalBackend,
+        tar_path: TarBackend if archives else LocalBackend,
+        text: LocalBackend,
+        tmp_path: LocalBackend,
+    }
+    for path, expectation in expectations.items():
+        backend = open_backend(str(path), archives=archives)
+        assert type(backend) is expectation
+
+
+@pytest.mark.integration
+class TestArchives:
+    def test_tree(self, zip_path, tree_kwargs, capfd):
+        tree_kwargs.update({
+            "archives": True,
+            "checksum": "sha256",
+            "paths": (str(zip_path),),
+            "size": True,
+        })
+        Tree(**tree_kwargs)
+        unknown = "?" * 64
+        assert capfd.readouterr().out == f"""\
+0 {unknown} archive.zip
+├―― 0 {unknown} data
+│   └―― 4 {unknown} table.csv
+└―― 0 {unknown} pkg
+    ├―― 8 {unknown} link.py
+    └―― 8 {unknown} module.py
+3 directories, 1 file, 1 file link
+"""
+
+    def test_count_only(self, tar_path, tree_kwargs, capfd):
+        tree_kwargs.update({
+            "archives": True,
+            "count_only": True,
+            "paths": (str(tar_path),),
+        })
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == (
+            "3 directories, 6 files, 1 file link\n"
+        )
+
+    def test_diff(self, zip_path, tar_path, tree_kwargs, capfd):
+        tree_kwargs.update({
+            "archives": True,
+            "diff": str(zip_path),
+            "paths": (str(tar_path),),
+        })
+        DiffTree(**tree_kwargs)
+        assert capfd.readouterr().out == """\
+archive.tar.gz
+├―― - data
+├―― + dev
+└―― ~ pkg
+    ├―― + file
+    ├―― + hard
+    ├―― - link.py
+    ├―― - module.py
+    ├―― + orphan
+    └―― + soft
+5 added, 1 changed, 3 removed
+"""
@@ -0,0 +1,371 @@
+import curses
+import pytest
+import threading
+from unittest import mock
+
+from ccli import backends
+from ccli.commands.tree import browse, main
+from ccli.commands.tree.browse import (
+    BrowseTree,
+    Browser,
+    _color_number,
+    _Listings,
+    _parse_sgr,
+)
+from ccli.commands.tree.colors import Sgr
+
+
+def names(browser):
+    return [
+        "".join(text for text, _, _ in segments)
+        for segments in browser.lines(height=100)
+    ]
+
+
+@pytest.fixture
+def browser(tree_kwargs):
+    browser = Browser(**tree_kwargs)
+    yield browser
+    browser.close()
+
+
+@pytest.fixture
+def screen():
+    screen = mock.MagicMock()
+    screen.getmaxyx.return_value = (3, 20)
+    return screen
+
+
+@pytest.fixture
+def mock_curses():
+    with mock.patch.multiple(
+        browse.curses,
+        color_pair=mock.DEFAULT,
+        curs_set=mock.DEFAULT,
+        has_colors=mock.DEFAULT,
+        init_pair=mock.DEFAULT,
+        use_default_colors=mock.DEFAULT,
+    ) as mocks:
+        mocks["color_pair"].side_effect = lambda pair: pair << 8
+        yield mocks
+
+
+class TestHelpers:
+    @pytest.mark.parametrize("name, expectation", [
+        ("grey", curses.COLOR_BLACK),
+        ("red", curses.COLOR_RED),
+        ("light_cyan", curses.COLOR_CYAN),
+        ("dark_grey", curses.COLOR_BLACK),
+        ("white", curses.COLOR_WHITE),
+    ])
+    def test_color_number(self, name, expectation):
+        assert _color_number(name) == expectation
+
+    @pytest.mark.parametrize("sgr, expectation", [
+        ("\033[m", (-1, -1, 0)),
+        ("\033[01;34m", (curses.COLOR_BLUE, -1, curses.A_BOLD)),
+        ("\033[04;91;42m", (
+            curses.COLOR_RED,
+            curses.COLOR_GREEN,
+            curses.A_UNDERLINE | curses.A_BOLD,
+        )),
+        ("\033[38;5;208m", (-1, -1, 0)),
+    ])
+    def test_parse_sgr(self, sgr, expectation):
+        assert _parse_sgr(sgr) == expectation
+
+
+class TestListings:
+    def test_lru(self):
+        release = threading.Event()
+        calls = []
+
+        def function(key):
+            release.wait()
+            calls.append(key)
+            return key * 2
+
+        listings = _Listings(function, maxsize=2)
+        try:
+            first = listings.load(("a",))
+            listings.load(("b",))
+            assert listings.load(("a",)) is first
+            listings.load(("c",))  # Evicts b, which never runs.
+            release.set()
+            assert listings.get(("a",)) == "aa"
+            assert listings.get(("c",)) == "cc"
+            listings.discard(("a",))
+            listings.discard(("a",))
+            assert listings.get(("a",)) == "aa"
+        finally:
+            listings.close()
+        assert calls == ["a", "c", "a"]
+
+
+@pytest.mark.usefixtures("simple_tree")
+class TestBrowser:
+    def test_lazy(self, browser, starting_path):
+        """Nothing is listed until it's expanded."""
+        assert names(browser) == ["starting_path"]
+        browser.handle(curses.KEY_RIGHT, height=10)
+        assert names(browser) == [
+            "starting_path",
+            "├―― a_dir",
+            "├―― a_file",
+            "├―― b_file",
+            "├―― broken_link",
+            "└―― c_file",
+        ]
+        browser.handle(ord("j"), height=10)
+        browser.handle(ord("l"), height=10)
+        assert names(browser)[1:5] == [
+            "├―― a_dir",
+            "│   ├―― a_file",
+            "│   ├―― b_file",
+            "│   └―― c_dir",
+        ]
+
+    def test_collapse(self, browser):
+        browser.expand()
+        browser.expand()  # Already expanded: go to a_dir.
+        browser.expand()
+        browser.move(1)
+        assert browser.cursor == 2
+        browser.handle(ord("h"), height=10)  # To the parent.
+        assert browser.cursor == 1
+        browser.handle(curses.KEY_LEFT, height=10)  # Collapse a_dir.
+        assert len(browser.rows) == 6
+        browser.move(-1)
+        browser.collapse()
+        browser.collapse()  # The root has no parent.
+        assert names(browser) == ["starting_path"]
+
+    def test_links(self, tree_kwargs):
+        tree_kwargs["follow_links"] = True
+        browser = Browser(**tree_kwargs)
+        try:
+            browser.expand()
+            browser.move(1)
+            browser.expand()
+            browser.move(3)
+            browser.expand()
+            assert names(browser)[5:8] == [
+                "│       ├―― a_file",
+                "│       ├―― b_file",
+                "│       └―― c_file",
+            ]
+        finally:
+            browser.close()
+
+    def test_dir_fds(self, tree_kwargs):
+        tree_kwargs["dir_fds"] = 4
+        browser = Browser(**tree_kwargs)
+        try:
+            browser.expand()
+            assert names(browser)[1:3] == ["├―― a_dir", "├―― a_file"]
+        finally:
+            browser.close()
+
+    def test_not_expandable(self, browser):
+        browser.expand()
+        browser.move(2)
+        browser.expand()  # A file.
+        browser.move(-1)
+        browser.expand()
+        browser.move(2)
+        browser.expand()  # A link that isn't followed.
+        assert len(browser.rows) == 9
+
+    @pytest.mark.parametrize("key, cursor, top", [
+        (curses.KEY_NPAGE, 3, 1),
+        (curses.KEY_END, 5, 3),
+        (ord("G"), 5, 3),
+    ])
+    def test_scroll(self, key, cursor, top, browser):
+        browser.expand()
+        browser.handle(key, height=3)
+        assert browser.cursor == cursor
+        browser.lines(height=3)
+        assert browser.top == top
+        browser.handle(curses.KEY_PPAGE, height=3)
+        browser.handle(curses.KEY_UP, height=3)
+        browser.lines(height=3)
+        assert browser.cursor == max(0, cursor - 4)
+        assert browser.top == browser.cursor
+        browser.handle(ord("g"), height=3)
+        browser.handle(ord("k"), height=3)
+        assert browser.cursor == 0
+
+    def test_prefetch(self, browser):
+        """The directory under the cursor is listed in the background."""
+        browser.expand()
+        with mock.patch.object(
+            browser._listings,
+            "load",
+            autospec=True,
+        ) as mock_load:
+            browser.move(1)
+            browser.move(1)
+        mock_load.assert_called_once_with((0, browser.rows[1].path))
+
+    def test_error(self, browser):
+        browser.expand()
+        with mock.patch.object(
+            backends.os,
+            "scandir",
+            autospec=True,
+            side_effect=PermissionError(13, "Permission denied"),
+        ):
+            browser.move(1)
+            browser.expand()
+        assert names(browser)[1] == "├―― a_dir [Permission denied]"
+        assert len(browser.rows) == 6
+
+    def test_evicted(self, browser):
+        """Listings that were evicted are listed again when needed."""
+        browser._listings.maxsize = 1
+        browser.expand()
+        browser.move(1)
+        browser.expand()
+        assert names(browser) == [
+            "starting_path",
+            "├―― a_dir",
+            "│   ├―― a_file",
+            "│   ├―― b_file",
+            "│   └―― c_dir",
+            "├―― a_file",
+            "├―― b_file",
+            "├―― broken_link",
+            "└―― c_file",
+        ]
+        assert len(browser._listings._futures) == 1
+
+    def test_relisting_fails(self, browser, starting_path):
+        browser._listings.maxsize = 1
+        browser.expand()
+        browser.move(1)
+        browser.expand()
+        browser.move(-1)
+        browser.collapse()
+        with mock.patch.object(
+            BrowseTree,
+            "listing",
+            autospec=True,
+            side_effect=PermissionError(13, "Permission denied"),
+        ):
+            browser.expand()
+        assert names(browser) == ["starting_path [Permission denied]"]
+
+    def test_mount_skip(self, tree_kwargs):
+        tree_kwargs["one_file_system"] = True
+        browser = Browser(**tree_kwargs)
+        try:
+            browser.expand()
+            browser.move(1)
+            with mock.patch.object(
+                BrowseTree,
+                "_mount_skip",
+                autospec=True,
+                return_value="mount point",
+            ):
+                browser.expand()
+            assert names(browser)[1] == "├―― a_dir [mount point]"
+        finally:
+            browser.close()
+
+    def test_columns(self, tree_kwargs, monkeypatch):
+        monkeypatch.setenv("LS_COLORS", "di=01;34:ln=01;36")
+        tree_kwargs.update({
+            "checksum": "sha256",
+            "force_color": True,
+            "size": True,
+            "sort": "size",
+        })
+        browser = Browser(**tree_kwargs)
+        try:
+            browser.expand()
+            lines = browser.lines(height=10)
+        finally:
+            browser.close()
+        text, color, attrs = lines[1][-1]
+        assert (text, color) == ("a_dir", Sgr("\033[01;34m"))
+        assert lines[-2][-1][0] == "c_file"
+        size = lines[-2][1][0]  # Padded to the directory's width.
+        assert size.strip() == "0" and len(size) == len(lines[1][1][0])
+
+    def test_quit(self, browser):
+        assert browser.handle(ord("x"), height=10)
+        assert not browser.handle(ord("q"), height=10)
+
+
+class TestEmpty:
+    def test_missing_root(self, tmp_path, tree_kwargs):
+        tree_kwargs["paths"] = (str(tmp_path / "missing"),)
+        browser = Browser(**tree_kwargs)
+        browser.move(1)
+        assert browser.handle(curses.KEY_RIGHT, height=10)
+        assert browser.lines(height=10) == []
+        browser.close()
+
+
+@pytest.mark.usefixtures("simple_tree")
+class TestScreen:
+    @pytest.mark.parametrize("colors", [False, True])
+    def test_run(self, colors, browser, screen, mock_curses):
+        mock_curses["has_colors"].return_value = colors
+        mock_curses["curs_set"].side_effect = curses.error
+        browser._tree._colored = True
+        screen.getch.side_effect = [curses.KEY_RIGHT, curses.KEY_DOWN, 27]
+        browser.run(screen)
+        assert screen.addnstr.call_count == 1 + 5 + 5
+        y, x, text, size, attr = screen.addnstr.call_args_list[-1].args
+        assert (y, x, text, size) == (2, 4, "a_file", 15)
+        if colors:
+            mock_curses["init_pair"].assert_any_call(
+                1,
+                curses.COLOR_CYAN,
+                -1,
+            )
+            assert attr == 3 << 8
+        else:
+            mock_curses["init_pair"].assert_not_called()
+            assert attr == 0
+        _, _, _, _, attr = screen.addnstr.call_args_list[-3].args
+        assert attr & curses.A_REVERSE and attr & curses.A_BOLD
+
+    def test_attr(self, browser, mock_curses):
+        browser._colors = True
+        sgr = Sgr("\033[01;34m")
+        assert browser._attr(sgr, ("underline",)) == (
+            curses.A_BOLD | curses.A_UNDERLINE | 1 << 8
+        )
+        assert browser._attr("blue", ()) == 1 << 8
+        assert browser._attr(None, ("bold",)) == curses.A_BOLD
+        mock_curses["init_pair"].assert_called_once_with(
+            1,
+            curses.COLOR_BLUE,
+            -1,
+        )
+
+    def test_narrow(self, browser, screen, mock_curses):
+        screen.getmaxyx.return_value = (3, 5)
+        screen.getch.side_effect = [curses.KEY_RIGHT, ord("q")]
+        browser.run(screen)
+        assert [
+            call.args[2] for call in screen.addnstr.call_args_list[-3:]
+        ] == ["starting_path", "├―― ", "├―― "]
+
+
+def test_browse(tree_kwargs):
+    with mock.patch.object(
+        browse.curses,
+        "wrapper",
+        autospec=True,
+    ) as mock_wrapper, mock.patch.object(
+        Browser,
+        "close",
+        autospec=True,
+    ) as mock_close:
+        main.main(**{**tree_kwargs, "browse": True})
+    [browser] = mock_close.call_args.args
+    mock_wrapper.assert_called_once_with(browser.run)
@@ -0,0 +1,97 @@
+import os
+import pytest
+from unittest import mock
+
+from ccli.commands.tree import cache
+from ccli.commands.tree.cache import ListingCache
+
+
+@pytest.fixture
+def directory(tmp_path):
+    (tmp_path / "a_file").touch()
+    old = 10**9
+    os.utime(tmp_path, ns=(old, old))
+    return tmp_path
+
+
+@pytest.fixture
+def mock_listdir():
+    with mock.patch.object(
+        cache.os,
+        "listdir",
+        autospec=True,
+        side_effect=os.listdir,
+    ) as mock_listdir:
+        yield mock_listdir
+
+
+class TestListingCache:
+    def test_reused(self, directory, mock_listdir):
+        listings = ListingCache()
+        assert listings.listdir(directory) == ["a_file"]
+        assert listings.listdir(directory) == ["a_file"]
+        mock_listdir.assert_called_once_with(directory)
+
+    def test_scandir(self, directory, mock_listdir):
+        """Listings and scandir entries are cached apart."""
+        listings = ListingCache()
+        listings.listdir(directory)
+        [entry] = listings.scandir(directory)
+        assert entry.name == "a_file" and not entry.is_dir()
+        assert not entry.is_symlink()
+        mock_listdir.assert_called_once_with(directory)
+
+    def test_scandir_paths(self, chdir, directory):
+        """Entries' paths are under the path asked for, not the first."""
+        (directory / "a_link").symlink_to(".")
+        os.utime(directory, ns=(10**9, 10**9))
+        listings = ListingCache()
+        with mock.patch.object(
+            cache,
+            "_scandir",
+            autospec=True,
+            side_effect=cache._scandir,
+        ) as mock_scandir:
+            with chdir(directory):
+                relative = sorted(
+                    listings.scandir("."),
+                    key=lambda entry: entry.name,
+                )
+            absolute = sorted(
+                listings.scandir(str(directory)),
+                key=lambda entry: entry.name,
+            )
+        mock_scandir.assert_called_once()
+        assert [entry.path for entry in relative] == ["./a_file", "./a_link"]
+        assert [entry.path for entry in absolute] == [
+            os.path.join(directory, "a_file"),
+            os.path.join(directory, "a_link"),
+        ]
+        assert absolute[1].is_symlink() and absolute[1].is_dir()
+        assert not absolute[1].is_dir(follow_symlinks=False)
+
+    def test_changed(self, directory, mock_listdir):
+        listings = ListingCache()
+        listings.listdir(directory)
+        (directory / "b_file").touch()
+        assert sorted(listings.listdir(directory)) == ["a_file", "b_file"]
+        assert mock_listdir.call_count == 2
+
+    def test_racy(self, tmp_path, mock_listdir):
+        """Just-modified directories aren't cached."""
+        listings = ListingCache()
+        listings.listdir(tmp_path)
+        listings.listdir(tmp_path)
+        assert mock_listdir.call_count == 2
+
+    def test_maxsize(self, directory, mock_listdir):
+        listings = ListingCache(maxsize=1)
+        other = directory / "other"
+        other.mkdir()
+        os.utime(directory, ns=(10**9, 10**9))
+        os.utime(other, ns=(10**9, 10**9))
+        listings.listdir(directory)
+        listings.listdir(other)
+        listings.listdir(other)
+        listings.listdir(directory)
+        assert mock_listdir.call_count == 3
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import pytest
+from concurrent.futures import Future
+from unittest import mock
+
+from ccli.commands.tree import checksum
+from ccli.commands.tree.checksum import Checksums, DigestCache, hash_file
+
+
+@pytest.fixture
+def checksums():
+    checksums = Checksums("sha256", workers=2)
+    yield checksums
+    checksums.close()
+
+
+@pytest.mark.parametrize("algorithm", checksum.ALGORITHMS)
+@pytest.mark.parametrize("content", [b"", b"abc", b"x" * 5000])
+@pytest.mark.parametrize("threshold", [1, 1 << 20])
+def test_hash_file(algorithm, content, threshold, tmp_path):
+    path = tmp_path / "file"
+    path.write_bytes(content)
+    with mock.patch.object(checksum, "_MMAP_THRESHOLD", threshold):
+        result = hash_file(path, algorithm, len(content))
+    assert result == hashlib.new(algorithm, content).hexdigest()
+
+
+class TestChecksums:
+    def test_width(self):
+        assert Checksums("sha256").width == 64
+        assert Checksums("blake2b").width == 128
+
+    def test_not_a_file(self, checksums, tmp_path):
+        assert checksums.result(tmp_path, os.stat(tmp_path)) is None
+        assert checksums.result(tmp_path, None) is None
+
+    def test_hardlinks_hashed_once(self, checksums, tmp_path):
+        (first := tmp_path / "first").write_bytes(b"abc")
+        os.link(first, second := tmp_path / "second")
+        expectation = hashlib.sha256(b"abc").hexdigest()
+        with mock.patch.object(
+            checksum,
+            "hash_file",
+            autospec=True,
+            side_effect=hash_file,
+        ) as mock_hash_file:
+            for path in (first, second, first):
+                checksums.submit(path, os.stat(path))
+            checksums.submit(first, os.stat(first))
+            assert checksums.result(first, os.stat(first)) == expectation
+            assert checksums.result(second, os.stat(second)) == expectation
+        mock_hash_file.assert_called_once()
+
+    def test_modified_file_rehashed(self, checksums, tmp_path):
+        (path := tmp_path / "file").write_bytes(b"abc")
+        assert checksums.result(path, os.stat(path)) == (
+            hashlib.sha256(b"abc").hexdigest()
+        )
+        path.write_bytes(b"abcd")
+        assert checksums.result(path, os.stat(path)) == (
+            hashlib.sha256(b"abcd").hexdigest()
+        )
+
+    def test_error_not_cached(self, checksums, tmp_path):
+        (path := tmp_path / "file").write_bytes(b"abc")
+        stats = os.stat(path)
+        with mock.patch.object(
+            checksum,
+            "hash_file",
+            autospec=True,
+            side_effect=PermissionError,
+        ):
+            with pytest.raises(PermissionError):
+                checksums.result(path, stats)
+        assert not checksums._cache
+        assert checksums.result(path, stats) == (
+            hashlib.sha256(b"abc").hexdigest()
+        )
+
+    def test_shared(self, tmp_path):
+        """With a DigestCache, digests outlive the Checksums."""
+        (path := tmp_path / "file").write_bytes(b"abc")
+        with mock.patch.object(Checksums, "_digests", DigestCache()):
+            for _ in range(2):
+                checksums = Checksums("sha256")
+                with mock.patch.object(
+                    checksum,
+                    "hash_file",
+                    autospec=True,
+                    side_effect=hash_file,
+                ) as mock_hash_file:
+                    checksums.result(path, os.stat(path))
+                checksums.close()
+            assert len(Checksums._digests) == 1
+        mock_hash_file.assert_not_called()
+
+    def test_close_cancels(self, tmp_path):
+        """Hashes nobody asked for are cancelled, and not kept."""
+        (path := tmp_path / "file").write_bytes(b"abc")
+        checksums = Checksums("sha256")
+        with mock.patch.object(
+            checksums._executor,
+            "submit",
+            autospec=True,
+            return_value=Future(),
+        ):
+            checksums.submit(path, os.stat(path))
+        future = checksums._pending[path][1]
+        checksums.close()
+        assert future.cancelled()
+        assert not checksums._cache
+
+
+def test_digest_cache():
+    cache = DigestCache(maxsize=2)
+    cache["a"] = "A"
+    cache["b"] = "B"
+    assert cache.get("a") == "A"
+    cache["c"] = "C"  # Evicts b, the least recently used.
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+    assert cache.pop("a") == "A"
+    assert cache.pop("a") is None
+    assert len(cache) == 1
@@ -1,6 +1,10 @@
+import pytest
 from click.testing import CliRunner
+from unittest import mock
 
+from ccli.commands.tree import cli
 from ccli.commands.tree.cli import tree
+from ccli.commands.tree.estimate import Budget
 
 
 def test_tree(chdir, simple_tree, starting_path):
@@ -17,3 +21,178 @@ def test_tree(chdir, simple_tree, starting_path):
 └―― c_file
 2 directories, 1 file link, 4 files, 1 directory link, 1 broken link
 """
+
+
+def test_save_snapshot_single_path():
+    result = CliRunner().invoke(tree, ("--save-snapshot", "x", "a", "b"))
+    assert result.exit_code == 2
+    assert "--save-snapshot takes a single path." in result.output
+
+
+def test_dir_timeout_diff(tmp_path):
+    result = CliRunner().invoke(
+        tree,
+        ("--dir-timeout", "1", "--diff", str(tmp_path)),
+    )
+    assert result.exit_code == 2
+    assert "--dir-timeout can't be used with --diff" in result.output
+
+
+@mock.patch.object(cli, "invoke_main", autospec=True)
+def test_sort_by_size(mock_invoke_main):
+    CliRunner().invoke(tree, ("-S", "--sort", "version"))
+    kwargs = mock_invoke_main.call_args.kwargs["kwargs"]
+    assert kwargs["sort"] == "size"
+    assert "sort_by_size" not in kwargs
+
+
+def test_browse_count_only():
+    result = CliRunner().invoke(tree, ("--browse", "--count-only"))
+    assert result.exit_code == 2
+    assert "--browse can't be used with --count-only" in result.output
+
+
+def test_estimate_invalid():
+    result = CliRunner().invoke(tree, ("--estimate", "1m"))
+    assert result.exit_code == 2
+    assert "expected seconds (like 30s)" in result.output
+
+
+@mock.patch.object(cli, "invoke_main", autospec=True)
+def test_estimate(mock_invoke_main):
+    CliRunner().invoke(tree, ("--estimate", "30s"))
+    kwargs = mock_invoke_main.call_args.kwargs["kwargs"]
+    assert kwargs["estimate"] == Budget(seconds=30.0, calls=None)
+
+
+def test_estimate_diff(tmp_path):
+    result = CliRunner().invoke(
+        tree,
+        ("--estimate", "10", "--diff", str(tmp_path)),
+    )
+    assert result.exit_code == 2
+    assert "--estimate can't be used with --browse" in result.output
+
+
+@pytest.mark.parametrize("option", ["--diff", "--save-snapshot"])
+def test_count_only_diff(option, tmp_path):
+    result = CliRunner().invoke(
+        tree,
+        ("--count-only", option, str(tmp_path)),
+    )
+    assert result.exit_code == 2
+    assert "--count-only can't be used with --diff" in result.output
+
+
+def test_diff_missing(tmp_path):
+    result = CliRunner().invoke(tree, ("--diff", str(tmp_path / "missing")))
+    assert result.exit_code == 2
+    assert "does not exist" in result.output
+
+
+@pytest.mark.parametrize("option", [
+    ("--browse",),
+    ("--estimate", "10"),
+    ("--save-snapshot", "x"),
+])
+def test_max_entries_browse(option):
+    result = CliRunner().invoke(tree, ("--max-entries", "3") + option)
+    assert result.exit_code == 2
+    assert "--max-entries can't be used with --browse" in result.output
+
+
+@pytest.mark.parametrize("option", [
+    ("--align-lookahead", "0"),
+    ("--browse",),
+    ("--save-snapshot", "x"),
+])
+def test_output_format_lookahead(option):
+    result = CliRunner().invoke(
+        tree,
+        ("--output-format", "html") + option,
+    )
+    assert result.exit_code == 2
+    assert "--output-format can't be used with --align-lookahead" in (
+        result.output
+    )
+
+
+@pytest.mark.parametrize("option", [
+    ("--browse",),
+    ("--diff", "."),
+    ("--save-snapshot", "x"),
+])
+def test_bytes_paths(option):
+    result = CliRunner().invoke(tree, ("--bytes-paths",) + option)
+    assert result.exit_code == 2
+    assert "--bytes-paths can't be used with --browse" in result.output
+
+
+@pytest.mark.parametrize("option", [
+    ("--browse",),
+    ("--diff", "."),
+    ("--estimate", "1s"),
+    ("--jobs", "2"),
+    ("--save-snapshot", "x"),
+])
+def test_summary_by(option):
+    result = CliRunner().invoke(tree, ("--summary-by", "ext") + option)
+    assert result.exit_code == 2
+    assert "--summary-by can't be used with --browse" in result.output
+
+
+@pytest.mark.parametrize("option", [
+    ("-l",),
+    ("--align-lookahead", "0"),
+    ("--count-only",),
+    ("--max-entries", "3"),
+    ("--output-format", "markdown"),
+])
+def test_jobs(option):
+    result = CliRunner().invoke(tree, ("--jobs", "2") + option)
+    assert result.exit_code == 2
+    assert "--jobs can't be used with -l" in result.output
+
+
+@mock.patch.object(cli, "invoke_main", autospec=True)
+@mock.patch.object(cli.time, "time", autospec=True, return_value=100000.0)
+def test_predicates(mock_time, mock_invoke_main):
+    CliRunner().invoke(
+        tree,
+        (
+            "--newer", "1d",
+            "--older", "1h",
+            "--min-size", "2K",
+            "--user", "0",
+            "--prune",
+        ),
+    )
+    kwargs = mock_invoke_main.call_args.kwargs["kwargs"]
+    assert (
+        kwargs["newer"],
+        kwargs["older"],
+        kwargs["min_size"],
+        kwargs["owner"],
+        kwargs["prune"],
+    ) == (13600.0, 96400.0, 2048, 0, True)
+
+
+@pytest.mark.parametrize("option, error", [
+    ("--min-size", "expected bytes"),
+    ("--newer", "expected an age"),
+    ("--user", "No user named"),
+])
+def test_predicates_invalid(option, error):
+    result = CliRunner().invoke(tree, (option, "nonsense"))
+    assert result.exit_code == 2
+    assert error in result.output
+
+
+@pytest.mark.parametrize("option", [
+    ("--estimate", "10"),
+    ("--save-snapshot", "x"),
+])
+def test_predicates_estimate(option):
+    result = CliRunner().invoke(tree, ("--prune",) + option)
+    assert result.exit_code == 2
+    assert "--prune can't be used with --diff" in result.output
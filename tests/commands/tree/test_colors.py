@@ -0,0 +1,129 @@
+import pytest
+import stat
+
+from ccli.commands.tree import colors
+from ccli.commands.tree.backends import make_stats
+from ccli.commands.tree.colors import RESET, LSColors, Sgr
+from ccli.commands.tree.diff import DiffTree
+from ccli.commands.tree.main import Tree
+
+LS_COLORS = ":".join((
+    "di=01;34",
+    "ln=01;36",
+    "or=31",
+    "fi=",
+    "ex=32",
+    "mh=35",
+    "pi=33",
+    "tw=42",
+    "ow=43",
+    "st=44",
+    "*.gz=01;31",
+    "*.tar.gz=01;91",
+    "*.PY=36",
+    "*README=04",
+    "*.md=",
+    "bogus",
+))
+
+
+def sgr(code):
+    return f"\033[{code}m"
+
+
+@pytest.fixture
+def ls_colors():
+    return LSColors(LS_COLORS)
+
+
+class TestLSColors:
+    @pytest.mark.parametrize("name, mode, nlink, expectation", [
+        ("dir", stat.S_IFDIR | 0o755, 2, sgr("01;34")),
+        ("tmp", stat.S_IFDIR | 0o1777, 2, sgr("42")),
+        ("shared", stat.S_IFDIR | 0o777, 2, sgr("43")),
+        ("sticky", stat.S_IFDIR | 0o1755, 2, sgr("44")),
+        ("script", stat.S_IFREG | 0o755, 1, sgr("32")),
+        ("hard", stat.S_IFREG | 0o644, 2, sgr("35")),
+        ("setuid", stat.S_IFREG | 0o4755, 1, sgr("37;41")),
+        ("fifo", stat.S_IFIFO | 0o644, 1, sgr("33")),
+        ("socket", stat.S_IFSOCK | 0o644, 1, sgr("01;35")),
+        ("a.gz", stat.S_IFREG | 0o644, 1, sgr("01;31")),
+        ("a.b.tar.gz", stat.S_IFREG | 0o644, 1, sgr("01;91")),
+        ("module.py", stat.S_IFREG | 0o644, 1, sgr("36")),
+        ("README", stat.S_IFREG | 0o644, 1, sgr("04")),
+        ("notes.md", stat.S_IFREG | 0o644, 1, None),
+        ("plain", stat.S_IFREG | 0o644, 1, None),
+    ])
+    def test_lookup(self, name, mode, nlink, expectation, ls_colors):
+        stats = make_stats(mode=mode, nlink=nlink)
+        assert ls_colors.lookup(name, stats, islink=False) == expectation
+
+    def test_links(self, ls_colors):
+        stats = make_stats(mode=stat.S_IFDIR | 0o755)
+        assert ls_colors.lookup("link", stats, islink=True) == sgr("01;36")
+        assert ls_colors.lookup("link", None, islink=True) == sgr("31")
+        target = LSColors("ln=target")
+        assert target.lookup("link", stats, islink=True) == sgr("01;34")
+        assert target.lookup("link", None, islink=True) is None
+
+    def test_missing(self, ls_colors):
+        assert ls_colors.lookup("...", None, islink=False) is None
+        assert LSColors("mi=05").lookup("...", None, False) == sgr("05")
+
+    def test_cached(self, ls_colors):
+        stats = make_stats(mode=stat.S_IFREG | 0o644)
+        ls_colors.lookup("a.tar.gz", stats, islink=False)
+        ls_colors._dotted.clear()
+        assert ls_colors.lookup("b.tar.gz", stats, False) == sgr("01;91")
+
+    def test_from_environ(self, monkeypatch):
+        assert colors.from_environ() is None
+        monkeypatch.setenv("LS_COLORS", LS_COLORS)
+        assert colors.from_environ() is colors.from_environ()
+
+    def test_wrap(self):
+        assert Sgr(sgr("31")).wrap("text") == f"{sgr('31')}text{RESET}"
+
+
+@pytest.mark.usefixtures("simple_tree")
+class TestTree:
+    @pytest.mark.parametrize("force_color", [True, False])
+    def test_tree(self, force_color, monkeypatch, tree_kwargs, capfd):
+        monkeypatch.setenv("LS_COLORS", LS_COLORS)
+        tree_kwargs.update({
+            "force_color": force_color,
+            "no_color": not force_color,
+            "report": False,
+        })
+        Tree(**tree_kwargs)
+        out = capfd.readouterr().out
+        if not force_color:
+            assert "\033" not in out
+            return
+        lines = out.splitlines()
+        for line, name, code in zip(lines, [
+            "starting_path",
+            "a_dir",
+            "a_file",
+            "b_file",
+            "c_dir",
+            "a_file",
+            "b_file",
+            "broken_link",
+            "c_file",
+        ], [
+            "01;34", "01;34", "01;36", None, "01;36", None, None, "31", None,
+        ]):
+            if code is None:
+                assert f"{RESET}{name}" in line
+            else:
+                assert f"{sgr(code)}{name}{RESET}" in line
+
+    def test_diff(self, monkeypatch, tmp_path, tree_kwargs, capfd):
+        monkeypatch.setenv("LS_COLORS", LS_COLORS)
+        (empty := tmp_path / "empty").mkdir()
+        tree_kwargs.update({"diff": str(empty), "force_color": True})
+        DiffTree(**tree_kwargs)
+        out = capfd.readouterr().out
+        assert f"{sgr('01;34')}a_dir{RESET}" in out
+        assert f"{sgr('31')}broken_link{RESET}" in out
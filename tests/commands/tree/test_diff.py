@@ -0,0 +1,205 @@
+import click
+import json
+import os
+import pytest
+from unittest import mock
+
+from ccli.commands.tree import main
+from ccli.commands.tree.diff import DiffTree
+
+
+@pytest.fixture
+def make_tree(tmp_path):
+    def make_tree(name, spec):
+        """Make a tree under tmp_path from {name: size or dict or str}.
+
+        Integers are file sizes, dicts are directories, and strings are
+        symbolic link targets. All modification times are fixed so that
+        two trees built from the same spec have the same digests.
+        """
+        root = tmp_path / name
+        root.mkdir()
+
+        def build(path, spec):
+            for child, value in spec.items():
+                child_path = path / child
+                if isinstance(value, dict):
+                    child_path.mkdir()
+                    build(child_path, value)
+                elif isinstance(value, str):
+                    child_path.symlink_to(value)
+                else:
+                    child_path.write_bytes(b"x" * value)
+                    os.utime(child_path, ns=(0, 0))
+
+        build(root, spec)
+        return root
+
+    return make_tree
+
+
+@pytest.fixture
+def old_tree(make_tree):
+    return make_tree("old", {
+        "same_dir": {"a_file": 1, "b_file": 2},
+        "changed_dir": {"a_file": 1, "b_file": 2, "removed_file": 3},
+        "removed_dir": {"a_file": 1},
+        "a_link": "same_dir",
+        "changed_file": 4,
+    })
+
+
+@pytest.fixture
+def new_tree(make_tree):
+    return make_tree("new", {
+        "same_dir": {"a_file": 1, "b_file": 2},
+        "changed_dir": {"a_file": 1, "b_file": 5, "added_file": 3},
+        "added_dir": {"a_file": 1},
+        "a_link": "changed_dir",
+        "changed_file": 6,
+    })
+
+
+@pytest.fixture
+def diff_kwargs(new_tree, old_tree, tree_kwargs):
+    tree_kwargs.update({
+        "diff": str(old_tree),
+        "paths": (str(new_tree),),
+    })
+    return tree_kwargs
+
+
+class TestDiffTree:
+    def test_digest_ignores_root_name(self, make_tree, tree_kwargs):
+        spec = {"a_dir": {"a_file": 1}, "a_link": "a_dir"}
+        tree_kwargs["paths"] = ()
+        tree = DiffTree(**tree_kwargs)
+        assert tree._digest(make_tree("one", spec))["digest"] == (
+            tree._digest(make_tree("two", spec))["digest"]
+        )
+
+    @pytest.mark.parametrize("change", [
+        {"a_file": 2},
+        {"b_file": 1},
+        {"a_file": "a_dir"},
+        {"a_file": {}},
+    ])
+    def test_digest_changes(self, change, make_tree, tree_kwargs):
+        tree_kwargs["paths"] = ()
+        tree = DiffTree(**tree_kwargs)
+        spec = {"a_file": 1}
+        assert tree._digest(make_tree("one", spec))["digest"] != (
+            tree._digest(make_tree("two", {**spec, **change}))["digest"]
+        )
+
+    @pytest.mark.parametrize("diff, save_snapshot, expectation", [
+        (False, False, "Tree"),
+        (True, False, "DiffTree"),
+        (False, True, "DiffTree"),
+    ])
+    def test_main(self, diff, save_snapshot, expectation, tree_kwargs):
+        tree_kwargs.update({
+            "diff": "other" if diff else None,
+            "save_snapshot": "snapshot" if save_snapshot else None,
+        })
+        with mock.patch.object(
+            main,
+            "Tree",
+            autospec=True,
+        ) as mock_tree, mock.patch(
+            "ccli.commands.tree.diff.DiffTree",
+            autospec=True,
+        ) as mock_diff_tree:
+            main.main(**tree_kwargs)
+        called = mock_tree if expectation == "Tree" else mock_diff_tree
+        called.assert_called_once_with(**tree_kwargs)
+
+
+@pytest.mark.integration
+class TestDiff:
+    def test_diff(self, diff_kwargs, capfd):
+        DiffTree(**diff_kwargs)
+        assert capfd.readouterr().out == """\
+new
+├―― ~ a_link
+├―― + added_dir
+├―― ~ changed_dir
+│   ├―― + added_file
+│   ├―― ~ b_file
+│   └―― - removed_file
+├―― ~ changed_file
+└―― - removed_dir
+2 added, 4 changed, 2 removed
+"""
+
+    def test_reverse(self, diff_kwargs, capfd):
+        diff_kwargs["reverse"] = True
+        DiffTree(**diff_kwargs)
+        assert capfd.readouterr().out.splitlines()[1:3] == [
+            "├―― - removed_dir",
+            "├―― ~ changed_file",
+        ]
+
+    def test_dirs_first(self, diff_kwargs, capfd):
+        diff_kwargs["dirs_first"] = True
+        DiffTree(**diff_kwargs)
+        lines = capfd.readouterr().out.splitlines()
+        assert [line.split()[-1] for line in lines[1:-1]] == [
+            "added_dir",
+            "changed_dir",
+            "added_file",
+            "b_file",
+            "removed_file",
+            "removed_dir",
+            "a_link",
+            "changed_file",
+        ]
+
+    def test_no_differences(self, old_tree, tree_kwargs, capfd):
+        tree_kwargs.update({
+            "diff": str(old_tree),
+            "paths": (str(old_tree),),
+        })
+        DiffTree(**tree_kwargs)
+        assert capfd.readouterr().out == "old\nno differences\n"
+
+    def test_changed_root(self, diff_kwargs, new_tree, capfd):
+        diff_kwargs["paths"] = (str(new_tree / "changed_file"),)
+        DiffTree(**diff_kwargs)
+        assert capfd.readouterr().out == "~ changed_file\n1 changed\n"
+
+    def test_size_of_removed(self, diff_kwargs, capfd):
+        """Columns come from whichever side still has the entry."""
+        diff_kwargs["size"] = True
+        DiffTree(**diff_kwargs)
+        lines = capfd.readouterr().out.splitlines()
+        assert lines[6] == "│   └―― - 3 removed_file"
+
+    def test_snapshot(self, diff_kwargs, new_tree, tmp_path, capfd):
+        snapshot = tmp_path / "snapshot.json"
+        diff_kwargs.update({
+            "diff": None,
+            "paths": (diff_kwargs["diff"],),
+            "save_snapshot": str(snapshot),
+        })
+        DiffTree(**diff_kwargs)
+        assert capfd.readouterr().out == ""
+        assert json.loads(snapshot.read_text())["type"] == "d"
+        diff_kwargs.update({
+            "diff": str(snapshot),
+            "paths": (str(new_tree),),
+            "save_snapshot": None,
+            "size": True,
+        })
+        DiffTree(**diff_kwargs)
+        lines = capfd.readouterr().out.splitlines()
+        assert lines[-1] == "2 added, 4 changed, 2 removed"
+        assert lines[6] == "│   └―― - ? removed_file"
+
+    @pytest.mark.parametrize("content", [b"not json", b"\xff\xfe", b"[1]"])
+    def test_not_a_snapshot(self, content, diff_kwargs, tmp_path):
+        other = tmp_path / "other"
+        other.write_bytes(content)
+        diff_kwargs["diff"] = str(other)
+        with pytest.raises(click.BadParameter, match="nor a snapshot"):
+            DiffTree(**diff_kwargs)
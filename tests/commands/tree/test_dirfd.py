@@ -0,0 +1,138 @@
+import errno
+import os
+import pytest
+import threading
+from unittest import mock
+
+from ccli.commands.tree import dirfd
+from ccli.commands.tree.dirfd import DirFds, open_dir_fds
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    for name in ("a/b/c", "d", "e"):
+        (tmp_path / name).mkdir(parents=True)
+    (tmp_path / "a/b/c/file").write_text("x")
+    return tmp_path
+
+
+@pytest.fixture
+def fds():
+    fds = DirFds(max_fds=3)
+    yield fds
+    fds.close()
+
+
+def is_open(fd, path):
+    """Whether fd is open on path (fd numbers are reused once closed)."""
+    try:
+        return os.fstat(fd).st_ino == os.stat(path).st_ino
+    except OSError:
+        return False
+
+
+def test_at(dirs, fds):
+    name, fd = fds.at(str(dirs / "a/b/c/file"))
+    assert name == "file"
+    assert os.stat(name, dir_fd=fd).st_size == 1
+    assert fds.at(str(dirs / "a/b/c/file")) == (name, fd)
+
+
+@pytest.mark.parametrize("path", ["file", "/", "a/b/", "/missing/file"])
+def test_at_nothing_to_be_relative_to(path, fds):
+    assert fds.at(path) == (path, None)
+
+
+def test_relative_to_parent(dirs, fds):
+    """Directories are opened through their parent's fd, if it's open."""
+    fds.open(str(dirs / "a"))
+    os.rename(dirs / "a", dirs / "renamed")
+    assert os.listdir(fds.open(str(dirs / "a/b"))) == ["c"]
+    assert os.listdir(fds.open(str(dirs / "a/b/c"))) == ["file"]
+
+
+def test_bounded(dirs, fds):
+    """The least recently used are closed, to keep within max_fds."""
+    a, d, e = (fds.open(str(dirs / name)) for name in ("a", "d", "e"))
+    assert fds.open(str(dirs / "a")) == a
+    b = fds.open(str(dirs / "a/b"))
+    assert not is_open(d, dirs / "d")
+    assert is_open(a, dirs / "a") and is_open(e, dirs / "e")
+    assert is_open(b, dirs / "a/b")
+    fds.close()
+    assert not is_open(a, dirs / "a")
+    assert fds.open(str(dirs / "d")) is not None
+
+
+@pytest.mark.parametrize("number, max_fds", [
+    (errno.EMFILE, 1),
+    (errno.ENOENT, 3),
+])
+def test_open_fails(number, max_fds, dirs, fds):
+    """Calls fall back to paths; out of fds, fewer are kept open."""
+    fds.open(str(dirs / "d"))
+    with mock.patch.object(
+        dirfd.os,
+        "open",
+        autospec=True,
+        side_effect=OSError(number, "No"),
+    ):
+        assert fds.open(str(dirs / "e")) is None
+    assert fds.max_fds == max_fds
+
+
+def test_threads(dirs):
+    """A thread never closes another's fds, only those of finished ones."""
+    fds = DirFds(max_fds=1)
+    opened = []
+    release = threading.Event()
+
+    def other():
+        opened.append(fds.open(str(dirs / "d")))
+        release.wait()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    while not opened:
+        pass
+    assert fds.open(str(dirs / "a")) is None
+    assert is_open(opened[0], dirs / "d")
+    release.set()
+    thread.join()
+    assert fds.open(str(dirs / "a")) is not None
+    assert not is_open(opened[0], dirs / "d")
+    fds.close()
+
+
+def test_scandir(dirs, fds):
+    [entry] = fds.scandir(str(dirs / "a/b"))
+    assert (entry.name, entry.path) == ("c", str(dirs / "a/b/c"))
+    assert entry.is_dir() and not entry.is_symlink()
+    assert fds.scandir(str(dirs / "missing")) is None
+    assert fds.scandir(os.fsencode(dirs / "a/b")) is None  # Listed by path.
+
+
+def test_listdir(dirs, fds):
+    assert fds.listdir(str(dirs / "a/b")) == ["c"]
+    assert fds.listdir(str(dirs / "missing")) is None
+    assert fds.listdir(os.fsencode(dirs / "a/b")) is None
+
+
+def test_open_dir_fds():
+    with mock.patch.object(
+        dirfd.resource,
+        "getrlimit",
+        autospec=True,
+        return_value=(100, 200),
+    ):
+        assert open_dir_fds(1000).max_fds == 50
+        assert open_dir_fds(10).max_fds == 10
+    with mock.patch.object(
+        dirfd.resource,
+        "getrlimit",
+        autospec=True,
+        return_value=(dirfd.resource.RLIM_INFINITY,) * 2,
+    ):
+        assert open_dir_fds(1000).max_fds == 1000
+    with mock.patch.object(dirfd.os, "supports_dir_fd", set()):
+        assert open_dir_fds(10) is None
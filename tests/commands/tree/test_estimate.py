@@ -0,0 +1,135 @@
+import itertools
+import pytest
+import random
+import zlib
+from types import SimpleNamespace
+
+from ccli.commands.tree.estimate import Budget, Estimate, margin, parse_budget
+
+
+def balanced(fanout, depth, files):
+    """listdir for a tree with fanout directories (and files) per level."""
+    def listdir(directory):
+        listing = [
+            (f"{directory}/f{index}", "files", 10, False)
+            for index in range(files)
+        ]
+        if directory.count("/") < depth:
+            listing.extend(
+                (f"{directory}/d{index}", "directories", 0, True)
+                for index in range(fanout)
+            )
+        return listing
+    return listdir
+
+
+@pytest.mark.parametrize("text, expectation", [
+    ("30s", Budget(seconds=30.0, calls=None)),
+    ("0.5s", Budget(seconds=0.5, calls=None)),
+    ("50000", Budget(seconds=None, calls=50000)),
+])
+def test_parse_budget(text, expectation):
+    assert parse_budget(text) == expectation
+
+
+@pytest.mark.parametrize("text", ["0s", "-1s", "0", "ten", "s", "1m"])
+def test_parse_budget_invalid(text):
+    with pytest.raises(ValueError):
+        parse_budget(text)
+
+
+def test_margin():
+    assert margin(None) is None
+    assert margin(0) == 0
+    assert margin(100) == 20
+
+
+class TestEstimate:
+    def test_exact(self):
+        """With budget to spare, everything is listed exactly."""
+        estimate = Estimate(
+            Budget(seconds=None, calls=10**6),
+            listdir=balanced(fanout=3, depth=3, files=2),
+        ).run(".")
+        assert estimate.probes == []
+        assert estimate.results() == {
+            "files": (2 * (1 + 3 + 9 + 27), 0),
+            "directories": (3 + 9 + 27, 0),
+            "bytes": (20 * (1 + 3 + 9 + 27), 0),
+        }
+
+    def test_balanced(self):
+        """Every probe of a balanced tree is exactly right."""
+        estimate = Estimate(
+            Budget(seconds=None, calls=48),  # The top two levels exactly.
+            listdir=balanced(fanout=3, depth=4, files=2),
+            rng=random.Random(0),
+        ).run(".")
+        assert len(estimate.probes) == 2
+        results = estimate.results()
+        assert results["files"] == (2 * (1 + 3 + 9 + 27 + 81), 0)
+        assert results["directories"] == (3 + 9 + 27 + 81, 0)
+        assert list(results)[-1] == "bytes"
+
+    def test_unbiased(self):
+        """The mean of many estimates of an uneven tree is close."""
+        def listdir(directory):
+            depth = directory.count("/")
+            fanout = 0 if depth > 6 else zlib.crc32(directory.encode()) % 4
+            return [
+                (f"{directory}/d{index}", "directories", 0, True)
+                for index in range(fanout)
+            ] + [(f"{directory}/f", "files", 1, False)]
+
+        exact = Estimate(Budget(None, 10**6), listdir).run(".")
+        total = exact.results()["files"][0]
+        estimate = Estimate(
+            Budget(seconds=None, calls=exact.calls // 2),
+            listdir=listdir,
+            rng=random.Random(1),
+        ).run(".")
+        value, variance = estimate.results()["files"]
+        assert abs(value - total) <= 3 * margin(variance)
+
+    def test_single_probe(self):
+        """A probe always runs; one alone has no confidence interval."""
+        estimate = Estimate(
+            Budget(seconds=None, calls=1),
+            listdir=balanced(fanout=2, depth=3, files=1),
+            rng=random.Random(0),
+        ).run(".")
+        assert len(estimate.probes) == 1
+        assert estimate.results()["files"] == (1 + 2 + 4 + 8, None)
+
+    def test_unprobed(self):
+        """Keys no probe came across are estimated, with no known spread."""
+        def listdir(directory):
+            if directory == ".":
+                return [("./d0", "directories", 0, True)] + [
+                    ("./d1", "directories", 0, True),
+                ]
+            if directory == "./d0":
+                return [("./d0/sub", "directories", 0, True)]
+            return [(f"{directory}/f", "files", 1, False)]
+
+        estimate = Estimate(
+            Budget(seconds=None, calls=6),  # The top, then two probes.
+            listdir=listdir,
+            rng=SimpleNamespace(choice=lambda paths: paths[-1]),  # ./d1
+        ).run(".")
+        assert len(estimate.probes) == 2
+        assert estimate.results() == {
+            "directories": (2, None),
+            "files": (2, 0),
+            "bytes": (2, 0),
+        }
+
+    def test_seconds(self):
+        clock = itertools.count()
+        estimate = Estimate(
+            Budget(seconds=4, calls=None),
+            listdir=balanced(fanout=2, depth=10, files=0),
+            clock=lambda: next(clock),
+        ).run(".")
+        assert len(estimate.probes) == 2
+        assert estimate.calls == 3 + 2 * (9 * 3 + 1)
@@ -0,0 +1,262 @@
+import os
+import pytest
+import zipfile
+from concurrent.futures import Future
+from unittest import mock
+
+from ccli.commands.tree import jobs
+from ccli.commands.tree.jobs import Block, JobTree, run_jobs
+from ccli.commands.tree.main import Tree
+
+
+@pytest.fixture
+def wide_tree(make_path):
+    """Enough directories for the workers to get some of them."""
+    for index in range(20):
+        directory = make_path(name=f"dir_{index:02}", kind="dir")
+        make_path(name=directory / "file", kind="file")
+    # Listed before what it points to, in another worker's run.
+    make_path(name="dir_00/link", kind="link", src="../dir_19/file")
+
+
+@pytest.fixture
+def job_tree(tree_kwargs):
+    job_tree = JobTree(**tree_kwargs)
+    yield job_tree
+    job_tree.close()
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("wide_tree")
+@pytest.mark.parametrize("options", [
+    {},
+    {
+        "bytes_paths": True,
+        "checksum": "md5",
+        "dir_fds": 4,
+        "dir_timeout": 10.0,
+        "inodes": True,
+        "one_file_system": True,
+        "permissions": True,
+        "size": True,
+    },
+])
+def test_same_output(options, tree_kwargs, capfd):
+    """The rows and the summary are what a single process prints."""
+    tree_kwargs.update(options)
+    Tree(**tree_kwargs)
+    expectation = capfd.readouterr().out
+    tree_kwargs["jobs"] = 2
+    with mock.patch.object(
+        jobs,
+        "_split",
+        autospec=True,
+        side_effect=jobs._split,
+    ) as mock_split:
+        Tree(**tree_kwargs)
+    mock_split.assert_called_once()
+    assert capfd.readouterr().out == expectation
+    inodes = ", 41 unique inodes" if options else ""
+    assert expectation.endswith(
+        f"21 directories, 19 files, 1 file link{inodes}\n",
+    )
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("wide_tree")
+def test_overlapping_paths(starting_path, tree_kwargs, capfd):
+    """Paths that overlap are printed on one process, the rest on many."""
+    tree_kwargs["paths"] = tuple(
+        str(starting_path / path)
+        for path in ("dir_00", ".", "dir_00", "dir_01/file")
+    )
+    Tree(**tree_kwargs)
+    expectation = capfd.readouterr().out
+    tree_kwargs["jobs"] = 2
+    with mock.patch.object(
+        jobs,
+        "run_jobs",
+        autospec=True,
+        side_effect=jobs.run_jobs,
+    ) as mock_run_jobs:
+        Tree(**tree_kwargs)
+    assert capfd.readouterr().out == expectation
+    assert [call.args[1] for call in mock_run_jobs.call_args_list] == [
+        tree_kwargs["paths"][-1],
+    ]
+    assert expectation.endswith("21 directories, 19 files, 1 file link\n")
+
+
+class _Immediate:
+    """A pool that works on each run as it's sent, in this process."""
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+@pytest.mark.usefixtures("wide_tree")
+def test_resplit(make_path, tree_kwargs, capfd):
+    """Large runs are split again, and only so many are sent ahead."""
+    make_path(name="dir_00/sub", kind="dir")
+    for index in range(10):
+        make_path(name=f"dir_00/sub/{index}", kind="file")
+    Tree(**tree_kwargs)
+    expectation = capfd.readouterr().out
+    tree_kwargs["jobs"] = 2
+    sent = []
+    send_runs = jobs._send
+
+    def send(tree, pieces, number):
+        sent.append(send_runs(tree, pieces, number))
+        return sent[-1]
+
+    jobs._start_worker(tree_kwargs, root_dev=None)
+    try:
+        with mock.patch.object(
+            jobs,
+            "_pool",
+            autospec=True,
+            return_value=_Immediate(),
+        ), mock.patch.object(
+            jobs,
+            "_send",
+            autospec=True,
+            side_effect=send,
+        ), mock.patch.multiple(
+            jobs,
+            _ROWS_PER_BLOCK=3,
+            _TASKS_PER_JOB=1,
+        ), mock.patch.object(
+            jobs,
+            "_block",
+            autospec=True,
+            side_effect=jobs._block,
+        ) as mock_block:
+            Tree(**tree_kwargs)
+    finally:
+        jobs._worker.close()
+    assert capfd.readouterr().out == expectation
+    assert mock_block.call_count > 7  # The runs of 3 the top was split in.
+    assert max(sent) == 2
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_small_tree(tree_kwargs, capfd):
+    """A tree that's printed before it's wide enough needs no workers."""
+    Tree(**tree_kwargs)
+    expectation = capfd.readouterr().out
+    tree_kwargs["jobs"] = 2
+    with mock.patch.object(jobs, "_pool", autospec=True) as mock_pool:
+        Tree(**tree_kwargs)
+    mock_pool.assert_not_called()
+    assert capfd.readouterr().out == expectation
+
+
+def test_archive(tmp_path, tree_kwargs, capfd):
+    """Paths that aren't local are printed by _run."""
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("a_file", "")
+    tree_kwargs.update({"archives": True, "jobs": 2, "paths": (str(path),)})
+    with mock.patch.object(jobs, "run_jobs", autospec=True) as mock_run_jobs:
+        Tree(**tree_kwargs)
+    mock_run_jobs.assert_not_called()
+    assert capfd.readouterr().out.endswith("1 directory, 1 file\n")
+
+
+class TestJobTree:
+    @pytest.mark.usefixtures("simple_tree")
+    def test_worker(self, starting_path, tree_kwargs):
+        """Runs are printed into Blocks, and recorded, not counted."""
+        jobs._start_worker(tree_kwargs, root_dev=None)
+        try:
+            block = jobs._block([(str(starting_path / "a_dir"), "├―― ", {})])
+        finally:
+            jobs._worker.close()
+        assert block.rows == (
+            "├―― a_dir\n│   ├―― a_file\n│   ├―― b_file\n│   └―― c_dir\n"
+        )
+        assert [(key, hardlink) for _, _, key, hardlink in block.records] == [
+            ("directories", None),
+            ("file links", None),
+            ("files", None),
+            ("directory links", None),
+        ]
+        assert block.timed_out == []
+        assert block.rest == []
+
+    @pytest.mark.usefixtures("simple_tree")
+    def test_stops(self, starting_path, job_tree):
+        """What's past _ROWS_PER_BLOCK is left, in order, with its widths."""
+        a_dir = str(starting_path / "a_dir")
+        with mock.patch.object(jobs, "_ROWS_PER_BLOCK", 2):
+            block = job_tree.block([
+                (a_dir, "├―― ", {}),
+                (str(starting_path / "c_file"), "└―― ", {}),
+            ])
+        assert block.rows == "├―― a_dir\n│   ├―― a_file\n"
+        assert block.rest == [
+            (os.path.join(a_dir, "b_file"), "│   ├―― ", {}),
+            (os.path.join(a_dir, "c_dir"), "│   └―― ", {}),
+            (str(starting_path / "c_file"), "└―― ", {}),
+        ]
+
+    def test_recorder(self, job_tree):
+        job_tree._counter["skipped mount points"] += 1
+        assert job_tree._block(rows=mock.Mock()).records == [
+            (None, None, "skipped mount points", None),
+        ]
+
+    def test_timed_out(self, tree_kwargs):
+        """Timed out paths are sent once, and kept to fail fast."""
+        tree_kwargs["dir_timeout"] = 10.0
+        job_tree = JobTree(**tree_kwargs)
+        job_tree._timed_out.append("/a")
+        assert job_tree._block(rows=mock.Mock()).timed_out == ["/a"]
+        assert job_tree._block(rows=mock.Mock()).timed_out == []
+        assert job_tree._fs.timed_out == ["/a"]
+
+    def test_register_timeout(self, job_tree):
+        with mock.patch.object(
+            JobTree,
+            "_registration",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            job_tree._register_path("/a")
+        assert job_tree._records == []
+
+
+def test_write(tree_kwargs, capfd):
+    """Paths already counted (like link targets) aren't counted again."""
+    tree = Tree(**{**tree_kwargs, "paths": (), "report": False})
+    tree._resolved_paths.add("/b")
+    jobs._write(tree, Block(
+        rows="rows\n",
+        records=[
+            ("/a", "/b", "file links", None),
+            ("/b", "/b", "files", None),
+            (None, None, "skipped mount points", None),
+        ],
+        timed_out=["/c"],
+        rest=[],
+    ))
+    assert capfd.readouterr().out == "rows\n"
+    assert tree._counter == {"file links": 1, "skipped mount points": 1}
+    assert tree._timed_out == ["/c"]
+
+
+def test_run_jobs_closes(tree_kwargs):
+    """The JobTree that prints the top closes, even when printing fails."""
+    tree = Tree(**{**tree_kwargs, "jobs": 2, "paths": (), "report": False})
+    with mock.patch.object(
+        JobTree,
+        "expand",
+        autospec=True,
+        side_effect=OSError,
+    ), mock.patch.object(JobTree, "close", autospec=True) as mock_close:
+        with pytest.raises(OSError):
+            run_jobs(tree, "/")
+    mock_close.assert_called_once()
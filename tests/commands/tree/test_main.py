@@ -1,14 +1,23 @@
+import contextlib
 import grp
+import hashlib
+import io
 import math
 import os
 import pytest
 import stat
+import threading
 from datetime import datetime, timedelta
 from types import SimpleNamespace
 from unittest import mock
 
+from ccli import backends
 from ccli.commands.tree import main
+from ccli.commands.tree.cache import ListingCache
+from ccli.commands.tree.dirfd import DirFds
+from ccli.commands.tree.estimate import Budget
 from ccli.commands.tree.main import Tree
+from ccli.commands.tree.progress import Progress
 
 
 @pytest.fixture
@@ -21,6 +30,27 @@ def mock_get_stats():
         yield mock_get_stats
 
 
+@pytest.fixture
+def run_hung(capfd, no_statx):
+    """Run Tree with the os calls for one path hanging until it's done."""
+    def run_hung(hung, calls, tree_kwargs):
+        release = threading.Event()
+        tree_kwargs["dir_timeout"] = 0.05
+        with contextlib.ExitStack() as stack:
+            stack.callback(release.set)
+            for name in calls:
+                def hang(path, *args, _function=getattr(os, name), **kwargs):
+                    if os.fspath(path) == hung:
+                        release.wait()
+                    return _function(path, *args, **kwargs)
+                stack.enter_context(
+                    mock.patch.object(os, name, side_effect=hang),
+                )
+            Tree(**tree_kwargs)
+        return capfd.readouterr().out
+    return run_hung
+
+
 @pytest.fixture
 def mock_run():
     with mock.patch.object(Tree, "_run", autospec=True):
@@ -91,27 +121,7 @@ class TestTree:
         group = Tree(**tree_kwargs)._get_group(path=starting_path)
         assert group == expectation
 
-    @pytest.mark.parametrize("exists", [False, True])
-    def test_get_mtime(
-        self,
-        exists,
-        mock_get_stats,
-        starting_path,
-        tree_kwargs,
-    ):
-        if not exists:
-            mock_get_stats.return_value = None
-        tree = Tree(**tree_kwargs)
-        mtime = tree._get_mtime(
-            name=starting_path.name,
-            parent=starting_path.parent,
-        )
-        mock_get_stats.assert_called_once_with(tree, str(starting_path))
-        if exists:
-            assert mtime == mock_get_stats.return_value.st_mtime
-        else:
-            assert mtime == float("inf")
-
+    @pytest.mark.usefixtures("no_statx")
     @pytest.mark.parametrize("kind", Tree._FILE_TYPE_MAP)
     @pytest.mark.parametrize("read", (0, stat.S_IROTH))
     @pytest.mark.parametrize("write", (0, stat.S_IWOTH))
@@ -163,7 +173,7 @@ class TestTree:
             "".join(triples),
         ))
         with mock.patch.object(
-            main.os,
+            backends.os,
             "stat",
             autospec=True,
             return_value=SimpleNamespace(
@@ -172,6 +182,7 @@ class TestTree:
         ):
             assert tree._get_permissions(path=".") == expectation
 
+    @pytest.mark.usefixtures("no_statx")
     @pytest.mark.parametrize("nice_size", [False, True])
     @pytest.mark.parametrize(
         "exists, size, expectation, nice_expectation",
@@ -196,7 +207,7 @@ class TestTree:
         tree_kwargs["nice_size"] = nice_size
         tree = Tree(**tree_kwargs)
         with mock.patch.object(
-            main.os,
+            backends.os,
             "stat",
             autospec=True,
             return_value=SimpleNamespace(st_size=size) if exists else None,
@@ -207,8 +218,9 @@ class TestTree:
         else:
             assert result == expectation
 
+    @pytest.mark.usefixtures("no_statx")
     @mock.patch.object(main, "pwd", autospec=True)
-    @mock.patch.object(main.os, "stat", autospec=True)
+    @mock.patch.object(backends.os, "stat", autospec=True)
     @pytest.mark.parametrize("side_effect", [None, KeyError])
     def test_get_user(self, mock_stat, mock_pwd, side_effect, tree_kwargs):
         mock_pwd.getpwuid.side_effect = side_effect
@@ -273,16 +285,17 @@ class TestTree:
         mock_path = mock.MagicMock(spec=str)
         tree._print_permissions(path=mock_path)
         mock_calls = []
-        for var, callback in (
-            (permissions, mock_get_permissions),
-            (user, mock_get_user),
-            (group, mock_get_group),
+        for var, callback, column in (
+            (permissions, mock_get_permissions, None),
+            (user, mock_get_user, "user"),
+            (group, mock_get_group, "group"),
         ):
             if var:
                 callback.assert_called_once_with(tree, path=mock_path)
                 mock_calls.append(mock.call(
                     tree,
                     callback.return_value,
+                    column=column,
                     color=tree.permissions_color,
                     attrs=tree.permissions_attrs,
                     end=" ",
@@ -343,11 +356,12 @@ class TestTree:
             )
         ) + "\n"
 
+    @pytest.mark.usefixtures("no_statx")
     @pytest.mark.parametrize("list_hidden", [False, True])
     @pytest.mark.parametrize("hidden", [False, True])
     @pytest.mark.parametrize("list_only_dirs", [False, True])
     @pytest.mark.parametrize("is_dir", [False, True])
-    @mock.patch.object(main.os.path, "isdir", autospec=True)
+    @mock.patch.object(backends.os.path, "isdir", autospec=True)
     def test_to_print(
         self,
         mock_isdir,
@@ -370,6 +384,29 @@ class TestTree:
             expectation = True
         assert tree._to_print(path="", name=name) is expectation
 
+    @pytest.mark.parametrize("inodes", [True, False])
+    def test_inode_key(self, inodes, starting_path, tree_kwargs):
+        tree_kwargs["inodes"] = inodes
+        tree = Tree(**tree_kwargs)
+        path = str(starting_path / "missing")
+        assert tree._inode_key(path=path, islink=True) is None
+        assert tree._inode_key(path=path, islink=False) is None
+
+    def test_registration_timeout(self, starting_path, tree_kwargs):
+        """A path that resolves but then times out is resolved only."""
+        tree = Tree(**tree_kwargs)
+        with mock.patch.object(
+            tree._walker.fs,
+            "islink",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            assert tree._registration(str(starting_path)) == (
+                str(starting_path),
+                None,
+                None,
+            )
+
 
 @pytest.mark.integration
 @pytest.mark.usefixtures("simple_tree")
@@ -469,6 +506,162 @@ drwxr-xr-x starting_path
 2 directories, 1 file link, 1 directory link, 3 files, 1 broken link
 """
 
+    @pytest.mark.parametrize("align_lookahead, expectation", [
+        (None, """\
+4096 starting_path
+├――  4096 a_dir
+│   ├――    7 a_file
+│   ├――   12 b_file
+│   └―― 4096 c_dir
+├――     7 a_file
+├―― 55555 b_file
+├――    12 broken_link
+└――     0 c_file
+"""),
+        (0, """\
+4096 starting_path
+├――  4096 a_dir
+│   ├――     7 a_file
+│   ├――    12 b_file
+│   └――  4096 c_dir
+├――     7 a_file
+├―― 55555 b_file
+├――    12 broken_link
+└――     0 c_file
+"""),
+        (1, """\
+ 4096 starting_path
+├――  4096 a_dir
+│   ├――     7 a_file
+│   ├――    12 b_file
+│   └――  4096 c_dir
+├――     7 a_file
+├―― 55555 b_file
+├――    12 broken_link
+└――     0 c_file
+"""),
+    ])
+    def test_aligned(
+        self,
+        align_lookahead,
+        expectation,
+        starting_path,
+        tree_kwargs,
+        capfd,
+    ):
+        """Columns line up per directory, or across the whole listing."""
+        sizes = {
+            ".": 4096,
+            "a_dir": 4096,
+            "a_dir/a_file": 7,
+            "a_dir/b_file": 12,
+            "a_dir/c_dir": 4096,
+            "a_file": 7,
+            "b_file": 55555,
+            "broken_link": 12,
+            "c_file": 0,
+        }
+        tree_kwargs.update({
+            "align_lookahead": align_lookahead,
+            "report": False,
+            "size": True,
+        })
+        with mock.patch.object(
+            Tree,
+            "_get_size",
+            autospec=True,
+            side_effect=lambda self, path: str(
+                sizes[os.path.relpath(path, starting_path)]
+            ),
+        ):
+            Tree(**tree_kwargs)
+        assert capfd.readouterr().out == expectation
+
+    @pytest.mark.parametrize("count_only", [False, True])
+    def test_inodes(self, count_only, starting_path, tree_kwargs, capfd):
+        """Hard links to one file count as one inode."""
+        os.link(starting_path / "c_file", starting_path / "a_dir" / "d_file")
+        tree_kwargs.update({"count_only": count_only, "inodes": True})
+        Tree(**tree_kwargs)
+        lines = capfd.readouterr().out.splitlines()
+        assert lines[-1] == (
+            "2 directories, 1 file link, 1 directory link, 4 files, "
+            "1 broken link, 8 unique inodes"
+        )
+        if count_only:
+            return
+
+        def inode(name):
+            return str(os.stat(starting_path / name).st_ino)
+
+        width = max(
+            len(inode(name)) for name in ("a_dir", "a_file", "c_file")
+        )
+        inner = max(
+            len(inode(name)) for name in ("a_dir/b_file", ".hidden_dir")
+        )
+        assert lines[1:-1] == [
+            f"├―― {inode('a_dir'):>{width}} a_dir",
+            f"│   ├―― {inode('a_dir/b_file'):>{inner}} a_file",
+            f"│   ├―― {inode('a_dir/b_file'):>{inner}} b_file",
+            f"│   ├―― {inode('.hidden_dir'):>{inner}} c_dir",
+            f"│   └―― {inode('c_file'):>{inner}} d_file",
+            f"├―― {inode('a_file'):>{width}} a_file",
+            f"├―― {inode('b_file'):>{width}} b_file",
+            f"├―― {'?':>{width}} broken_link",
+            f"└―― {inode('c_file'):>{width}} c_file",
+        ]
+
+    def test_checksum(self, tree_kwargs, capfd):
+        tree_kwargs["checksum"] = "sha256"
+        Tree(**tree_kwargs)
+        empty = hashlib.sha256().hexdigest()
+        no_file, missing = "-" * len(empty), "?" * len(empty)
+        assert capfd.readouterr().out == f"""\
+{no_file} starting_path
+├―― {no_file} a_dir
+│   ├―― {empty} a_file
+│   ├―― {empty} b_file
+│   └―― {no_file} c_dir
+├―― {empty} a_file
+├―― {empty} b_file
+├―― {missing} broken_link
+└―― {empty} c_file
+2 directories, 1 file link, 1 directory link, 3 files, 1 broken link
+"""
+
+    @pytest.mark.parametrize("ahead", [0, 1, 3])
+    def test_checksums_ahead(self, ahead, tree_kwargs, capfd):
+        """Only so many files are hashed ahead of the row being printed."""
+        tree_kwargs["checksum"] = "sha256"
+        Tree(**tree_kwargs)
+        expectation = capfd.readouterr().out
+        pending = []
+        submit = main.Checksums.submit
+
+        def record(checksums, path, stats):
+            submit(checksums, path=path, stats=stats)
+            pending.append(checksums.pending)
+
+        with mock.patch.object(main, "_CHECKSUMS_AHEAD", ahead), (
+            mock.patch.object(
+                main.Checksums,
+                "submit",
+                autospec=True,
+                side_effect=record,
+            )
+        ):
+            Tree(**tree_kwargs)
+        assert capfd.readouterr().out == expectation
+        assert max(pending) == ahead + 1  # And the printed one, by result().
+
+    def test_unreadable_checksum(self, starting_path, tree_kwargs):
+        tree_kwargs["checksum"] = "sha256"
+        tree = Tree(**tree_kwargs)
+        tree._checksums = mock.MagicMock(width=3)
+        tree._checksums.result.side_effect = PermissionError
+        assert tree._get_checksum(path=starting_path / "a_file") == "???"
+
     def test_ignore_tree(self, tree_kwargs, capfd):
         tree_kwargs["ignore_tree"] = True
         Tree(**tree_kwargs)
@@ -485,6 +678,80 @@ c_file
 2 directories, 1 file link, 1 directory link, 3 files, 1 broken link
 """
 
+    def test_markdown(self, tree_kwargs, capfd):
+        tree_kwargs["output_format"] = "markdown"
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == """\
+- **starting\\_path**
+  - **a\\_dir**
+    - *a\\_file*
+    - b\\_file
+    - *c\\_dir*
+  - a\\_file
+  - b\\_file
+  - *broken\\_link*
+  - c\\_file
+
+2 directories, 1 file link, 1 directory link, 3 files, 1 broken link
+
+"""
+
+    def test_html(self, tree_kwargs, capfd, monkeypatch):
+        """Directories nest, whatever $LS_COLORS says."""
+        monkeypatch.setenv("LS_COLORS", "di=01;34")
+        tree_kwargs.update({"max_entries": 3, "output_format": "html"})
+        Tree(**tree_kwargs)
+        out = capfd.readouterr().out
+        assert out.startswith("<!DOCTYPE html>")
+        assert out.split("<body>\n")[1] == """\
+<ul>
+<li><details open><summary><span class="cyan bold">starting_path</span>\
+</summary><ul>
+<li><details open><summary><span class="cyan bold">a_dir</span>\
+</summary><ul>
+<li><span class="green underline">a_file</span></li>
+</ul></details></li>
+</ul></details></li>
+</ul>
+<p>2 directories, 1 file link, stopped at 3 entries</p>
+</body>
+</html>
+"""
+
+    @pytest.mark.parametrize("count_only, size", [
+        (False, 3),  # Sizes of what links point to, like -s.
+        (True, 23),  # lstat() sizes, taken for --inodes.
+    ])
+    def test_progress(
+        self,
+        count_only,
+        size,
+        starting_path,
+        tree_kwargs,
+        capfd,
+    ):
+        (starting_path / "a_file").write_text("abc")
+        tree_kwargs.update({
+            "count_only": count_only,
+            "inodes": True,
+            "progress": True,
+            "size": True,
+        })
+        status = Progress(io.StringIO(), interval=0.0)
+        with mock.patch.object(
+            main,
+            "open_progress",
+            autospec=True,
+            return_value=status,
+        ) as mock_open_progress:
+            Tree(**tree_kwargs)
+        mock_open_progress.assert_called_once_with(
+            prints_rows=not count_only,
+        )
+        assert (status.entries, status.pending, status.bytes) == (9, 0, size)
+        assert status.directory == str(starting_path / "a_dir")
+        assert status._stream.getvalue().endswith("\r\033[K")
+
     @pytest.mark.parametrize("list_hidden", [False, True])
     @pytest.mark.parametrize("list_only_dirs", [False, True])
     @pytest.mark.parametrize("reverse", [False, True])
@@ -523,6 +790,202 @@ c_file
         result = Tree(**tree_kwargs)._ls(starting_path)
         assert result == expectation
 
+    def test_dirs_first(self, tree_kwargs, capfd):
+        tree_kwargs["dirs_first"] = True
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == """\
+starting_path
+├―― a_dir
+│   ├―― c_dir
+│   ├―― a_file
+│   └―― b_file
+├―― a_file
+├―― b_file
+├―― broken_link
+└―― c_file
+2 directories, 1 directory link, 1 file link, 3 files, 1 broken link
+"""
+
+    def test_ls_cached(self, starting_path, tree_kwargs):
+        listings = mock.MagicMock(spec=ListingCache)
+        listings.scandir.return_value = sorted(
+            (
+                entry for entry in os.scandir(starting_path)
+                if entry.name in ("a_file", "b_file")
+            ),
+            key=lambda entry: entry.name,
+            reverse=True,
+        )
+        with mock.patch.object(Tree, "_listings", listings):
+            tree = Tree(**tree_kwargs)
+        assert tree._ls(starting_path) == ["a_file", "b_file"]
+        listings.scandir.assert_called_with(starting_path)
+
+    @pytest.mark.parametrize("options", [
+        {},
+        {"list_hidden": True},
+        {"list_only_dirs": True},
+        {"follow_links": True},
+        {"follow_links": True, "list_hidden": True},
+        {"reverse": True, "list_hidden": True},
+        {"time": True, "list_hidden": True},
+        {"sort": "size", "dirs_first": True, "reverse": True},
+        {"sort": "none", "list_hidden": True},
+    ])
+    def test_count_only(self, options, tree_kwargs, capfd):
+        """Count-only prints the summary of a full listing."""
+        tree_kwargs.update(options)
+        Tree(**tree_kwargs)
+        summary = capfd.readouterr().out.splitlines()[-1]
+        tree_kwargs["count_only"] = True
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == summary + "\n"
+
+    def test_estimate_exact(self, tree_kwargs, capfd):
+        """With budget to spare, the estimate is an exact count."""
+        tree_kwargs["estimate"] = Budget(seconds=None, calls=10**6)
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == (
+            "2 directories, 4 files, 1 broken link, 1 file link, "
+            "1 directory link, 20 bytes\n"
+        )
+
+    def test_estimate(self, starting_path, tree_kwargs, capfd):
+        """Once anything is probed, every count is an estimate."""
+        (starting_path / "a_dir" / "b_file").write_bytes(b"x" * 10)
+        tree_kwargs["estimate"] = Budget(seconds=None, calls=1)
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == (
+            "~2 ± ? directories, ~4 ± ? files, ~1 ± ? broken link, "
+            "~1 ± ? file link, ~1 ± ? directory link, ~30 ± ? bytes, "
+            "1 sample\n"
+        )
+
+    def test_estimate_roots(self, starting_path, tree_kwargs, capfd):
+        """Estimates and their variances add up across roots."""
+        tree_kwargs["paths"] = (
+            str(starting_path),
+            str(starting_path),
+            str(starting_path / "a_file"),
+        )
+        tree_kwargs.update(
+            count_each_root=True,  # Otherwise the same path is done once.
+            estimate=Budget(seconds=None, calls=12),
+        )
+        with mock.patch.object(
+            backends.LocalBackend,
+            "lstat",
+            autospec=True,
+            side_effect=FileNotFoundError,
+        ):
+            Tree(**tree_kwargs)
+        assert capfd.readouterr().out == (
+            "~4 ± ? directories, ~9 ± 0 files, ~2 ± ? broken links, "
+            "~2 ± 0 file links, ~2 ± 0 directory links, ~0 ± 0 bytes, "
+            "4 samples\n"
+        )
+
+    @pytest.mark.parametrize("hung, calls, options, expectation", [
+        ("a_dir", ("listdir", "scandir"), {}, """\
+starting_path
+├―― a_dir [timed out]
+├―― a_file
+├―― b_file
+├―― broken_link
+└―― c_file
+1 directory, 3 files, 1 broken link, 1 timeout
+"""),
+        ("a_dir", ("stat",), {"list_only_dirs": True}, """\
+starting_path
+└―― a_dir [timed out]
+1 directory, 1 timeout
+"""),
+        ("a_dir/a_file", ("stat",), {"size": True}, """\
+4096 starting_path
+├―― 4096 a_dir
+│   ├――    ? a_file [timed out]
+│   ├――    0 b_file
+│   └―― 4096 c_dir
+├――    0 a_file
+├――    0 b_file
+├――    ? broken_link
+└――    0 c_file
+2 directories, 4 files, 1 directory link, 1 broken link, 1 timeout
+"""),
+        ("a_dir/c_dir", ("stat",), {"list_only_dirs": True}, """\
+starting_path
+└―― a_dir
+    └―― c_dir [timed out]
+2 directories, 1 timeout
+"""),
+        (".", ("stat",), {}, "1 timeout\n"),
+    ])
+    def test_dir_timeout(
+        self,
+        hung,
+        calls,
+        options,
+        expectation,
+        run_hung,
+        starting_path,
+        tree_kwargs,
+    ):
+        """Hung calls are given up on; the rest of the tree is listed."""
+        tree_kwargs.update(options)
+        expectation = expectation.replace(
+            "4096",
+            str(os.stat(starting_path).st_size).rjust(4),
+        )
+        hung = os.path.normpath(starting_path / hung)
+        assert run_hung(hung, calls, tree_kwargs) == (
+            f"{expectation}timed out: {hung}\n"
+        )
+
+    @pytest.mark.parametrize("hung, calls, expectation", [
+        ("a_dir", ("scandir",), "1 directory, 3 files, 1 broken link, "),
+        ("a_dir/a_file", ("stat",), "2 directories, 3 files, 1 broken link, "),
+        (".", ("stat",), ""),
+        (".", ("lstat",), ""),
+    ])
+    def test_dir_timeout_count_only(
+        self,
+        hung,
+        calls,
+        expectation,
+        run_hung,
+        starting_path,
+        tree_kwargs,
+    ):
+        """A hung call skips the directory being scanned."""
+        tree_kwargs["count_only"] = True
+        hung = os.path.normpath(starting_path / hung)
+        assert run_hung(hung, calls, tree_kwargs) == (
+            f"{expectation}1 timeout\ntimed out: {hung}\n"
+        )
+
+    @pytest.mark.parametrize("hung, calls, expectation", [
+        (
+            "a_dir",
+            ("scandir",),
+            "2 directories, 3 files, 1 broken link, 14 bytes, ",
+        ),
+        (".", ("lstat",), ""),
+    ])
+    def test_dir_timeout_estimate(
+        self,
+        hung,
+        calls,
+        expectation,
+        run_hung,
+        starting_path,
+        tree_kwargs,
+    ):
+        tree_kwargs["estimate"] = Budget(seconds=None, calls=10**6)
+        hung = os.path.normpath(starting_path / hung)
+        assert run_hung(hung, calls, tree_kwargs) == (
+            f"{expectation}1 timeout\ntimed out: {hung}\n"
+        )
+
     @mock.patch.object(main, "Tree", autospec=True)
     def test_main(self, mock_tree, tree_kwargs):
         main.main(**tree_kwargs)
@@ -567,6 +1030,101 @@ starting_path
 2 directories, 2 directory links
 """
 
+    def test_count_only_links(
+        self,
+        nested_link_recursion,
+        starting_path,
+        tree_kwargs,
+        capfd,
+    ):
+        """Links are counted like _register_path counts them."""
+        (starting_path / "file").touch()
+        (starting_path / "to_file").symlink_to("file")
+        tree_kwargs.update({
+            "count_only": True,
+            "follow_links": True,
+            "paths": (
+                str(starting_path / "egg" / "chicken"),
+                str(starting_path / "to_file"),
+            ),
+        })
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == "3 directory links, 1 file link\n"
+
+    @pytest.mark.usefixtures("simple_tree")
+    @pytest.mark.parametrize("count_only", [False, True])
+    @pytest.mark.parametrize("max_entries, rows, summary", [
+        (1, ["starting_path"], "1 directory, stopped at 1 entry"),
+        (
+            2,
+            ["starting_path", "├―― a_dir"],
+            "2 directories, stopped at 2 entries",
+        ),
+        (
+            3,
+            ["starting_path", "├―― a_dir", "│   ├―― a_file"],
+            "2 directories, 1 file link, stopped at 3 entries",
+        ),
+    ])
+    def test_max_entries(
+        self,
+        count_only,
+        max_entries,
+        rows,
+        summary,
+        starting_path,
+        tree_kwargs,
+        capfd,
+    ):
+        """Nothing past the last entry is listed, and the summary says so."""
+        tree_kwargs.update({
+            "count_only": count_only,
+            "max_entries": max_entries,
+        })
+        with mock.patch.object(
+            Tree,
+            "_ls",
+            autospec=True,
+            side_effect=Tree._ls,
+        ) as mock_ls:
+            Tree(**tree_kwargs)
+        if count_only:
+            rows = []
+        else:
+            assert mock_ls.call_count == max_entries - 1
+        assert capfd.readouterr().out.splitlines() == rows + [summary]
+
+    @pytest.mark.usefixtures("simple_tree")
+    def test_max_entries_enough(self, tree_kwargs, capfd):
+        tree_kwargs["max_entries"] = 9
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out.splitlines()[-1] == (
+            "2 directories, 1 file link, 1 directory link, 3 files, "
+            "1 broken link"
+        )
+
+    def test_broken_pipe(self, tree_kwargs):
+        """Listing stops when the output's reader goes away."""
+        tree_kwargs["checksum"] = "sha256"
+        with mock.patch.object(
+            Tree,
+            "_write",
+            autospec=True,
+            side_effect=BrokenPipeError,
+        ), mock.patch.object(
+            main.Checksums,
+            "close",
+            autospec=True,
+        ) as mock_close, mock.patch.object(
+            Tree,
+            "_ls",
+            autospec=True,
+        ) as mock_ls:
+            with pytest.raises(BrokenPipeError):
+                Tree(**tree_kwargs)
+        mock_close.assert_called_once()
+        mock_ls.assert_called_once()
+
     @pytest.mark.usefixtures("mock_run")
     def test_nested_details(
         self,
@@ -584,3 +1142,739 @@ starting_path
             Tree.dir_attrs,
             ["..."],
         )
+
+
+@pytest.fixture
+def sortable_tree(make_path):
+    """Names that each sort order puts differently."""
+    for name, size in (
+        ("img10.png", 10000),
+        ("img9.png", 30000),
+        ("IMG2.png", 20000),
+    ):
+        make_path(name=name, kind="file").write_bytes(b"x" * size)
+    make_path(name="z_dir", kind="dir")
+    make_path(name="y_link", kind="link", src="z_dir")
+    make_path(name="broken", kind="link", src="does/not/exist")
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("sortable_tree")
+class TestSort:
+    ORDERS = {
+        None: [
+            "broken", "img10.png", "IMG2.png", "img9.png", "y_link", "z_dir",
+        ],
+        "name": [
+            "broken", "img10.png", "IMG2.png", "img9.png", "y_link", "z_dir",
+        ],
+        "size": [
+            "img9.png", "IMG2.png", "img10.png", "y_link", "z_dir", "broken",
+        ],
+        "version": [
+            "broken", "IMG2.png", "img9.png", "img10.png", "y_link", "z_dir",
+        ],
+    }
+
+    @pytest.mark.parametrize("dirs_first", [False, True])
+    @pytest.mark.parametrize("reverse", [False, True])
+    @pytest.mark.parametrize("sort", [None, "name", "none", "size", "version"])
+    def test_ls(self, sort, reverse, dirs_first, starting_path, tree_kwargs):
+        tree_kwargs.update({
+            "dirs_first": dirs_first,
+            "reverse": reverse,
+            "sort": sort,
+        })
+        if sort == "none":
+            expectation = os.listdir(starting_path)
+        else:
+            expectation = list(self.ORDERS[sort])
+        if reverse:
+            expectation.reverse()
+        if dirs_first:
+            expectation.sort(key=lambda name: name not in ("y_link", "z_dir"))
+        assert Tree(**tree_kwargs)._ls(starting_path) == expectation
+
+    def test_time_overrides_sort(self, starting_path, tree_kwargs):
+        tree_kwargs.update({"sort": "size", "time": True})
+        tree = Tree(**tree_kwargs)
+        assert tree._walker.sort_by == "mtime"
+
+    @pytest.mark.usefixtures("no_statx")
+    def test_type_from_listing(self, starting_path, tree_kwargs):
+        """Only links are stat()ed to tell directories from files."""
+        tree_kwargs["dirs_first"] = True
+        tree = Tree(**tree_kwargs)
+        with mock.patch.object(
+            backends.os.path,
+            "isdir",
+            autospec=True,
+            side_effect=os.path.isdir,
+        ) as mock_isdir:
+            tree._ls(starting_path)
+        assert sorted(
+            os.path.basename(call.args[0])
+            for call in mock_isdir.call_args_list
+        ) == ["broken", "y_link"]
+
+
+class TestPredicates:
+    OLD = datetime(2020, 1, 1).timestamp()
+
+    @pytest.fixture(autouse=True)
+    def aged_tree(self, make_path):
+        old = make_path(name="old", kind="dir")
+        (old / "old.txt").write_text("x" * 10)
+        os.utime(old / "old.txt", (self.OLD, self.OLD))
+        new = make_path(name="new", kind="dir")
+        (new / "new.txt").write_text("x" * 2000)
+        make_path(name=new / "sub", kind="dir")
+        make_path(name="empty", kind="dir")
+        make_path(name="link", kind="link", src="new")
+        make_path(name="broken", kind="link", src="nowhere")
+
+    def rows(self, tree_kwargs, capfd, **options):
+        tree_kwargs.update(options, no_color=True, indent=2)
+        Tree(**tree_kwargs)
+        return capfd.readouterr().out.splitlines()[1:]
+
+    @pytest.mark.parametrize("options, expectation", [
+        (
+            {},
+            [
+                "├ broken",
+                "├ empty",
+                "├ link",
+                "├ new",
+                "│ ├ new.txt",
+                "│ └ sub",
+                "└ old",
+                "  └ old.txt",
+                "4 directories, 1 broken link, 1 directory link, 2 files",
+            ],
+        ),
+        (
+            {"newer": OLD + 1},
+            [
+                "├ empty",
+                "├ link",
+                "├ new",
+                "│ ├ new.txt",
+                "│ └ sub",
+                "└ old",
+                "4 directories, 1 directory link, 1 file",
+            ],
+        ),
+        (
+            {"newer": OLD + 1, "prune": True},
+            [
+                "├ link",
+                "└ new",
+                "  └ new.txt",
+                "1 directory, 1 directory link, 1 file",
+            ],
+        ),
+        (
+            {"older": OLD + 1, "prune": True},
+            ["└ old", "  └ old.txt", "2 directories, 1 file"],
+        ),
+        (
+            {"min_size": 1024, "prune": True},
+            [
+                "├ link",
+                "└ new",
+                "  └ new.txt",
+                "1 directory, 1 directory link, 1 file",
+            ],
+        ),
+        (
+            {"owner": os.getuid() + 1},
+            ["├ empty", "├ new", "│ └ sub", "└ old", "5 directories"],
+        ),
+        (
+            {"prune": True},
+            [
+                "├ broken",
+                "├ link",
+                "├ new",
+                "│ └ new.txt",
+                "└ old",
+                "  └ old.txt",
+                "2 directories, 1 broken link, 1 directory link, 2 files",
+            ],
+        ),
+    ])
+    def test_rows(self, options, expectation, tree_kwargs, capfd):
+        assert self.rows(tree_kwargs, capfd, **options) == expectation
+        tree_kwargs["count_only"] = True
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out.splitlines()[-1] == expectation[-1]
+
+    def test_stats_kept(self, starting_path, tree_kwargs):
+        """The stats taken to filter are used for printing, then dropped."""
+        tree_kwargs.update({"paths": (), "newer": self.OLD + 1})
+        tree = Tree(**tree_kwargs)
+        new, old = starting_path / "new", starting_path / "old"
+        assert tree._ls(str(new)) == ["new.txt", "sub"]
+        assert tree._walker.kept(str(new / "new.txt"))
+        assert tree._ls(str(old)) == []
+        assert tree._walker.kept(str(old / "old.txt")) is None
+
+    def test_prune_stops_early(self, starting_path, tree_kwargs):
+        """--prune looks through a directory up to the first match, once."""
+        inner = starting_path / "deep" / "inner"
+        inner.mkdir(parents=True)
+        for index in range(3):
+            (inner / f"more_{index}").touch()
+        tree_kwargs.update({"paths": (), "prune": True})
+        tree = Tree(**tree_kwargs)
+        with mock.patch.object(
+            Tree,
+            "_keeps",
+            autospec=True,
+            side_effect=Tree._keeps,
+        ) as mock_keeps:
+            assert tree._has_match(str(starting_path / "deep"))
+            assert tree._has_match(str(inner))
+        assert mock_keeps.call_count == 2  # inner, then one of its files.
+        assert tree._matches == {}  # Asked for, so dropped.
+
+    def test_prune_drops_branches(self, starting_path, tree_kwargs):
+        """What's kept for pruned branches, or once it's asked for, goes."""
+        tree_kwargs.update({"prune": True, "newer": self.OLD + 1})
+        assert Tree(**tree_kwargs)._matches == {}
+        tree_kwargs["paths"] = ()
+        tree = Tree(**tree_kwargs)
+        assert not tree._has_match(str(starting_path / "old"))
+        assert tree._matches == {}
+
+    def test_prune_threads(self, starting_path, tree_kwargs):
+        """What one thread is looking through isn't empty for another."""
+        tree_kwargs.update({"paths": (), "prune": True, "follow_links": True})
+        tree = Tree(**tree_kwargs)
+        new = str(starting_path / "new")
+        scandir = backends.LocalBackend.scandir
+        answers = []
+
+        def scan(backend, path):
+            if path == new and not answers:
+                answers.append(None)
+                thread = threading.Thread(target=lambda: answers.append(
+                    tree._has_match(str(starting_path / "link")),
+                ))
+                thread.start()
+                thread.join()
+            return scandir(backend, path)
+
+        with mock.patch.object(
+            backends.LocalBackend,
+            "scandir",
+            autospec=True,
+            side_effect=scan,
+        ):
+            assert tree._has_match(new)
+        assert answers == [None, True]
+
+    def test_prune_loops(self, nested_link_recursion, tree_kwargs, capfd):
+        """Directories with nothing but links back up are left out."""
+        rows = self.rows(tree_kwargs, capfd, follow_links=True, prune=True)
+        assert not {"├ chicken", "├ egg"} & set(rows)
+        assert "│ └ new.txt" in rows
+
+    def test_prune_unlistable(self, starting_path, tree_kwargs, capfd):
+        scandir = backends.LocalBackend.scandir
+
+        def fail_new(backend, path):
+            if path.endswith("new"):
+                raise PermissionError(13, "Permission denied")
+            return scandir(backend, path)
+
+        with mock.patch.object(
+            backends.LocalBackend,
+            "scandir",
+            autospec=True,
+            side_effect=fail_new,
+        ):
+            rows = self.rows(tree_kwargs, capfd, prune=True)
+        assert rows[:3] == ["├ broken", "├ link", "└ old"]
+
+    def test_prune_mount_points(self, starting_path, tree_kwargs, capfd):
+        new = os.stat(starting_path / "new")
+        with mock.patch.object(
+            Tree,
+            "_mount_skip",
+            autospec=True,
+            side_effect=lambda tree, stats: (
+                "mount point" if stats.st_ino == new.st_ino else None
+            ),
+        ):
+            rows = self.rows(
+                tree_kwargs,
+                capfd,
+                one_file_system=True,
+                prune=True,
+            )
+        assert rows[:3] == ["├ broken", "├ link", "└ old"]
+
+
+class TestOverlappingPaths:
+    @pytest.fixture(autouse=True)
+    def nested(self, make_path):
+        make_path(name="a/b/c", kind="dir")
+        make_path(name="a/f", kind="file")
+        make_path(name="a/b/g", kind="file")
+        make_path(name="a/b/c/h", kind="file")
+
+    def output(self, paths, starting_path, tree_kwargs, capfd, **options):
+        tree_kwargs.update(
+            options,
+            no_color=True,
+            paths=tuple(str(starting_path / path) for path in paths),
+        )
+        Tree(**tree_kwargs)
+        return capfd.readouterr().out
+
+    @pytest.mark.parametrize("paths", [
+        ("a", "a/b"),
+        ("a/b", "a"),
+        ("a", "a"),
+        ("a/b/c", "a/b", "a"),
+        ("a/b/../b", "a/b/c", "a"),
+    ])
+    @pytest.mark.parametrize("options", [
+        {},
+        {"size": True},
+        {"align_lookahead": 5, "size": True},
+    ])
+    def test_rows(self, paths, options, starting_path, tree_kwargs, capfd):
+        """Each path's rows are what it prints on its own."""
+        expectation = "".join(
+            self.output(
+                (path,), starting_path, tree_kwargs, capfd, report=False,
+                **options,
+            )
+            for path in paths
+        )
+        with mock.patch.object(
+            main.Walker,
+            "ls",
+            autospec=True,
+            side_effect=main.Walker.ls,
+        ) as mock_ls:
+            output = self.output(
+                paths, starting_path, tree_kwargs, capfd, report=True,
+                **options,
+            )
+        assert output.startswith(expectation.rstrip("\n"))
+        assert output.rstrip("\n").endswith("3 directories, 3 files")
+        listed = [call.args[1] for call in mock_ls.call_args_list]
+        assert len(listed) == len(set(map(os.path.realpath, listed))) == 3
+
+    def test_count_each_root(self, starting_path, tree_kwargs, capfd):
+        output = self.output(
+            ("a", "a/b"),
+            starting_path,
+            tree_kwargs,
+            capfd,
+            count_each_root=True,
+            inodes=True,
+        )
+        assert output.endswith(
+            "4 directories, 5 files, 9 unique inodes\n",
+        )
+
+    def test_separate(self, starting_path, tree_kwargs):
+        tree_kwargs["paths"] = tuple(
+            str(starting_path / path) for path in ("a/b", "a/f", "missing")
+        )
+        tree = Tree(**tree_kwargs)
+        assert not tree._shared
+        assert not tree._recorded
+
+    @pytest.mark.parametrize("count_each_root, skipped", [
+        (False, 1),
+        (True, 3),
+    ])
+    def test_mount_points(
+        self,
+        count_each_root,
+        skipped,
+        starting_path,
+        tree_kwargs,
+        capfd,
+    ):
+        c = os.stat(starting_path / "a/b/c")
+        with mock.patch.object(
+            Tree,
+            "_mount_skip",
+            autospec=True,
+            side_effect=lambda tree, stats: (
+                "mount point" if stats.st_ino == c.st_ino else None
+            ),
+        ):
+            output = self.output(
+                ("a", "a", "a"),
+                starting_path,
+                tree_kwargs,
+                capfd,
+                count_each_root=count_each_root,
+                one_file_system=True,
+            )
+        assert output.count("c [mount point]") == 3
+        assert f"{skipped} skipped mount point" in output
+
+    def test_max_entries(self, starting_path, tree_kwargs, capfd):
+        output = self.output(
+            ("a", "a"),
+            starting_path,
+            tree_kwargs,
+            capfd,
+            max_entries=8,
+        )
+        assert output.splitlines()[6:] == [
+            "a",
+            "├―― b",
+            "3 directories, 3 files, stopped at 8 entries",
+        ]
+
+    def test_progress(self, starting_path, tree_kwargs):
+        tree_kwargs.update({
+            "paths": (str(starting_path / "a"),) * 2,
+            "progress": True,
+        })
+        status = Progress(io.StringIO(), interval=60.0)
+        with mock.patch.object(
+            main,
+            "open_progress",
+            autospec=True,
+            return_value=status,
+        ):
+            Tree(**tree_kwargs)
+        assert status.entries == 12
+
+    @pytest.mark.parametrize("paths", [
+        ("a", "a/b"),
+        ("a/b", "a"),
+        ("a", "a"),
+        ("a/b/c", "a/b", "a"),
+    ])
+    @pytest.mark.parametrize("options", [
+        {},
+        {"count_each_root": True, "inodes": True},
+        {"count_each_root": True, "summary_by": ("depth",)},
+    ])
+    def test_count_only(
+        self, paths, options, starting_path, tree_kwargs, capfd,
+    ):
+        """The totals are what printing the rows counts, listing each once."""
+        output = self.output(
+            paths, starting_path, tree_kwargs, capfd, **options,
+        )
+        with mock.patch.object(
+            main.Walker,
+            "scan",
+            autospec=True,
+            side_effect=main.Walker.scan,
+        ) as mock_scan:
+            counted = self.output(
+                paths, starting_path, tree_kwargs, capfd, count_only=True,
+                **options,
+            )
+        assert output.endswith(counted)
+        listed = [call.args[1] for call in mock_scan.call_args_list]
+        assert len(listed) == len(set(map(os.path.realpath, listed))) == 3
+
+    @pytest.mark.parametrize("paths, options", [
+        (("a", "la"), {"follow_links": True}),
+        (("a", "la"), {"count_each_root": True}),
+        ((".", "la"), {"follow_links": True}),
+        ((".", "a"), {"count_each_root": True, "follow_links": True}),
+        (("la", "a"), {"follow_links": True}),
+        (("a", "la", "a/b"), {"count_each_root": True}),
+    ])
+    def test_count_only_links(
+        self, paths, options, make_path, starting_path, tree_kwargs, capfd,
+    ):
+        """Links to a path are only replayed where they're gone into."""
+        make_path(name="la", kind="link", src="a")
+        output = self.output(
+            paths, starting_path, tree_kwargs, capfd, **options,
+        )
+        counted = self.output(
+            paths, starting_path, tree_kwargs, capfd, count_only=True,
+            **options,
+        )
+        assert output.endswith(counted)
+        assert "directory link" in counted
+
+    def test_entered_timeout(self, starting_path, tree_kwargs):
+        tree_kwargs["paths"] = (str(starting_path / "a"),) * 2
+        tree = Tree(**tree_kwargs)
+        with mock.patch.object(
+            backends.LocalBackend,
+            "isdir",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            assert tree._entered_shared_key(tree_kwargs["paths"][0]) is None
+
+    @pytest.mark.parametrize("count_each_root, expectation", [
+        (False, "3 directories, 3 files"),
+        (True, "5 directories, 5 files"),
+    ])
+    def test_count_only_relative(
+        self,
+        count_each_root,
+        expectation,
+        starting_path,
+        tree_kwargs,
+        capfd,
+        monkeypatch,
+    ):
+        """Where a relative path is beneath another is found all the same."""
+        monkeypatch.chdir(starting_path)
+        tree_kwargs.update(
+            count_each_root=count_each_root,
+            count_only=True,
+            paths=("a", "a/b"),
+        )
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == f"{expectation}\n"
+
+    @pytest.mark.parametrize("paths", [
+        ("a", "a/b"),
+        ("a/b", "a"),
+        ("a", "a"),
+        ("a/b/c", "a/b", "a"),
+    ])
+    def test_estimate(self, paths, starting_path, tree_kwargs, capfd):
+        """Beneath a path estimated already, nothing's estimated again."""
+        with mock.patch.object(
+            main.Walker,
+            "scan",
+            autospec=True,
+            side_effect=main.Walker.scan,
+        ) as mock_scan:
+            output = self.output(
+                paths, starting_path, tree_kwargs, capfd,
+                estimate=Budget(seconds=None, calls=10**6),
+            )
+        assert output == "3 directories, 3 files, 0 bytes\n"
+        listed = [call.args[1] for call in mock_scan.call_args_list]
+        assert len(listed) == len(set(map(os.path.realpath, listed))) == 3
+
+    def test_estimate_each_root(self, starting_path, tree_kwargs, capfd):
+        output = self.output(
+            ("a", "a/b"), starting_path, tree_kwargs, capfd,
+            count_each_root=True,
+            estimate=Budget(seconds=None, calls=10**6),
+        )
+        assert output == "5 directories, 5 files, 0 bytes\n"
+
+
+class TestBytesPaths:
+    @pytest.fixture(autouse=True)
+    def tree(self, make_path):
+        make_path(name="a_dir", kind="dir")
+        make_path(name="a_dir/.hidden", kind="file")
+        make_path(name="a_dir/b.png", kind="file")
+        make_path(name="a_dir/c", kind="file")
+        make_path(name="link", kind="link", src="a_dir")
+
+    def rows(self, tree_kwargs, capfd, **options):
+        tree_kwargs.update(options, indent=2)
+        Tree(**tree_kwargs)
+        return capfd.readouterr().out.splitlines()
+
+    @pytest.mark.parametrize("options", [
+        {},
+        {"follow_links": True, "list_hidden": True},
+        {"full_path": True, "dirs_first": True},
+        {"size": True, "sort": "size"},
+        {"sort": "version", "reverse": True},
+        {"prune": True},
+        {"count_only": True},
+        {"force_color": True},
+    ])
+    def test_same_rows(self, options, tree_kwargs, capfd, monkeypatch):
+        """Names print the same as when they're listed as str."""
+        monkeypatch.setenv("LS_COLORS", "di=01;34:*.png=01;35")
+        tree_kwargs["no_color"] = True
+        expectation = self.rows(tree_kwargs, capfd, **options)
+        assert self.rows(tree_kwargs, capfd, bytes_paths=True) == expectation
+
+    def test_bytes_inside(self, starting_path, tree_kwargs):
+        tree_kwargs.update({"bytes_paths": True, "paths": ()})
+        tree = Tree(**tree_kwargs)
+        tree._list_root(str(starting_path))
+        path = os.fsencode(starting_path / "a_dir")
+        assert tree._inside(path, isdir=True, islink=False) == [b"b.png", b"c"]
+
+    @pytest.mark.parametrize("undecodable, expectation", [
+        ("escape", "├ caf\\xe9"),
+        ("replace", "├ caf�"),
+    ])
+    def test_undecodable(
+        self, undecodable, expectation, starting_path, tree_kwargs, capfd,
+    ):
+        (starting_path / os.fsdecode(b"caf\xe9")).touch()
+        rows = self.rows(
+            tree_kwargs,
+            capfd,
+            bytes_paths=True,
+            no_color=True,
+            undecodable=undecodable,
+        )
+        assert rows[4] == expectation
+
+    def test_raw(self, starting_path, tree_kwargs, capsysbinary):
+        """Raw names are written out as their bytes."""
+        (starting_path / os.fsdecode(b"caf\xe9")).touch()
+        tree_kwargs.update(
+            bytes_paths=True,
+            no_color=True,
+            undecodable="raw",
+        )
+        main.main(**tree_kwargs)
+        assert b"\xe2\x94\x9c\xe2\x80\x95\xe2\x80\x95 caf\xe9\n" in (
+            capsysbinary.readouterr().out
+        )
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures("simple_tree")
+class TestDirFds:
+    @pytest.mark.parametrize("options", [
+        {},
+        {"follow_links": True, "permissions": True, "size": True},
+        {"count_only": True},
+        {"bytes_paths": True, "inodes": True, "sort": "mtime"},
+    ])
+    def test_same_output(self, options, tree_kwargs, capfd):
+        """What's listed is what's listed by full paths."""
+        tree_kwargs.update(options)
+        Tree(**tree_kwargs)
+        expectation = capfd.readouterr().out
+        tree_kwargs["dir_fds"] = 2
+        with mock.patch.object(
+            DirFds,
+            "close",
+            autospec=True,
+            side_effect=DirFds.close,
+        ) as mock_close:
+            Tree(**tree_kwargs)
+        assert capfd.readouterr().out == expectation
+        mock_close.assert_called_once()
+
+
+@pytest.mark.integration
+class TestSummaryBy:
+    MTIME = datetime(2000, 1, 1, 12).timestamp()
+
+    @pytest.fixture(autouse=True)
+    def tree(self, make_path, starting_path):
+        make_path(name="d", kind="dir")
+        for name, size in (("a.PY", 3), ("b.py", 2), ("c", 1), ("d/e.txt", 4)):
+            make_path(name=name, kind="file").write_bytes(b"x" * size)
+        make_path(name="d/link", kind="link", src="../a.PY")
+        make_path(name="broken", kind="link", src="missing")
+        for path in (starting_path, *starting_path.rglob("*")):
+            os.utime(path, (self.MTIME, self.MTIME), follow_symlinks=False)
+
+    def output(self, tree_kwargs, capfd, **options):
+        tree_kwargs.update(options, no_color=True)
+        Tree(**tree_kwargs)
+        return capfd.readouterr().out
+
+    def test_ext(self, tree_kwargs, capfd):
+        output = self.output(
+            tree_kwargs, capfd, count_only=True, report=False,
+            summary_by=("ext",),
+        )
+        assert output == (
+            "ext     entries  size  newest\n"
+            ".py           2     5  Jan  1  2000\n"
+            ".txt          1     4  Jan  1  2000\n"
+            "(none)        2     1  Jan  1  2000\n"
+        )
+
+    def test_depth_and_type(self, tree_kwargs, capfd):
+        output = self.output(
+            tree_kwargs, capfd, summary_by=("depth", "type"), summary_top=2,
+        )
+        assert output.endswith(
+            "depth     entries  size  newest\n"
+            "1               5     6  Jan  1  2000\n"
+            "2               2     4  Jan  1  2000\n"
+            "(others)        1     0  Jan  1  2000\n"
+            "type         entries  size  newest\n"
+            "files              4    10  Jan  1  2000\n"
+            "directories        2     0  Jan  1  2000\n"
+            "(others)           2     0  Jan  1  2000\n"
+        )
+
+    def test_owner(self, tree_kwargs, capfd):
+        output = self.output(
+            tree_kwargs, capfd, count_only=True, report=False,
+            summary_by=("owner",), nice_size=True,
+        )
+        assert [row.split() for row in output.splitlines()[1:]] == [
+            [main._user_name(os.getuid()), "8", "10.0", "Jan", "1", "2000"],
+        ]
+        with mock.patch.object(main, "_user_name", return_value=None):
+            output = self.output(tree_kwargs, capfd)
+        assert output.splitlines()[1].startswith(f"{os.getuid()} ")
+
+    @pytest.mark.parametrize("options", [
+        {},
+        {"size": True, "sort": "size"},
+        {"follow_links": True},
+        {"bytes_paths": True},
+        {"list_hidden": True, "inodes": True},
+    ])
+    def test_same_totals(self, options, tree_kwargs, capfd):
+        """The totals are the same whether the rows are printed or not."""
+        tree_kwargs["summary_by"] = ("ext", "owner", "depth", "type")
+        output = self.output(tree_kwargs, capfd, **options)
+        counted = self.output(tree_kwargs, capfd, count_only=True)
+        assert output.endswith(counted)
+        assert len(counted.splitlines()) == 16
+
+    @pytest.mark.parametrize("count_each_root, expectation", [
+        (False, [["1", "5", "6"], ["2", "2", "4"], ["0", "1", "0"]]),
+        (True, [["1", "7", "10"], ["2", "2", "4"], ["0", "1", "0"]]),
+    ])
+    def test_overlapping_paths(
+        self, count_each_root, expectation, starting_path, tree_kwargs, capfd,
+    ):
+        """Replays are only added again with --count-each-root, shifted."""
+        output = self.output(
+            tree_kwargs, capfd, report=False, summary_by=("depth",),
+            count_each_root=count_each_root,
+            paths=(str(starting_path), str(starting_path / "d")),
+        )
+        rows = output.splitlines()[-3:]
+        assert [row.split()[:3] for row in rows] == expectation
+
+    def test_no_stats(self, starting_path, tree_kwargs, capfd):
+        """Paths gone before their stats are taken have no owner or mtime."""
+        with mock.patch.object(Tree, "_own_stats", return_value=None):
+            output = self.output(
+                tree_kwargs, capfd, report=False, summary_by=("owner", "type"),
+                paths=(str(starting_path / "c"),),
+            )
+        assert output.splitlines()[-3:] == [
+            "owner  entries  size  newest",
+            "type   entries  size  newest",
+            "files        1     0  -",
+        ]
+
+    def test_own_stats(self, starting_path, tree_kwargs):
+        tree_kwargs.update(paths=(), summary_by=("type",))
+        tree = Tree(**tree_kwargs)
+        tree._list_root(str(starting_path / "missing"))
+        broken = str(starting_path / "broken")
+        assert tree._own_stats(broken, "broken links").st_mtime == self.MTIME
+        gone = str(starting_path / "gone")
+        assert tree._own_stats(gone, "broken links") is None
+        assert tree._own_stats(gone, "files") is None
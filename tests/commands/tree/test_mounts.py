@@ -0,0 +1,152 @@
+import os
+import pytest
+import stat
+from unittest import mock
+
+from ccli.commands.tree import main, mounts
+from ccli.commands.tree.backends import MemoryBackend, make_stats
+from ccli.commands.tree.main import Tree
+
+MOUNTINFO = """\
+22 1 8:1 / / rw,relatime shared:1 - ext4 /dev/sda1 rw
+23 22 0:21 / /proc rw,nosuid shared:5 - proc proc rw
+24 22 0:45 / /mnt/my\\040share rw - nfs4 server:/export rw,vers=4.2
+25 22 0:46 / /home/me/remote rw master:3 - fuse.sshfs me@host: rw
+bogus line
+"""
+
+
+@pytest.fixture
+def mountinfo(tmp_path):
+    path = tmp_path / "mountinfo"
+    path.write_text(MOUNTINFO)
+    return path
+
+
+def test_parse_mountinfo():
+    assert list(mounts.parse_mountinfo(MOUNTINFO)) == [
+        (os.makedev(8, 1), "/", "ext4"),
+        (os.makedev(0, 21), "/proc", "proc"),
+        (os.makedev(0, 45), "/mnt/my share", "nfs4"),
+        (os.makedev(0, 46), "/home/me/remote", "fuse.sshfs"),
+    ]
+
+
+@pytest.mark.parametrize("fstypes, expectation", [
+    ((), {}),
+    (("nfs",), {}),
+    (("nfs4", "proc"), {
+        os.makedev(0, 21): "proc",
+        os.makedev(0, 45): "nfs4",
+    }),
+    (("fuse",), {os.makedev(0, 46): "fuse.sshfs"}),
+])
+def test_devices(fstypes, expectation, mountinfo):
+    assert mounts.devices(fstypes, mountinfo=mountinfo) == expectation
+
+
+def test_devices_without_mountinfo(tmp_path):
+    assert mounts.devices(("proc",), mountinfo=tmp_path / "missing") == {}
+
+
+@pytest.fixture
+def memory():
+    """root
+    ├―― a_dir
+    │   └―― file
+    ├―― mnt (another filesystem)
+    │   └―― file
+    ├―― nfs (an nfs4 mount)
+    │   └―― file
+    └―― to_mnt -> mnt
+    """
+    memory = MemoryBackend("root")
+    for name, dev in (("a_dir", 0), ("mnt", 5), ("nfs", 7)):
+        memory.add(name, make_stats(
+            mode=stat.S_IFDIR | 0o755,
+            ino=10 + dev,
+            dev=dev,
+        ))
+        memory.add(f"{name}/file", make_stats(
+            mode=stat.S_IFREG | 0o644,
+            ino=20 + dev,
+            dev=dev,
+        ))
+    memory.add(
+        "to_mnt",
+        make_stats(mode=stat.S_IFLNK | 0o777, ino=30),
+        target="mnt",
+    )
+    with mock.patch.object(main, "open_backend", return_value=memory):
+        with mock.patch.object(
+            main,
+            "devices",
+            side_effect=lambda fstypes: {7: "nfs4"} if fstypes else {},
+        ):
+            yield memory
+
+
+class TestTree:
+    @pytest.mark.parametrize("options, expectation", [
+        ({}, """\
+root
+├―― a_dir
+│   └―― file
+├―― mnt
+│   └―― file
+├―― nfs
+│   └―― file
+└―― to_mnt
+4 directories, 3 files, 1 directory link
+"""),
+        ({"one_file_system": True}, """\
+root
+├―― a_dir
+│   └―― file
+├―― mnt [mount point]
+├―― nfs [mount point]
+└―― to_mnt
+4 directories, 1 file, 2 skipped mount points, 1 directory link
+"""),
+        ({"one_file_system": True, "skip_fs_types": ("nfs4",)}, """\
+root
+├―― a_dir
+│   └―― file
+├―― mnt [mount point]
+├―― nfs [nfs4]
+└―― to_mnt
+4 directories, 1 file, 2 skipped mount points, 1 directory link
+"""),
+        ({"skip_fs_types": ("nfs4",), "follow_links": True}, """\
+root
+├―― a_dir
+│   └―― file
+├―― mnt
+│   └―― file
+├―― nfs [nfs4]
+└―― to_mnt
+    └―― ...
+4 directories, 2 files, 1 skipped mount point, 1 directory link
+"""),
+    ])
+    def test_tree(self, options, expectation, memory, tree_kwargs, capfd):
+        tree_kwargs.update(options)
+        tree_kwargs["paths"] = ("root",)
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == expectation
+        tree_kwargs["count_only"] = True
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == expectation.splitlines()[-1] + "\n"
+
+    def test_mounted_root(self, memory, tree_kwargs, capfd):
+        """Paths given on the command line are always entered."""
+        tree_kwargs.update({
+            "one_file_system": True,
+            "paths": ("root/mnt",),
+        })
+        Tree(**tree_kwargs)
+        assert capfd.readouterr().out == """\
+mnt
+└―― file
+1 directory, 1 file
+"""
@@ -0,0 +1,35 @@
+import io
+import pytest
+
+from ccli.commands.tree.names import decode, raw_output
+
+
+@pytest.mark.parametrize("undecodable, expectation", [
+    ("escape", "caf\\xe9/café"),
+    ("replace", "caf�/café"),
+    ("raw", "caf\udce9/café"),
+])
+def test_decode(undecodable, expectation):
+    name = b"caf\xe9/caf\xc3\xa9"
+    assert decode(name, undecodable) == expectation
+
+
+def test_decode_str():
+    assert decode("caf\udce9", "replace") == "caf\udce9"
+
+
+def test_raw_output():
+    buffer = io.BytesIO()
+    stream = io.TextIOWrapper(buffer, encoding="utf-8", errors="strict")
+    with raw_output(stream):
+        stream.write(decode(b"caf\xe9", "raw"))
+        stream.flush()
+    assert buffer.getvalue() == b"caf\xe9"
+    assert stream.errors == "strict"
+
+
+def test_raw_output_unconfigurable():
+    stream = io.StringIO()
+    with raw_output(stream):
+        stream.write(decode(b"caf\xe9", "raw"))
+    assert stream.getvalue() == "caf\udce9"
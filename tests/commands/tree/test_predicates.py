@@ -0,0 +1,83 @@
+import os
+import pytest
+from datetime import datetime
+from getpass import getuser
+from types import SimpleNamespace
+
+from ccli.commands.tree.predicates import (
+    Predicates,
+    parse_size,
+    parse_time,
+    parse_user,
+)
+
+
+@pytest.mark.parametrize("text, expectation", [
+    ("90s", 910.0),
+    ("1.5m", 910.0),
+    ("0h", 1000.0),
+    ("0d", 1000.0),
+    ("0w", 1000.0),
+    ("2024-05-01", datetime(2024, 5, 1).timestamp()),
+    ("2024-05-01T12:30", datetime(2024, 5, 1, 12, 30).timestamp()),
+])
+def test_parse_time(text, expectation):
+    assert parse_time(text, now=1000.0) == expectation
+
+
+@pytest.mark.parametrize("text", ["", "1y", "-1d", "yesterday"])
+def test_parse_time_invalid(text):
+    with pytest.raises(ValueError):
+        parse_time(text, now=1000.0)
+
+
+@pytest.mark.parametrize("text, expectation", [
+    ("0", 0),
+    ("100", 100),
+    ("2k", 2048),
+    ("1.5M", 1572864),
+    ("1G", 1024 ** 3),
+    ("1P", 1024 ** 5),
+])
+def test_parse_size(text, expectation):
+    assert parse_size(text) == expectation
+
+
+@pytest.mark.parametrize("text", ["", "M", "-1", "1Q", "1 K"])
+def test_parse_size_invalid(text):
+    with pytest.raises(ValueError):
+        parse_size(text)
+
+
+def test_parse_user():
+    assert parse_user(getuser()) == os.getuid()
+    assert parse_user("12345") == 12345
+    with pytest.raises(ValueError):
+        parse_user("no such user")
+
+
+STATS = SimpleNamespace(st_mtime=100.0, st_size=10, st_uid=1)
+
+
+@pytest.mark.parametrize("bounds, expectation", [
+    ({}, True),
+    ({"newer": 99.0}, True),
+    ({"newer": 100.0}, False),
+    ({"older": 101.0}, True),
+    ({"older": 100.0}, False),
+    ({"min_size": 10}, True),
+    ({"min_size": 11}, False),
+    ({"owner": 1}, True),
+    ({"owner": 0}, False),
+    ({"newer": 99.0, "min_size": 11}, False),
+])
+def test_matches(bounds, expectation):
+    predicates = Predicates(**bounds)
+    assert bool(predicates) is bool(bounds)
+    assert predicates.matches(STATS) is expectation
+
+
+def test_matches_missing():
+    """Broken links only match when nothing's checked."""
+    assert Predicates().matches(None)
+    assert not Predicates(min_size=0).matches(None)
@@ -0,0 +1,96 @@
+import io
+import pytest
+from unittest import mock
+
+from ccli.commands.tree import progress
+from ccli.commands.tree.progress import Progress, open_progress
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def stream():
+    return io.StringIO()
+
+
+@pytest.fixture(autouse=True)
+def columns(monkeypatch):
+    monkeypatch.setenv("COLUMNS", "61")
+
+
+class TestProgress:
+    def test_throttled(self, clock, stream):
+        status = Progress(stream, interval=1.0, clock=clock)
+        status.pending = 3
+        status.directory = "/a_dir"
+        status.tick()
+        assert stream.getvalue() == ""
+        clock.now += 2.0
+        status.tick()
+        assert stream.getvalue() == (
+            "\r2 entries (1/s), 3 pending, in /a_dir\033[K"
+        )
+        clock.now += 0.5
+        status.tick()
+        assert status.entries == 3
+        assert stream.getvalue().count("\r") == 1
+
+    def test_bytes(self, clock, stream):
+        status = Progress(stream, interval=0.0, clock=clock)
+        status.bytes = 12345
+        clock.now += 0.5
+        status.tick()
+        assert "1 entries (2/s), 0 pending, 12,345 bytes, in " in (
+            stream.getvalue()
+        )
+
+    def test_bytes_directory(self, clock, stream):
+        status = Progress(stream, interval=0.0, clock=clock)
+        status.directory = b"/caf\xe9"
+        clock.now += 1.0
+        status.tick()
+        assert stream.getvalue().endswith("in /caf\udce9\033[K")
+
+    def test_truncated(self, clock, stream):
+        status = Progress(stream, interval=0.0, clock=clock)
+        status.directory = "/" + "x" * 100
+        clock.now += 1.0
+        status.tick()
+        line = stream.getvalue()
+        assert len(line.removeprefix("\r").removesuffix("\033[K")) == 60
+
+    @pytest.mark.parametrize("drawn", [False, True])
+    def test_close(self, drawn, clock, stream):
+        status = Progress(stream, interval=1.0, clock=clock)
+        if drawn:
+            clock.now += 1.0
+            status.tick()
+        stream.truncate(0)
+        stream.seek(0)
+        status.close()
+        assert stream.getvalue() == ("\r\033[K" if drawn else "")
+
+
+@pytest.mark.parametrize("stderr, stdout, prints_rows, shown", [
+    (False, False, False, False),
+    (True, False, True, True),
+    (True, True, True, False),
+    (True, True, False, True),
+])
+def test_open_progress(stderr, stdout, prints_rows, shown):
+    with mock.patch.object(progress, "sys") as mock_sys:
+        mock_sys.stderr.isatty.return_value = stderr
+        mock_sys.stdout.isatty.return_value = stdout
+        status = open_progress(prints_rows=prints_rows)
+    assert (status is not None) is shown
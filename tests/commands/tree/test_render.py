@@ -0,0 +1,137 @@
+import pytest
+
+from ccli.commands.tree import render
+from ccli.commands.tree.render import (
+    HtmlRenderer,
+    MarkdownRenderer,
+    TextRenderer,
+    open_renderer,
+)
+
+
+def _body(html):
+    return html.split("<body>\n", 1)[1]
+
+
+@pytest.mark.parametrize("output_format, expectation", [
+    (None, TextRenderer),
+    ("text", TextRenderer),
+    ("html", HtmlRenderer),
+    ("markdown", MarkdownRenderer),
+])
+def test_open_renderer(output_format, expectation):
+    assert type(open_renderer(output_format)) is expectation
+
+
+def test_text(capfd):
+    renderer = TextRenderer(no_color=False, force_color=True)
+    renderer.write("a_dir", color="cyan", attrs=("bold",))
+    for call in (renderer.enter, renderer.leave, renderer.report):
+        call()
+    renderer.close()
+    assert capfd.readouterr().out == "\033[1m\033[36ma_dir\033[0m\n"
+
+
+class TestHtml:
+    def test_stylesheet(self, capfd):
+        HtmlRenderer()
+        out = capfd.readouterr().out
+        assert ".cyan { color: #00cdcd; }" in out
+        assert ".bold { font-weight: bold; }" in out
+
+    def test_nesting(self, capfd):
+        renderer = HtmlRenderer()
+        renderer.write("", color="yellow", end="")
+        renderer.write("4096", color="white", end=" ")
+        renderer.write("a<dir>", color="cyan", attrs=("bold",))
+        renderer.enter()
+        renderer.write("a&file")
+        renderer.write("b_dir", color="cyan", attrs=("bold",))
+        renderer.leave()
+        renderer.report()
+        renderer.write("1 file")
+        renderer.close()
+        assert _body(capfd.readouterr().out) == """\
+<ul>
+<li><details open><summary><span class="white">4096</span> \
+<span class="cyan bold">a&lt;dir&gt;</span></summary><ul>
+<li>a&amp;file</li>
+<li><span class="cyan bold">b_dir</span></li>
+</ul></details></li>
+</ul>
+<p>1 file</p>
+</body>
+</html>
+"""
+
+    def test_close_open(self, capfd):
+        """Directories left open are closed, even without a summary."""
+        renderer = HtmlRenderer()
+        renderer.write("a_dir")
+        renderer.enter()
+        renderer.write("b_dir")
+        renderer.enter()
+        renderer.close()
+        assert _body(capfd.readouterr().out) == """\
+<ul>
+<li><details open><summary>a_dir</summary><ul>
+<li><details open><summary>b_dir</summary><ul>
+</ul></details></li>
+</ul></details></li>
+</ul>
+</body>
+</html>
+"""
+
+
+class TestMarkdown:
+    def test_nesting(self, capfd):
+        renderer = MarkdownRenderer()
+        renderer.write("  12", color="white", end=" ")
+        renderer.write("a_dir", color="cyan", attrs=("bold",))
+        renderer.enter()
+        renderer.write("[link]", attrs=("underline", "dark"))
+        renderer.leave()
+        renderer.write("", end="")
+        renderer.write("*.txt")
+        renderer.report()
+        renderer.write("2 files")
+        renderer.close()
+        assert capfd.readouterr().out == """\
+-   12 **a\\_dir**
+  - *\\[link\\]*
+- \\*.txt
+
+2 files
+
+"""
+
+    @pytest.mark.parametrize("name, expectation", [
+        ("- a", "\\- a"),
+        ("+ a", "\\+ a"),
+        ("1. a", "1\\. a"),
+        ("12) a", "12\\) a"),
+        ("-", "\\-"),
+        ("-a", "-a"),
+        ("1.a", "1.a"),
+    ])
+    def test_list_markers(self, name, expectation, capfd):
+        """Names aren't taken for a nested list."""
+        renderer = MarkdownRenderer()
+        renderer.write("", end="")
+        renderer.write(name)
+        renderer.write("  12", end=" ")
+        renderer.write(name)
+        renderer.report()
+        renderer.write(name)
+        assert capfd.readouterr().out == (
+            f"- {expectation}\n-   12 {name}\n\n{expectation}\n\n"
+        )
+
+
+def test_stdout_swapped(monkeypatch, capsys):
+    """Output goes to whatever sys.stdout is at the time."""
+    renderer = MarkdownRenderer()
+    monkeypatch.setattr(render.sys, "stdout", render.sys.stderr)
+    renderer.write("a_file")
+    assert capsys.readouterr().err == "- a\\_file\n"
@@ -0,0 +1,217 @@
+import ctypes
+import os
+import pytest
+from types import SimpleNamespace
+from unittest import mock
+
+from ccli.commands.tree import main, statx
+from ccli.commands.tree.main import Tree
+from ccli.commands.tree.mounts import NETWORK_FSTYPES
+from ccli.commands.tree.statx import (
+    STATX_BASIC_STATS,
+    STATX_SIZE,
+    STATX_TYPE,
+    Statx,
+    open_statx,
+)
+
+pytestmark = pytest.mark.skipif(
+    statx._statx is None,
+    reason="statx isn't available here.",
+)
+
+_FIELDS = (
+    "st_mode",
+    "st_ino",
+    "st_dev",
+    "st_nlink",
+    "st_uid",
+    "st_gid",
+    "st_size",
+    "st_atime_ns",
+    "st_mtime_ns",
+    "st_ctime_ns",
+    "st_mtime",
+    "st_blksize",
+    "st_blocks",
+    "st_rdev",
+)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    (tmp_path / "a_file").write_bytes(b"12345")
+    (tmp_path / "a_dir").mkdir()
+    (tmp_path / "a_link").symlink_to("a_file")
+    (tmp_path / "broken_link").symlink_to("missing")
+    return tmp_path
+
+
+@pytest.fixture
+def mock_statx():
+    """Record the calls to statx, while still making them."""
+    with mock.patch.object(
+        statx,
+        "_statx",
+        side_effect=statx._statx,
+    ) as mock_statx:
+        yield mock_statx
+
+
+@pytest.mark.parametrize("name", ["a_file", "a_dir", "a_link"])
+def test_like_os(name, paths):
+    path = paths / name
+    for got, expected in [
+        (Statx().stat(path), os.stat(path)),
+        (Statx().lstat(path), os.lstat(path)),
+    ]:
+        for field in _FIELDS:
+            assert getattr(got, field) == getattr(expected, field), field
+
+
+@pytest.mark.parametrize("name, exists, isdir, islink", [
+    ("a_file", True, False, False),
+    ("a_dir", True, True, False),
+    ("a_link", True, False, True),
+    ("broken_link", False, False, True),
+    ("missing", False, False, False),
+    ("null\0byte", False, False, False),
+])
+def test_checks(name, exists, isdir, islink, paths):
+    path = os.path.join(paths, name)
+    assert Statx().exists(path) is exists
+    assert Statx().isdir(path) is isdir
+    assert Statx().islink(path) is islink
+
+
+def test_dir_fd(paths):
+    """Paths can be relative to an open directory, like os.stat's."""
+    fd = os.open(paths, os.O_RDONLY)
+    try:
+        assert Statx().stat("a_file", dir_fd=fd).st_size == 5
+        assert Statx().lstat("a_link", dir_fd=fd).st_ino == (
+            os.lstat(paths / "a_link").st_ino
+        )
+        assert Statx().isdir("a_dir", dir_fd=fd)
+        assert Statx().islink("a_link", dir_fd=fd)
+        assert not Statx().exists("broken_link", dir_fd=fd)
+    finally:
+        os.close(fd)
+
+
+def test_errors(paths):
+    with pytest.raises(FileNotFoundError) as info:
+        Statx().stat(paths / "broken_link")
+    assert info.value.filename == str(paths / "broken_link")
+    with pytest.raises(ValueError):
+        Statx().lstat("null\0byte")
+
+
+@pytest.mark.parametrize("sync, flags", [(True, 0), (False, 0x4000)])
+def test_mask(sync, flags, mock_statx, paths):
+    """Only the fields asked for (and the type) are asked for."""
+    stats = Statx(mask=STATX_SIZE, sync=sync)
+    assert stats.stat(paths / "a_file").st_size == 5
+    assert stats.isdir(paths / "a_dir")
+    [(_, _, stat_flags, stat_mask, _), (_, _, isdir_flags, isdir_mask, _)] = [
+        call.args for call in mock_statx.call_args_list
+    ]
+    assert (stat_flags, stat_mask) == (flags, STATX_SIZE | STATX_TYPE)
+    assert (isdir_flags, isdir_mask) == (flags, STATX_TYPE)
+
+
+def test_open_statx():
+    assert open_statx(STATX_SIZE).mask == STATX_SIZE | STATX_TYPE
+    with mock.patch.object(statx, "_statx", None):
+        assert open_statx() is None
+
+
+class TestLoad:
+    def test_linux(self):
+        assert statx._load() is not None
+
+    def test_other_platforms(self):
+        assert statx._load(platform="darwin") is None
+
+    def test_old_libc(self):
+        with mock.patch.object(
+            ctypes,
+            "CDLL",
+            autospec=True,
+            return_value=SimpleNamespace(),
+        ):
+            assert statx._load() is None
+
+    def test_old_kernel(self):
+        with mock.patch.object(
+            ctypes,
+            "CDLL",
+            autospec=True,
+            return_value=SimpleNamespace(statx=mock.Mock(return_value=-1)),
+        ):
+            assert statx._load() is None
+
+
+@pytest.fixture
+def network(starting_path):
+    """starting_path's filesystem, as a network filesystem."""
+    dev = os.stat(starting_path).st_dev
+    with mock.patch.object(
+        main,
+        "devices",
+        autospec=True,
+        side_effect=lambda fstypes: (
+            {dev: "nfs"} if fstypes == NETWORK_FSTYPES else {}
+        ),
+    ):
+        yield
+
+
+@pytest.mark.usefixtures("simple_tree", "network")
+@pytest.mark.parametrize("options", [
+    {},
+    {"permissions": True, "size": True, "user": True, "group": True},
+    {"date": True, "inodes": True, "sort": "size"},
+    {"count_only": True, "follow_links": True},
+])
+def test_tree(options, tree_kwargs, capfd):
+    """Trees look the same with statx as without."""
+    tree_kwargs.update(options)
+    assert Tree(**tree_kwargs)._statx is not None
+    expectation = capfd.readouterr().out
+    with mock.patch.object(statx, "_statx", None):
+        Tree(**tree_kwargs)
+    assert capfd.readouterr().out == expectation
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_local(tree_kwargs, mock_statx):
+    """On a local filesystem, os.stat is quicker."""
+    assert Tree(**tree_kwargs)._statx is None
+    mock_statx.assert_not_called()
+
+
+@pytest.mark.usefixtures("network")
+def test_network(starting_path, tree_kwargs):
+    """statx is only used for fewer fields than os.stat's."""
+    tree_kwargs.update(paths=("missing", str(starting_path)), report=False)
+    assert Tree(**tree_kwargs)._statx is not None
+    with mock.patch.object(
+        Tree,
+        "_stat_mask",
+        autospec=True,
+        return_value=STATX_BASIC_STATS,
+    ):
+        assert Tree(**tree_kwargs)._statx is None
+    tree_kwargs["paths"] = ("missing",)
+    assert Tree(**tree_kwargs)._statx is None
+
+
+@pytest.mark.usefixtures("simple_tree")
+def test_no_sync(tree_kwargs, mock_statx):
+    tree_kwargs["no_sync"] = True
+    Tree(**tree_kwargs)
+    assert mock_statx.call_args_list
+    assert all(
+        call.args[2] & 0x4000 for call in mock_statx.call_args_list
+    )
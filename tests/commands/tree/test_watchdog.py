@@ -0,0 +1,42 @@
+import pytest
+import threading
+
+from ccli.commands.tree.watchdog import Watchdog
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+class TestWatchdog:
+    def test_call(self):
+        watchdog = Watchdog(timeout=5)
+        assert watchdog.call(divmod, 7, 2) == (3, 1)
+        with pytest.raises(ZeroDivisionError):
+            watchdog.call(divmod, 7, 0)
+        assert len(watchdog._idle) == 1
+
+    def test_timeout(self, release):
+        watchdog = Watchdog(timeout=0.01)
+        before = set(threading.enumerate())
+        with pytest.raises(TimeoutError, match="No answer in 0.01 seconds"):
+            watchdog.call(release.wait)
+        assert not watchdog._idle
+        [worker] = set(threading.enumerate()) - before
+        assert worker.daemon
+        release.set()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+        assert watchdog.call(abs, -1) == 1
+
+    def test_raised_timeout(self):
+        def timeout():
+            raise TimeoutError("from the call")
+
+        watchdog = Watchdog(timeout=5)
+        with pytest.raises(TimeoutError, match="from the call"):
+            watchdog.call(timeout)
+        assert len(watchdog._idle) == 1
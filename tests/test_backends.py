@@ -0,0 +1,92 @@
+import os
+import pytest
+import stat
+from unittest import mock
+
+from ccli.backends import LocalBackend
+from ccli.commands.tree.cache import ListingCache
+from ccli.commands.tree.dirfd import DirFds
+from ccli.commands.tree.statx import Statx, open_statx
+
+
+class TestLocalBackend:
+    def test_listings(self, tmp_path):
+        (tmp_path / "a_file").touch()
+        listings = mock.MagicMock(spec=ListingCache)
+        backend = LocalBackend(listings=listings)
+        assert backend.listdir(tmp_path) is listings.listdir.return_value
+        assert backend.scandir(tmp_path) is listings.scandir.return_value
+        assert LocalBackend().listdir(tmp_path) == ["a_file"]
+
+    def test_scandir(self, tmp_path):
+        (tmp_path / "a_file").touch()
+        [entry] = LocalBackend().scandir(tmp_path)
+        assert entry.name == "a_file" and entry.is_file()
+
+    def test_paths(self, tmp_path):
+        backend = LocalBackend()
+        (link := tmp_path / "link").symlink_to("target")
+        assert backend.join("a", "b") == os.path.join("a", "b")
+        assert backend.basename("a/b") == "b"
+        assert backend.readlink(link) == "target"
+        assert backend.islink(link) and not backend.exists(link)
+        assert backend.lstat(link).st_mode == os.lstat(link).st_mode
+
+    @pytest.mark.parametrize("name", [
+        "exists",
+        "isdir",
+        "islink",
+        "lstat",
+        "stat",
+    ])
+    def test_statx(self, name):
+        statx = mock.MagicMock(spec=Statx)
+        backend = LocalBackend(statx=statx)
+        assert getattr(backend, name)("a") is getattr(statx, name).return_value
+        getattr(statx, name).assert_called_once_with("a", dir_fd=None)
+
+    @pytest.mark.parametrize("with_statx", [False, True])
+    def test_dir_fds(self, with_statx, tmp_path):
+        """Calls go to the directory that was opened, even once it moves."""
+        (tmp_path / "a_dir").mkdir()
+        (tmp_path / "a_dir/a_file").write_text("123")
+        (tmp_path / "a_dir/link").symlink_to("a_file")
+        (tmp_path / "a_dir/broken").symlink_to("missing")
+        dir_fds = DirFds(max_fds=8)
+        backend = LocalBackend(
+            statx=open_statx() if with_statx else None,
+            dir_fds=dir_fds,
+        )
+        directory = str(tmp_path / "a_dir")
+        assert backend.listdir(directory)  # Opens it.
+        os.rename(directory, tmp_path / "moved")
+        try:
+            assert backend.stat(f"{directory}/link").st_size == 3
+            assert stat.S_ISLNK(backend.lstat(f"{directory}/link").st_mode)
+            assert backend.readlink(f"{directory}/link") == "a_file"
+            assert backend.exists(f"{directory}/a_file")
+            assert not backend.isdir(f"{directory}/a_file")
+            assert backend.islink(f"{directory}/broken")
+            assert not backend.exists(f"{directory}/broken")
+            assert sorted(backend.listdir(directory)) == [
+                "a_file", "broken", "link",
+            ]
+            entries = {
+                entry.name: entry for entry in backend.scandir(directory)
+            }
+            assert entries["link"].path == f"{directory}/link"
+            assert entries["link"].is_symlink()
+        finally:
+            dir_fds.close()
+
+    def test_dir_fds_fallback(self, tmp_path, monkeypatch):
+        """Paths whose directory can't be opened are used as they are."""
+        backend = LocalBackend(dir_fds=DirFds(max_fds=8))
+        (tmp_path / "a_file").touch()
+        monkeypatch.chdir(tmp_path)
+        assert backend.exists("a_file")
+        assert backend.lstat("a_file").st_size == 0
+        assert backend.listdir(".") == ["a_file"]
+        for call in (backend.listdir, backend.scandir):
+            with pytest.raises(FileNotFoundError):
+                call(str(tmp_path / "missing"))
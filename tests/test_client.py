@@ -0,0 +1,145 @@
+import os
+import pytest
+import socket
+import threading
+from unittest import mock
+
+from ccli import client
+from ccli.commands.daemon.main import serve
+
+
+@pytest.fixture
+def socket_pair():
+    ours, theirs = socket.socketpair()
+    with ours, theirs:
+        yield ours, theirs
+
+
+@pytest.fixture
+def daemon(socket_pair):
+    """Serve one request on the other end of the client's connection."""
+    ours, theirs = socket_pair
+    thread = threading.Thread(target=serve, args=(theirs,))
+    thread.start()
+    yield ours
+    thread.join()
+
+
+@pytest.mark.parametrize("environ, expectation", [
+    ({"CCLI_SOCKET": "/a/b.sock", "XDG_RUNTIME_DIR": "/c"}, "/a/b.sock"),
+    ({"XDG_RUNTIME_DIR": "/c", "TMPDIR": "/d"}, "/c/ccli-{uid}.sock"),
+    ({"TMPDIR": "/d"}, "/d/ccli-{uid}.sock"),
+    ({}, "/tmp/ccli-{uid}.sock"),
+])
+def test_socket_path(environ, expectation):
+    with mock.patch.dict(os.environ, environ, clear=True):
+        assert client.socket_path() == expectation.format(uid=os.getuid())
+
+
+class TestConnect:
+    def test_missing(self, tmp_path):
+        assert client.connect(str(tmp_path / "missing.sock")) is None
+
+    def test_listening(self, tmp_path):
+        path = str(tmp_path / "ccli.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+            with client.connect(path) as connection:
+                assert connection.getpeername() == path
+
+    def test_other_owner(self, tmp_path):
+        path = str(tmp_path / "ccli.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+            with mock.patch.object(
+                client.os,
+                "getuid",
+                autospec=True,
+                return_value=os.getuid() + 1,
+            ):
+                assert client.connect(path) is None
+
+
+@pytest.mark.integration
+class TestRequest:
+    def test_tree(self, daemon, monkeypatch, tmp_path, capfd):
+        (tmp_path / "a_file").touch()
+        monkeypatch.chdir(tmp_path)
+        code = client.request(daemon, ["tree", "--noreport"])
+        assert code == 0
+        assert capfd.readouterr().out == ".\n└―― a_file\n"
+
+    def test_stderr(self, daemon, capfd):
+        code = client.request(daemon, ["tree", "--bogus"])
+        assert code == 2
+        assert "No such option: --bogus" in capfd.readouterr().err
+
+    def test_colors_follow_the_terminal(self, daemon, monkeypatch, tmp_path):
+        stdout = mock.MagicMock(encoding="utf-8")
+        stdout.isatty.return_value = True
+        monkeypatch.chdir(tmp_path)
+        with mock.patch.dict(
+            os.environ,
+            clear=True,
+        ), mock.patch.object(client.sys, "stdout", stdout):
+            client.request(daemon, ["tree", "--noreport"])
+        written = b"".join(
+            call.args[0] for call in stdout.buffer.write.call_args_list
+        )
+        assert written.startswith(b"\x1b[")
+
+    @pytest.mark.parametrize("read_request", [False, True])
+    def test_lost_connection(self, read_request, socket_pair):
+        ours, theirs = socket_pair
+        if read_request:
+            ours.sendall(b"request\n")
+            theirs.recv(1024)
+        theirs.close()
+        with pytest.raises(EOFError):
+            client.request(ours, ["tree"])
+
+
+class TestMain:
+    @mock.patch.object(client, "connect", autospec=True, return_value=None)
+    def test_fallback(self, mock_connect):
+        with mock.patch("ccli.cli.CLI", autospec=True) as mock_cli:
+            client.main(["tree", "-a"])
+        mock_cli.assert_called_once_with(args=["tree", "-a"], prog_name="ccli")
+
+    @mock.patch.object(client, "connect", autospec=True)
+    def test_interactive(self, mock_connect):
+        """Interactive commands need this terminal, not the daemon's."""
+        with mock.patch("ccli.cli.CLI", autospec=True) as mock_cli:
+            client.main(["tree", "--browse"])
+        mock_connect.assert_not_called()
+        mock_cli.assert_called_once_with(
+            args=["tree", "--browse"],
+            prog_name="ccli",
+        )
+
+    def test_daemon(self, daemon):
+        with mock.patch.object(
+            client,
+            "connect",
+            autospec=True,
+            return_value=daemon,
+        ), mock.patch.object(client.sys, "argv", ["ccli-client", "--help"]):
+            with pytest.raises(SystemExit) as error:
+                client.main()
+        assert error.value.code == 0
+
+    def test_lost_connection(self, socket_pair, capfd):
+        ours, theirs = socket_pair
+        theirs.close()
+        with mock.patch.object(
+            client,
+            "connect",
+            autospec=True,
+            return_value=ours,
+        ):
+            with pytest.raises(SystemExit) as error:
+                client.main(["tree"])
+        assert error.value.code == 1
+        assert "Lost the connection" in capfd.readouterr().err
@@ -0,0 +1,338 @@
+import errno
+import os
+import pytest
+import stat
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+from ccli import walker
+from ccli.commands.tree.backends import MemoryBackend, make_stats
+from ccli.walker import Listed, Walker
+
+FILE = stat.S_IFREG | 0o644
+LINK = stat.S_IFLNK | 0o777
+
+
+@pytest.fixture
+def memory():
+    """root
+    ├―― .hidden
+    ├―― a_dir
+    │   ├―― b_dir
+    │   │   └―― back -> ../..
+    │   └―― img10.png
+    ├―― broken -> missing
+    ├―― img9.png
+    ├―― IMG2.png
+    └―― to_dir -> a_dir
+    """
+    memory = MemoryBackend("/root")
+    memory.add(".hidden", make_stats(mode=FILE))
+    memory.add("a_dir/b_dir/back", make_stats(mode=LINK), target="../..")
+    memory.add("a_dir/img10.png", make_stats(mode=FILE, size=1, mtime=3.0))
+    memory.add("broken", make_stats(mode=LINK), target="missing")
+    memory.add("img9.png", make_stats(mode=FILE, size=3, mtime=1.0))
+    memory.add("IMG2.png", make_stats(mode=FILE, size=2, mtime=2.0))
+    memory.add("to_dir", make_stats(mode=LINK), target="a_dir")
+    return memory
+
+
+def _walk(walker, path="/root"):
+    return [
+        (visit.path, visit.depth, visit.looped)
+        for visit in walker.walk(path)
+    ]
+
+
+@pytest.mark.parametrize("name, expectation", [
+    ("file", ["file"]),
+    ("img10.png", ["img", 10, ".png"]),
+    ("v1.2-RC3", ["v", 1, ".", 2, "-rc", 3, ""]),
+])
+def test_version_key(name, expectation):
+    assert walker.version_key(name) == expectation
+
+
+class TestStat:
+    def test_kept(self, memory):
+        walk = Walker(fs=memory)
+        with mock.patch.object(
+            memory,
+            "stat",
+            autospec=True,
+            side_effect=memory.stat,
+        ) as mock_stat:
+            assert walk.stat("/root/img9.png").st_size == 3
+            assert walk.stat("/root/img9.png").st_size == 3
+            assert mock_stat.call_count == 1
+            walk.forget("/root/img9.png")
+            walk.stat("/root/img9.png")
+            assert mock_stat.call_count == 2
+            walk.forget()
+            walk.stat("/root/img9.png")
+            assert mock_stat.call_count == 3
+
+    @pytest.mark.parametrize("path", ["/root/missing", "/root/broken"])
+    def test_missing(self, path, memory):
+        assert Walker(fs=memory).stat(path) is None
+
+    def test_default_backend(self, tmp_path):
+        assert Walker().stat(str(tmp_path)).st_ino == tmp_path.stat().st_ino
+
+
+class TestLs:
+    @pytest.mark.parametrize("sort_by, expectation", [
+        ("name", ["a_dir", "broken", "IMG2.png", "img9.png", "to_dir"]),
+        ("mtime", ["a_dir", "to_dir", "img9.png", "IMG2.png", "broken"]),
+        ("size", ["img9.png", "IMG2.png", "a_dir", "to_dir", "broken"]),
+        ("version", ["a_dir", "broken", "IMG2.png", "img9.png", "to_dir"]),
+    ])
+    def test_sort_by(self, sort_by, expectation, memory):
+        names = [
+            listed.name
+            for listed in Walker(fs=memory, sort_by=sort_by).ls("/root")
+        ]
+        assert names == expectation
+
+    def test_none(self, memory):
+        listed = Walker(fs=memory, sort_by="none", reverse=True).ls("/root")
+        assert [entry.name for entry in listed] == [
+            "to_dir", "IMG2.png", "img9.png", "broken", "a_dir",
+        ]
+
+    def test_dirs_first(self, memory):
+        listed = Walker(fs=memory, dirs_first=True, reverse=True).ls("/root")
+        assert listed == [
+            Listed("to_dir", True),
+            Listed("a_dir", True),
+            Listed("img9.png", False),
+            Listed("IMG2.png", False),
+            Listed("broken", False),
+        ]
+
+    def test_filters(self, memory):
+        walk = Walker(
+            fs=memory,
+            list_hidden=True,
+            list_only_dirs=True,
+            filters=[lambda directory, name: name != "a_dir"],
+        )
+        assert walk.ls("/root") == [Listed("to_dir", True)]
+
+    def test_link_timeout(self, memory):
+        """Links whose type times out are listed as directories."""
+        with mock.patch.object(
+            memory,
+            "isdir",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            listed = Walker(fs=memory, list_only_dirs=True).ls("/root")
+        assert [entry.name for entry in listed] == [
+            "a_dir", "broken", "to_dir",
+        ]
+
+
+@pytest.fixture
+def bytes_dir(tmp_path):
+    """A real directory, as bytes, with a name that isn't valid UTF-8."""
+    for size, name in enumerate(
+        (b".hidden", b"img10.png", b"IMG2.png", b"img9.png", b"\xe9t\xe9"),
+    ):
+        (tmp_path / os.fsdecode(name)).write_bytes(b"x" * size)
+    return os.fsencode(tmp_path)
+
+
+@pytest.mark.parametrize("sort_by, expectation", [
+    ("name", [b"img10.png", b"IMG2.png", b"img9.png", b"\xe9t\xe9"]),
+    ("size", [b"\xe9t\xe9", b"img9.png", b"IMG2.png", b"img10.png"]),
+    ("version", [b"IMG2.png", b"img9.png", b"img10.png", b"\xe9t\xe9"]),
+])
+def test_bytes(sort_by, expectation, bytes_dir):
+    """bytes directories list bytes names, sorted like str ones."""
+    names = [listed.name for listed in Walker(sort_by=sort_by).ls(bytes_dir)]
+    assert names == expectation
+    entries = Walker(sort_by=sort_by).scan(bytes_dir)
+    assert [entry.name for entry in entries] == expectation
+    assert entries[0].path == os.path.join(bytes_dir, expectation[0])
+
+
+class TestScan:
+    def test_entries(self, memory):
+        entries = Walker(fs=memory, lstat=True).scan("/root")
+        assert [
+            (entry.name, entry.isdir, entry.islink, entry.exists)
+            for entry in entries
+        ] == [
+            ("a_dir", True, False, True),
+            ("broken", False, True, False),
+            ("IMG2.png", False, False, True),
+            ("img9.png", False, False, True),
+            ("to_dir", True, True, True),
+        ]
+        assert entries[-1].resolved == "/root/a_dir"
+        assert entries[-1].lstat == memory.lstat("/root/to_dir")
+
+    def test_prune(self, memory):
+        walk = Walker(
+            fs=memory,
+            list_only_dirs=True,
+            prune=lambda stats: "pruned" if stats.st_ino else None,
+        )
+        assert [entry.skip for entry in walk.scan("/root")] == [
+            "pruned", None,  # to_dir isn't entered anyway.
+        ]
+
+    def test_sort_stats_dropped(self, memory):
+        walk = Walker(fs=memory, sort_by="size")
+        walk.scan("/root")
+        assert walk._stats == {}
+
+    @pytest.mark.parametrize("error", [FileNotFoundError, TimeoutError])
+    def test_lstat_error(self, error, memory):
+        walk = Walker(fs=memory, lstat=True)
+        with mock.patch.object(
+            memory,
+            "lstat",
+            autospec=True,
+            side_effect=error(errno.ENOENT, "Gone"),
+        ):
+            if error is TimeoutError:
+                with pytest.raises(TimeoutError):
+                    walk.scan("/root")
+            else:
+                assert walk.entry("/root/img9.png").lstat is None
+
+    def test_link_timeout(self, memory):
+        with mock.patch.object(
+            memory,
+            "stat",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            with pytest.raises(TimeoutError):
+                Walker(fs=memory).scan("/root")
+
+
+class TestWalk:
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_walk(self, parallel, memory):
+        assert _walk(Walker(fs=memory, parallel=parallel)) == [
+            ("/root", 0, False),
+            ("/root/a_dir", 1, False),
+            ("/root/a_dir/b_dir", 2, False),
+            ("/root/a_dir/b_dir/back", 3, False),
+            ("/root/a_dir/img10.png", 2, False),
+            ("/root/broken", 1, False),
+            ("/root/IMG2.png", 1, False),
+            ("/root/img9.png", 1, False),
+            ("/root/to_dir", 1, False),
+        ]
+
+    @pytest.mark.parametrize("parallel", [False, True])
+    def test_loops(self, parallel, memory):
+        """Followed links to directories entered already aren't entered."""
+        walk = Walker(
+            fs=memory,
+            follow_links=True,
+            list_only_dirs=True,
+            parallel=parallel,
+        )
+        assert _walk(walk) == [
+            ("/root", 0, False),
+            ("/root/a_dir", 1, False),
+            ("/root/a_dir/b_dir", 2, False),
+            ("/root/a_dir/b_dir/back", 3, True),
+            ("/root/to_dir", 1, True),
+        ]
+
+    def test_seen(self, memory):
+        """What's been seen can be shared between walks."""
+        seen = set()
+        walk = Walker(fs=memory, follow_links=True)
+        list(walk.walk("/root/a_dir", seen=seen))
+        assert "/root/a_dir/b_dir" in seen
+        assert [
+            (visit.path, visit.looped)
+            for visit in walk.walk("/root/to_dir", seen=seen)
+        ] == [("/root/to_dir", True)]
+
+    def test_unlistable(self, memory):
+        with mock.patch.object(
+            memory,
+            "scandir",
+            autospec=True,
+            side_effect=PermissionError,
+        ):
+            assert _walk(Walker(fs=memory)) == [("/root", 0, False)]
+
+    def test_root_timeout(self, memory):
+        with mock.patch.object(
+            memory,
+            "islink",
+            autospec=True,
+            side_effect=TimeoutError,
+        ):
+            assert _walk(Walker(fs=memory)) == []
+
+    def test_closed(self, memory):
+        """Stopping early shuts the pool down."""
+        walk = Walker(fs=memory, parallel=True)
+        visits = walk.walk("/root")
+        next(visits)
+        with mock.patch.object(
+            walker.ThreadPoolExecutor,
+            "shutdown",
+            autospec=True,
+            side_effect=walker.ThreadPoolExecutor.shutdown,
+        ) as mock_shutdown:
+            visits.close()
+        mock_shutdown.assert_called_once_with(mock.ANY, cancel_futures=True)
+
+    @pytest.mark.parametrize("window", [0, 1, 2, 4])
+    def test_window(self, window):
+        """At most window listings are started and not visited yet."""
+        memory = MemoryBackend("/wide")
+        for index in range(30):
+            memory.add(f"d{index:02}/sub/file", make_stats(mode=FILE))
+            memory.add(f"d{index:02}/file", make_stats(mode=FILE))
+        expectation = _walk(Walker(fs=memory), path="/wide")
+
+        class Immediate(ThreadPoolExecutor):
+            """Lists as soon as it's asked to, so nothing's uncounted."""
+
+            def submit(self, function, *args):
+                future = Future()
+                future.set_result(function(*args))
+                return future
+
+        walk = Walker(fs=memory, parallel=True, window=window)
+        visits, held, entered = [], [], 0
+        with mock.patch.object(
+            walker,
+            "ThreadPoolExecutor",
+            Immediate,
+        ), mock.patch.object(
+            Walker,
+            "scan",
+            autospec=True,
+            side_effect=Walker.scan,
+        ) as mock_scan:
+            for visit in walk.walk("/wide"):
+                visits.append((visit.path, visit.depth, visit.looped))
+                entered += walk.enters(visit.entry)
+                held.append(mock_scan.call_count - entered)
+        assert visits == expectation
+        assert max(held) == window
+
+    def test_queued(self, memory):
+        walk = Walker(fs=memory)
+        queued = [walk.queued for _ in walk.walk("/root")]
+        assert queued == [0, 4, 5, 5, 4, 3, 2, 1, 0]
+        assert walk.queued == 0
+
+    def test_kept(self, memory):
+        walk = Walker(fs=memory)
+        assert walk.kept("/root/img9.png") is None
+        stats = walk.stat("/root/img9.png")
+        assert walk.kept("/root/img9.png") is stats